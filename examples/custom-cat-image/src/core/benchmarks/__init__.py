@@ -0,0 +1,10 @@
+"""Load and latency benchmarks.
+
+Benchmarks boot the Cat in process (the chat benchmark serves `cheshire_cat_api` with uvicorn on a free local port),
+with the same in-memory Qdrant used by the tests and fake models (see `benchmarks.fakes`),
+so they measure the Cat itself and not its providers.
+Run them from the `core` folder, results are printed (or saved with `--output`) as JSON for regression tracking:
+
+    python -m benchmarks.chat --users 20 --messages 10 --llm-latency 0.3 --token-rate 40
+    python -m benchmarks.ingestion --size-mb 2 --formats txt html pdf --embedder-latency 0.02
+"""
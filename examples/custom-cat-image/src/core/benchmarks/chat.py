@@ -0,0 +1,124 @@
+"""End-to-end chat benchmark.
+
+N users chat concurrently over websocket, each sending its messages one after the other and waiting for the answer.
+Reports time to first token, total latency and throughput, with the time spent in each stage of the turn
+(recall, agent, episodic memory store) as measured by the Cat.
+
+    python -m benchmarks.chat --users 20 --messages 10 --llm-latency 0.3 --token-rate 40 --output chat.json
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+
+# keep results on stdout parsable, must be set before the Cat is imported
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import websockets
+
+from benchmarks.fakes import FakeStreamingLLM, get_fake_embedder
+from benchmarks.harness import setup_cat, serve, summarize, write_results
+from cat.main import cheshire_cat_api
+
+
+STAGES = ["recall", "agent", "episodic_memory"]
+
+
+async def run_user(address: str, user_id: str, args) -> List[Dict]:
+    """Chat as `user_id`, returns one sample per measured turn."""
+
+    samples = []
+    uri = f"ws://{address}/ws/{user_id}?verbosity={args.verbosity}"
+    async with websockets.connect(uri, max_size=None) as websocket:
+        for i in range(args.warmup + args.messages):
+            text = f"Message number {i} from {user_id}, tell me something about cats."
+
+            start = time.perf_counter()
+            first_token = None
+            await websocket.send(json.dumps({"text": text}))
+            while True:
+                message = json.loads(await websocket.recv())
+                if message["type"] == "chat_token":
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                elif message["type"] in ["chat", "error"]:
+                    break
+            end = time.perf_counter()
+
+            if i < args.warmup:
+                continue
+
+            # answer is sent after the turn is over, stage timings are still in the working memory
+            stray = cheshire_cat_api.state.strays[user_id]
+            samples.append({
+                "error": message["type"] == "error",
+                "time_to_first_token": (first_token or end) - start,
+                "total": end - start,
+                "timings": dict(stray.working_memory.get("timings", {})),
+            })
+
+            if args.think_time:
+                await asyncio.sleep(args.think_time)
+
+    return samples
+
+
+async def run_users(address: str, args) -> List[Dict]:
+    users = [run_user(address, f"benchmark_user_{u}", args) for u in range(args.users)]
+    per_user = await asyncio.gather(*users)
+    return [sample for samples in per_user for sample in samples]
+
+
+def run(args) -> Dict:
+    llm = FakeStreamingLLM(
+        latency=args.llm_latency,
+        token_rate=args.token_rate,
+        answer_tokens=args.answer_tokens,
+    )
+    setup_cat(llm, get_fake_embedder(args.embedding_size))
+
+    with serve(cheshire_cat_api) as address:
+        start = time.perf_counter()
+        samples = asyncio.run(run_users(address, args))
+        duration = time.perf_counter() - start
+
+    ok = [s for s in samples if not s["error"]]
+    return {
+        "benchmark": "chat",
+        "config": vars(args),
+        "turns": len(samples),
+        "errors": len(samples) - len(ok),
+        # includes warmup turns and think time
+        "duration": duration,
+        "throughput": len(ok) / duration if duration else 0,
+        "time_to_first_token": summarize([s["time_to_first_token"] for s in ok]),
+        "total": summarize([s["total"] for s in ok]),
+        "stages": {
+            stage: summarize([s["timings"][stage] for s in ok if stage in s["timings"]])
+            for stage in STAGES
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent websocket users")
+    parser.add_argument("--messages", type=int, default=5, help="measured messages per user")
+    parser.add_argument("--warmup", type=int, default=1, help="messages per user sent before measuring")
+    parser.add_argument("--think-time", type=float, default=0, help="seconds between the answer and the next message")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50, help="tokens per second, 0 for no delay")
+    parser.add_argument("--answer-tokens", type=int, default=30, help="tokens in each answer")
+    parser.add_argument("--embedding-size", type=int, default=384)
+    parser.add_argument("--verbosity", default="minimal", choices=["minimal", "ids", "full"])
+    parser.add_argument("--output", help="JSON file for the results, default stdout")
+    args = parser.parse_args()
+
+    write_results(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
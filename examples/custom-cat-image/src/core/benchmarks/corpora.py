@@ -0,0 +1,111 @@
+"""Synthetic documents of a given size, to benchmark ingestion."""
+
+import os
+import random
+from typing import List
+
+
+WORDS = (
+    "cat whiskers tail paw purr meow garden rabbit hole tea party queen hatter march hare wonderland "
+    "dream curious grin vanish appear riddle clock time memory thought story book page chapter "
+    "forest river stone light shadow morning evening window door key bottle cake mushroom "
+    "the a of and to in is that it was for on with as by at from this be are"
+).split()
+
+FORMATS = ["txt", "html", "pdf"]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def paragraphs(size: int, seed: int = 42) -> List[str]:
+    """Paragraphs of random sentences, about `size` characters in total."""
+    rng = random.Random(seed)
+    result = []
+    total = 0
+    while total < size:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(3, 8)))
+        result.append(paragraph)
+        total += len(paragraph) + 2
+    return result
+
+
+def make_txt(size: int) -> bytes:
+    return "\n\n".join(paragraphs(size)).encode("utf-8")
+
+
+def make_html(size: int) -> bytes:
+    body = []
+    for p, paragraph in enumerate(paragraphs(size)):
+        if p % 10 == 0:
+            body.append(f"<h2>Chapter {p // 10 + 1}</h2>")
+        body.append(f"<p>{paragraph}</p>")
+    return f"<html><head><title>Benchmark</title></head><body>{''.join(body)}</body></html>".encode("utf-8")
+
+
+def _wrap(paragraph: str, width: int = 90) -> List[str]:
+    lines = []
+    line = ""
+    for word in paragraph.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return lines
+
+
+def make_pdf(size: int, lines_per_page: int = 60) -> bytes:
+    """Text-only PDF with about `size` characters of content (the file is larger)."""
+
+    lines = []
+    for paragraph in paragraphs(size):
+        lines.extend(_wrap(paragraph))
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    # objects 1: catalog, 2: pages, 3: font, then a page and its content stream for each page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in pages:
+        text = "".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T* "
+            for line in page
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text}ET".encode("latin-1")
+        page_number = len(objects) + 1
+        kids.append(f"{page_number} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_number + 1} 0 R >>".encode("latin-1")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1")
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def write_corpus(folder: str, fmt: str, size: int) -> str:
+    """Write a synthetic document in `folder`, returns its path."""
+    makers = {"txt": make_txt, "html": make_html, "pdf": make_pdf}
+    path = os.path.join(folder, f"corpus.{fmt}")
+    with open(path, "wb") as f:
+        f.write(makers[fmt](size))
+    return path
@@ -0,0 +1,77 @@
+"""Fake models with predictable cost, to benchmark the Cat without calling real providers."""
+
+import time
+import asyncio
+from typing import Any, List, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+
+class FakeStreamingLLM(LLM):
+    """LLM answering with `answer_tokens` tokens, the first after `latency` seconds and then `token_rate` per second.
+
+    Tokens are streamed through the callbacks as a real streaming provider would do.
+    """
+
+    latency: float = 0.5
+    token_rate: float = 50.
+    answer_tokens: int = 30
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> List[str]:
+        return ["meow "] * self.answer_tokens
+
+    def _token_interval(self) -> float:
+        return 1 / self.token_rate if self.token_rate > 0 else 0
+
+    def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs: Any
+    ) -> str:
+        time.sleep(self.latency)
+        tokens = self._tokens()
+        for token in tokens:
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            time.sleep(self._token_interval())
+        return "".join(tokens)
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs: Any
+    ) -> str:
+        await asyncio.sleep(self.latency)
+        tokens = self._tokens()
+        for token in tokens:
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            await asyncio.sleep(self._token_interval())
+        return "".join(tokens)
+
+
+class FakeEmbedder(DeterministicFakeEmbedding):
+    """Embedder returning the same vector for the same text, each call (of any number of texts) takes `latency` seconds."""
+
+    latency: float = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def get_fake_embedder(size: int = 384, latency: float = 0) -> FakeEmbedder:
+    return FakeEmbedder(size=size, latency=latency)
@@ -0,0 +1,133 @@
+"""Cat setup, server and statistics shared by the benchmarks."""
+
+import os
+import sys
+import json
+import time
+import socket
+import inspect
+import tempfile
+import threading
+from contextlib import contextmanager, redirect_stdout
+from typing import Dict, Generator, List
+
+import uvicorn
+from qdrant_client import QdrantClient
+
+import cat.utils as utils
+from cat.memory.vector_memory import VectorMemory
+from cat.looking_glass.cheshire_cat import CheshireCat
+
+
+class LockedQdrantClient:
+    """In-memory Qdrant client safe to share between turns running in parallel.
+
+    The local mode of `QdrantClient` is not thread safe, calls are serialized
+    (a Qdrant server handles concurrent requests on its own).
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return locked
+
+
+def setup_cat(llm, embedder) -> str:
+    """Make the next Cat boot with the given models, in-memory Qdrant, empty settings and no plugins.
+
+    Same substitutions as `tests/conftest.py`. Returns the temporary folder holding settings and plugins.
+    """
+
+    workdir = tempfile.mkdtemp(prefix="cat-benchmark-")
+    plugins_folder = os.path.join(workdir, "plugins/")
+    os.makedirs(plugins_folder)
+
+    os.environ["METADATA_FILE"] = os.path.join(workdir, "metadata.json")
+    utils.get_plugins_path = lambda: plugins_folder
+
+    def connect_to_vector_memory(self, *args, **kwargs):
+        self.vector_db = LockedQdrantClient(QdrantClient(":memory:"))
+    VectorMemory.connect_to_vector_memory = connect_to_vector_memory
+
+    # `CheshireCat` is the singleton factory, patch the class it builds
+    cat_class = inspect.getclosurevars(CheshireCat).nonlocals["class_"]
+    cat_class.load_language_model = lambda self: llm
+    cat_class.load_utility_language_model = lambda self: llm
+    cat_class.load_language_embedder = lambda self: embedder
+
+    # boot from scratch
+    utils.singleton.instances = {}
+    return workdir
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve(app, startup_timeout: float = 300) -> Generator[str, None, None]:
+    """Serve the app with uvicorn in a background thread, yields the `host:port` it listens on."""
+
+    port = get_free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+
+    # the startup banner would mix with results printed on stdout
+    with redirect_stdout(sys.stderr):
+        thread.start()
+        deadline = time.monotonic() + startup_timeout
+        while not server.started:
+            if not thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Benchmark server did not start")
+            time.sleep(0.05)
+
+    try:
+        yield f"127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentile `p` (0-100) with linear interpolation between the closest ranks."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Mean, p50, p95, p99 and max of a list of seconds, empty if there are no values."""
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def write_results(results: Dict, output: str = None):
+    """Write results as JSON to `output`, or to stdout."""
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
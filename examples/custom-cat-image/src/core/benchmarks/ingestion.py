@@ -0,0 +1,173 @@
+"""Ingestion benchmark.
+
+Ingests synthetic documents of the given size and formats with `RabbitHole.ingest_file`, the path used by
+the `/rabbithole` endpoints. Reports chunks per second, MB per second, peak RSS and the time spent in each stage
+(parse, split, embed, upsert and everything else).
+Each document is ingested in a fresh process, so peak RSS is not shared between runs.
+
+    python -m benchmarks.ingestion --size-mb 2 --formats txt html pdf --embedder-latency 0.02 --output ingestion.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+import resource
+import tempfile
+import threading
+import functools
+import subprocess
+from collections import defaultdict
+from contextlib import redirect_stdout
+from typing import Dict
+
+# keep results on stdout parsable, must be set before the Cat is imported
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from langchain.text_splitter import TextSplitter
+from langchain.document_loaders.parsers.generic import MimeTypeBasedParser
+
+from benchmarks.corpora import FORMATS, write_corpus
+from benchmarks.fakes import FakeStreamingLLM, FakeEmbedder, get_fake_embedder
+from benchmarks.harness import setup_cat, write_results
+from cat.looking_glass.cheshire_cat import CheshireCat
+from cat.looking_glass.stray_cat import StrayCat
+from cat.memory.vector_memory_collection import VectorMemoryCollection
+
+
+MB = 1024 * 1024
+
+
+class StageTimer:
+    """Seconds spent in the methods of each ingestion stage.
+
+    Stages running concurrently add up, so the total may exceed the elapsed time.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, owner, name: str, stage: str):
+        """Time all the calls to the method `name` of class `owner` (and the iteration of generators)."""
+
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        @functools.wraps(original)
+        def timed_generator(*args, **kwargs):
+            iterator = original(*args, **kwargs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+                yield item
+
+        setattr(owner, name, timed_generator if inspect.isgeneratorfunction(original) else timed)
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.seconds[stage] += seconds
+
+
+def peak_rss_mb() -> float:
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_format(fmt: str, args) -> Dict:
+    """Ingest a synthetic document of format `fmt`, in this process."""
+
+    folder = tempfile.mkdtemp(prefix="cat-benchmark-corpus-")
+    path = write_corpus(folder, fmt, int(args.size_mb * MB))
+    file_size = os.path.getsize(path)
+
+    setup_cat(
+        FakeStreamingLLM(latency=0, token_rate=0),
+        get_fake_embedder(args.embedding_size, args.embedder_latency)
+    )
+
+    timer = StageTimer()
+    timer.wrap(MimeTypeBasedParser, "lazy_parse", "parse")
+    timer.wrap(TextSplitter, "split_documents", "split")
+    timer.wrap(FakeEmbedder, "embed_documents", "embed")
+    timer.wrap(VectorMemoryCollection, "add_points", "upsert")
+
+    # boot prints on stdout, where results go
+    with redirect_stdout(sys.stderr):
+        ccat = CheshireCat()
+    stray = StrayCat(user_id="benchmark", main_loop=asyncio.new_event_loop())
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    ccat.rabbit_hole.ingest_file(stray, path, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    duration = time.perf_counter() - start
+
+    chunks = ccat.memory.vectors.vector_db.count("declarative").count
+    stages = dict(timer.seconds)
+    # time outside the stages (hooks, notifications, logging...)
+    stages["other"] = max(duration - sum(stages.values()), 0)
+    return {
+        "format": fmt,
+        "file_size": file_size,
+        "chunks": chunks,
+        "duration": duration,
+        "chunks_per_second": chunks / duration,
+        "mb_per_second": file_size / MB / duration,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_before_ingestion_mb": rss_before,
+        "stages": stages,
+    }
+
+
+def run(args) -> Dict:
+    # a fresh interpreter for each run, so the Cat boots from scratch and peak RSS is its own
+    runs = []
+    for fmt in args.formats:
+        command = [sys.executable, "-m", "benchmarks.ingestion", *sys.argv[1:], "--formats", fmt, "--in-process"]
+        result = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+        runs.append(json.loads(result.stdout))
+
+    return {
+        "benchmark": "ingestion",
+        "config": vars(args),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=1, help="size of the text in each document")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--embedder-latency", type=float, default=0, help="seconds for each embedder call")
+    parser.add_argument("--embedding-size", type=int, default=384)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--chunk-overlap", type=int, default=128)
+    parser.add_argument("--output", help="JSON file for the results, default stdout")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.in_process:
+        # single run, started by `run`
+        write_results(run_format(args.formats[0], args))
+        return
+
+    write_results(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Bulk ingestion of folders and archives in the Rabbit Hole.
+
+A whole knowledge base, a zip/tar archive or a folder on the server, is ingested by a single pipeline
+(see `RabbitHole.ingest_bulk`): files are parsed by a pool of workers sharing the same parsers, and their chunks are
+embedded in shared batches. Progress is notified for the whole knowledge base, and a summary report is returned at
+the end.
+
+Folders on the server can only be ingested from inside the `RABBITHOLE_BULK_FOLDER` environment variable
+(disabled if not set).
+"""
+
+import os
+import tarfile
+import zipfile
+import threading
+from typing import Dict, List, Tuple
+
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(filename: str) -> bool:
+    """Whether the file name has the extension of a supported archive."""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def resolve_server_path(path: str) -> str:
+    """Absolute path of a folder (or archive) to ingest, relative to the `RABBITHOLE_BULK_FOLDER` folder.
+
+    Raises
+    ------
+    PermissionError
+        If server-side ingestion is disabled, or the path is outside of `RABBITHOLE_BULK_FOLDER`.
+    FileNotFoundError
+        If the path is not a folder nor an archive.
+    """
+    root = os.getenv("RABBITHOLE_BULK_FOLDER")
+    if not root:
+        raise PermissionError("Ingestion of server-side paths is disabled, set RABBITHOLE_BULK_FOLDER to enable it")
+
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise PermissionError(f"{path} is outside of the bulk ingestion folder")
+    if not os.path.isdir(resolved) and not (os.path.isfile(resolved) and is_archive(resolved)):
+        raise FileNotFoundError(f"{path} is not a folder nor an archive")
+    return resolved
+
+
+def extract_archive(path: str, folder: str) -> None:
+    """Extract a zip or tar archive in `folder`.
+
+    Members that would be extracted outside of `folder` (absolute or `../` paths) make the whole archive invalid,
+    links and special files of tar archives are ignored.
+    """
+    root = os.path.realpath(folder)
+
+    def check(name: str):
+        target = os.path.realpath(os.path.join(root, name))
+        if os.path.commonpath([root, target]) != root:
+            raise ValueError(f"Archive member {name} is outside of the archive")
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                check(member.filename)
+            archive.extractall(root)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            members = [m for m in archive.getmembers() if m.isfile() or m.isdir()]
+            for member in members:
+                check(member.name)
+            archive.extractall(root, members=members)
+    else:
+        raise ValueError(f"{os.path.basename(path)} is not a zip or tar archive")
+
+
+def list_files(folder: str) -> List[Tuple[str, str]]:
+    """Files in a folder and its subfolders, as (relative path, absolute path), sorted by relative path.
+
+    Hidden files and folders (e.g. `.git`) and the `__MACOSX` folders added by macOS archives are ignored.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d != "__MACOSX"]
+        for filename in filenames:
+            if filename.startswith("."):
+                continue
+            path = os.path.join(dirpath, filename)
+            files.append((os.path.relpath(path, folder).replace(os.sep, "/"), path))
+    return sorted(files)
+
+
+class _File:
+
+    def __init__(self):
+        # parts parsed but not split yet
+        self.parts = 0
+        self.parsed = False
+        # chunks split but not stored yet
+        self.pending = 0
+        self.chunks = 0
+
+
+class BulkReport:
+    """State of the files of a bulk ingestion, and its summary report. Thread safe.
+
+    A file is ingested once it is completely parsed, all its parts are split and all its chunks stored:
+    the methods recording these steps return the files just ingested.
+    """
+
+    def __init__(self, source: str, files: int):
+        self.source = source
+        self.files = files
+        self.ingested: Dict[str, int] = {}
+        self.skipped: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.__files: Dict[str, _File] = {}
+        self.__lock = threading.Lock()
+
+    def skip(self, name: str):
+        """Record a file not ingested, as its type is not supported."""
+        with self.__lock:
+            self.skipped.append(name)
+
+    def done(self, name: str, chunks: int):
+        """Record a file already ingested (e.g. by an interrupted run of the job)."""
+        with self.__lock:
+            self.ingested[name] = chunks
+
+    def fail(self, name: str, error: str):
+        with self.__lock:
+            self.failed[name] = error
+            self.__files.pop(name, None)
+
+    def add_part(self, name: str):
+        """Record a part of a file parsed."""
+        with self.__lock:
+            self.__files.setdefault(name, _File()).parts += 1
+
+    def parsed(self, name: str) -> List[str]:
+        """Record a file completely parsed."""
+        with self.__lock:
+            self.__files.setdefault(name, _File()).parsed = True
+            return self.__completed([name])
+
+    def split(self, name: str, chunks: int) -> List[str]:
+        """Record a part of a file split in `chunks` chunks to store."""
+        with self.__lock:
+            file = self.__files.get(name)
+            if file is None:
+                # failed
+                return []
+            file.parts -= 1
+            file.pending += chunks
+            return self.__completed([name])
+
+    def stored(self, chunks: Dict[str, int]) -> List[str]:
+        """Record chunks stored, by file."""
+        with self.__lock:
+            for name, n in chunks.items():
+                file = self.__files.get(name)
+                if file is not None:
+                    file.pending -= n
+                    file.chunks += n
+            return self.__completed(chunks)
+
+    def report(self) -> Dict:
+        with self.__lock:
+            return {
+                "source": self.source,
+                "files": self.files,
+                "ingested": len(self.ingested),
+                "skipped": len(self.skipped),
+                "failed": len(self.failed),
+                "chunks": sum(self.ingested.values()),
+                "skipped_files": sorted(self.skipped),
+                "errors": dict(self.failed),
+            }
+
+    def __completed(self, names) -> List[str]:
+        completed = []
+        for name in names:
+            file = self.__files.get(name)
+            if file is not None and file.parsed and file.parts == 0 and file.pending == 0:
+                del self.__files[name]
+                self.ingested[name] = file.chunks
+                completed.append(name)
+        return completed
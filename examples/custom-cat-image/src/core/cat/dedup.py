@@ -0,0 +1,154 @@
+"""Duplicate and near-duplicate detection of document chunks.
+
+Chunks are compared by the sha256 hash of their content (exact duplicates), and by the SimHash fingerprint of their
+word 3-shingles (near duplicates, e.g. the same footer with a different page number): two chunks are near duplicates
+if their 64 bits fingerprints differ by at most `distance` bits.
+Fingerprints are indexed in `distance + 1` bands: near duplicates have at least one identical band, so only the
+fingerprints sharing a band are compared. Chunks already stored are looked up the same way, by hash and by band.
+"""
+
+import re
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+_WORD = re.compile(r"\w+")
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def content_hash(text: str) -> str:
+    """Hash of the content of a chunk, stored in its `content_hash` metadata."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def simhash(text: str, shingle_size: int = 3) -> Tuple[int, int]:
+    """SimHash fingerprint (64 bits) of the word shingles of a text.
+
+    Returns
+    -------
+    fingerprint, shingles : Tuple[int, int]
+        The fingerprint and the number of shingles it was computed from.
+    """
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles],
+        dtype=np.uint64
+    )
+    # each bit of the fingerprint is the majority vote of the same bit of the shingle hashes
+    votes = ((hashes[:, None] >> _BITS) & np.uint64(1)).sum(axis=0)
+    fingerprint = int(np.sum((votes * 2 > len(shingles)).astype(np.uint64) << _BITS))
+    return fingerprint, len(shingles)
+
+
+class ChunkDeduplicator:
+    """Index of the chunks seen so far, finding the duplicates of new ones. Thread safe.
+
+    Parameters
+    ----------
+    distance : int
+        Maximum number of different bits between the fingerprints of near duplicates.
+    min_shingles : int
+        Chunks with less shingles (i.e. a few words) are only compared by exact hash,
+        as their fingerprints are too coarse.
+    lookup : Callable, optional
+        Finds the stored chunks (e.g. in memory) that are candidate duplicates of a new chunk:
+        called with the content hash and the bands (see `bands`) of the new chunk, returns the
+        `(content_hash, fingerprint)` of the stored chunks with the same hash or sharing a band.
+    """
+
+    def __init__(self, distance: int = 3, min_shingles: int = 8,
+                 lookup: Callable[[str, List[str]], Iterable[Tuple[str, Optional[int]]]] = None):
+        self.distance = distance
+        self.min_shingles = min_shingles
+        self.lookup = lookup
+
+        bands = distance + 1
+        width = 64 // bands
+        # (shift, mask) of each band, the last one takes the remaining bits
+        self.__bands = [(b * width, (1 << (width if b < bands - 1 else 64 - b * width)) - 1) for b in range(bands)]
+        self.__hashes: Set[str] = set()
+        self.__index: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(bands)]
+        self.__lock = threading.Lock()
+
+        # sources of the duplicates, by content hash of the chunk they duplicate
+        self.references: Dict[str, Set[str]] = {}
+
+    def add(self, text: str, chunk_hash: str = None, fingerprint: int = None):
+        """Index a chunk, e.g. already stored in memory."""
+        chunk_hash = chunk_hash or content_hash(text)
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+        with self.__lock:
+            self.__add(chunk_hash, fingerprint)
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        """SimHash fingerprint of a chunk, `None` if too short to be compared by fingerprint."""
+        fingerprint, shingles = simhash(text)
+        return fingerprint if shingles >= self.min_shingles else None
+
+    def bands(self, fingerprint: Optional[int]) -> List[str]:
+        """Keys of the bands of a fingerprint, e.g. to index it in the `simhash_bands` metadata.
+
+        Keys depend on the number of bands, i.e. fingerprints are only matched by band with the same `distance`.
+        """
+        if fingerprint is None:
+            return []
+        bands = len(self.__bands)
+        return [f"{bands}.{b}:{(fingerprint >> shift) & mask:x}" for b, (shift, mask) in enumerate(self.__bands)]
+
+    def duplicate_of(self, text: str, chunk_hash: str = None, fingerprint: int = None) -> Optional[str]:
+        """Find the chunk a new chunk duplicates, or index the new chunk.
+
+        Returns
+        -------
+        chunk_hash : str, None
+            Content hash of the duplicated chunk, `None` if the chunk is new.
+        """
+        chunk_hash = chunk_hash or content_hash(text)
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+
+        with self.__lock:
+            original = self.__find(chunk_hash, fingerprint)
+        if original is not None:
+            return original
+
+        if self.lookup is not None:
+            for stored_hash, stored_fingerprint in self.lookup(chunk_hash, self.bands(fingerprint)):
+                if stored_hash == chunk_hash or self.__near(fingerprint, stored_fingerprint):
+                    return stored_hash
+
+        with self.__lock:
+            # indexed by another thread in the meantime
+            original = self.__find(chunk_hash, fingerprint)
+            if original is None:
+                self.__add(chunk_hash, fingerprint)
+            return original
+
+    def reference(self, chunk_hash: str, source: str):
+        """Record that `source` has a duplicate of the chunk with hash `chunk_hash`."""
+        with self.__lock:
+            self.references.setdefault(chunk_hash, set()).add(source)
+
+    def __near(self, fingerprint: Optional[int], other: Optional[int]) -> bool:
+        return fingerprint is not None and other is not None and bin(fingerprint ^ other).count("1") <= self.distance
+
+    def __find(self, chunk_hash: str, fingerprint: Optional[int]) -> Optional[str]:
+        if chunk_hash in self.__hashes:
+            return chunk_hash
+        if fingerprint is not None:
+            for (shift, mask), index in zip(self.__bands, self.__index):
+                for other, other_hash in index.get((fingerprint >> shift) & mask, ()):
+                    if self.__near(fingerprint, other):
+                        return other_hash
+        return None
+
+    def __add(self, chunk_hash: str, fingerprint: Optional[int]):
+        self.__hashes.add(chunk_hash)
+        if fingerprint is not None:
+            for (shift, mask), index in zip(self.__bands, self.__index):
+                index.setdefault((fingerprint >> shift) & mask, []).append((fingerprint, chunk_hash))
@@ -1,5 +1,8 @@
-from typing import List, Dict
+from typing import List, Dict, Type
 from dataclasses import dataclass
+from functools import lru_cache
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, ConfigDict, ValidationError
 
 from langchain.chains import LLMChain
@@ -19,6 +22,25 @@ class CatFormState(Enum):
     CLOSED       = "closed"
 
 
+# JSON structure of a form model, built once per model class
+@lru_cache
+def get_json_structure(model_class: Type[BaseModel]) -> str:
+    # BaseModel.__fields__['my_field'].type_
+    JSON_structure = "{"
+    for field_name, field in model_class.model_fields.items():
+        if field.description:
+            description = field.description
+        else:
+            description = ""
+        JSON_structure += f'\n\t"{field_name}": // {description} Must be of type `{field.annotation.__name__}` or `null`' # field.required?
+    JSON_structure += "\n}"
+    return JSON_structure
+
+
+# runs the independent LLM calls of a form step concurrently
+_executor = ThreadPoolExecutor(thread_name_prefix="cat_form")
+
+
 class CatForm:  # base model of forms
 
     model_class:     BaseModel
@@ -28,6 +50,8 @@ class CatForm:  # base model of forms
     start_examples:  List[str]
     stop_examples:   List[str] = []
     ask_confirm:     bool = False
+    # ask exit intent, confirmation and fields in a single LLM call
+    combined_step:   bool = False
     triggers_map = None
     _autopilot = False
 
@@ -71,7 +95,7 @@ JSON:
     "confirm": """
 
         # Queries the LLM and check if user is agree or not
-        response = self.cat.llm(confirm_prompt, stream=True)
+        response = self.cat.llm(confirm_prompt, utility=True)
         return "true" in response.lower()
         
     # Check if the user wants to exit the form
@@ -82,13 +106,7 @@ JSON:
         history = self.stringify_convo_history()
 
         # Stop examples
-        stop_examples = """
-Examples where {"exit": true}:
-- exit form
-- stop it"""
-
-        for se in self.stop_examples:
-            stop_examples += f"\n- {se}"
+        stop_examples = self.stringify_stop_examples()
 
         # Check exit prompt
         check_exit_prompt = \
@@ -112,21 +130,35 @@ JSON:
     "exit": """
 
         # Queries the LLM and check if user is agree or not
-        response = self.cat.llm(check_exit_prompt, stream=True)
+        response = self.cat.llm(check_exit_prompt, utility=True)
         return "true" in response.lower()
 
+    def stringify_stop_examples(self):
+
+        stop_examples = """
+Examples where {"exit": true}:
+- exit form
+- stop it"""
+
+        for se in self.stop_examples:
+            stop_examples += f"\n- {se}"
+
+        return stop_examples
+
     # Execute the dialogue step
     def next(self):
 
         # could we enrich prompt completion with episodic/declarative memories?
         #self.cat.working_memory["episodic_memories"] = []
 
-        if self.check_exit_intent():
+        step = self.step()
+
+        if step["exit"]:
             self._state = CatFormState.CLOSED
 
         # If state is WAIT_CONFIRM, check user confirm response..
         if self._state == CatFormState.WAIT_CONFIRM:
-            if self.confirm():
+            if step["confirm"]:
                 self._state = CatFormState.CLOSED
                 return self.submit(self._model)
             else:
@@ -135,7 +167,7 @@ JSON:
         # If the state is INCOMPLETE, execute model update
         # (and change state based on validation result)
         if self._state == CatFormState.INCOMPLETE:
-            self._model = self.update()
+            self._model = self.update(step["fields"])
 
         # If state is COMPLETE, ask confirm (or execute action directly)
         if self._state == CatFormState.COMPLETE:
@@ -148,12 +180,101 @@ JSON:
         # if state is still INCOMPLETE, recap and ask for new info
         return self.message()
 
+    # Ask the LLM about the user's response: exit intent, confirmation and fields.
+    # Returns a dict with keys `exit`, `confirm` and `fields` (`None` if fields are not extracted yet)
+    def step(self) -> Dict:
+
+        if self.combined_step:
+            return self.combined_extract()
+
+        # exit intent does not depend on the other calls, run them concurrently
+        # (each call gets its own copy of the context, e.g. for LLM admission control)
+        exit_future = _executor.submit(copy_context().run, self.check_exit_intent)
+
+        step_future = None
+        if self._state == CatFormState.WAIT_CONFIRM:
+            step_future = _executor.submit(copy_context().run, self.confirm)
+        elif self._state == CatFormState.INCOMPLETE:
+            step_future = _executor.submit(copy_context().run, self.extract)
+
+        step = {"exit": exit_future.result(), "confirm": False, "fields": None}
+        if step["exit"]:
+            # the user is leaving, confirmation and fields are discarded (and not waited for)
+            if step_future is not None:
+                step_future.cancel()
+            return step
+
+        if self._state == CatFormState.WAIT_CONFIRM:
+            step["confirm"] = step_future.result()
+        elif self._state == CatFormState.INCOMPLETE:
+            step["fields"] = step_future.result()
+        return step
+
+    # Single LLM call for exit intent, confirmation and fields extraction
+    def combined_extract(self) -> Dict:
+
+        prompt = self.combined_prompt()
+        log.debug(prompt)
+
+        response = self.cat.llm(prompt, utility=True)
+        # stop at the end of the JSON block
+        json_str = "{" + response.split("```")[0]
+
+        log.debug(f"Form step JSON:\n{json_str}")
+
+        try:
+            output = json.loads(json_str)
+        except Exception as e:
+            output = {}
+            log.warning(e)
+
+        fields = output.get("fields")
+        return {
+            "exit": output.get("exit") is True,
+            "confirm": output.get("confirm") is True,
+            "fields": fields if isinstance(fields, dict) else {},
+        }
+
+    def combined_prompt(self):
+
+        history = self.stringify_convo_history()
+
+        confirm = ""
+        if self._state == CatFormState.WAIT_CONFIRM:
+            confirm = "\n    \"confirm\": // type boolean, whether the user confirms the current JSON,"
+
+        return \
+f"""Your task is to produce a JSON representing the last message of a user filling up a form.
+JSON must be in this format:
+```json
+{{
+    "exit": // type boolean, whether the user wants to exit the form,{confirm}
+    "fields": {get_json_structure(self.model_class)}
+}}
+```
+
+{self.stringify_stop_examples()}
+
+This is the current form:
+```json
+{json.dumps(self._model, indent=4)}
+```
+
+This is the conversation:
+
+{history}
+
+JSON:
+```json
+{{"""
+
     # Updates the form with the information extracted from the user's response
     # (Return True if the model is updated)
-    def update(self):
+    def update(self, json_details: Dict = None):
 
         # Conversation to JSON
-        json_details = self.extract()
+        if json_details is None:
+            json_details = self.extract()
         json_details = self.sanitize(json_details)
         
         # model merge old and new
@@ -219,7 +340,7 @@ JSON:
         # Invoke LLM chain
         extraction_chain = LLMChain(
             prompt     = PromptTemplate.from_template(prompt),
-            llm        = self._cat._llm,
+            llm        = self._cat._utility_llm,
             verbose    = True,
             output_key = "output"
         )
@@ -240,16 +361,8 @@ JSON:
 
         history = self.stringify_convo_history()
 
-        # JSON structure
-        # BaseModel.__fields__['my_field'].type_
-        JSON_structure = "{"
-        for field_name, field in self.model_class.model_fields.items():
-            if field.description:
-                description = field.description
-            else:
-                description = ""
-            JSON_structure += f'\n\t"{field_name}": // {description} Must be of type `{field.annotation.__name__}` or `null`' # field.required?
-        JSON_structure += "\n}"
+        # JSON structure (cached for each model class)
+        JSON_structure = get_json_structure(self.model_class)
     
         # TODO: reintroduce examples
         prompt = \
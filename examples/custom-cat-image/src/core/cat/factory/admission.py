@@ -0,0 +1,327 @@
+"""Admission control for LLM and embedder providers.
+
+Every language model and embedder built by the factories goes through a `ProviderLimiter`, shared by all the
+objects of the same provider (i.e. the same settings class). A limiter combines:
+
+    - a token bucket limiting the number of requests per second;
+    - a maximum number of in-flight requests, adjusted with AIMD (additive increase, multiplicative decrease)
+      when the provider answers with rate limit errors or slows down;
+    - priority of interactive traffic (chat) over background traffic (documents ingestion).
+
+Limits are configured with environment variables, for the `LLM` and `EMBEDDER` providers:
+
+    - `LLM_RATE_LIMIT` / `EMBEDDER_RATE_LIMIT`: requests per second, unlimited if not set;
+    - `LLM_MAX_IN_FLIGHT` / `EMBEDDER_MAX_IN_FLIGHT`: maximum concurrent requests (default 16 / 8);
+    - `LLM_TARGET_LATENCY` / `EMBEDDER_TARGET_LATENCY`: seconds above which a request is considered
+      a congestion signal (default 60 / 10).
+
+"""
+
+import os
+import time
+import asyncio
+import threading
+from enum import Enum
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Type, Optional
+
+from cat.log import log
+
+
+class Priority(Enum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# priority of the requests made in the current context (thread or task)
+_priority: ContextVar[Priority] = ContextVar("admission_priority", default=Priority.INTERACTIVE)
+
+# set while a request is admitted, so nested calls (e.g. `embed_query` calling `embed_documents`) take a single slot
+_admitted: ContextVar[bool] = ContextVar("admission_admitted", default=False)
+
+
+@contextmanager
+def background_priority():
+    """Run the enclosed LLM and embedder calls with background priority.
+
+    Examples
+    --------
+    >>> with background_priority():
+    ...     embedder.embed_documents(chunks)
+    """
+    token = _priority.set(Priority.BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Guess if an exception raised by a provider client is a rate limit (HTTP 429) error."""
+    status_code = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    if status_code == 429:
+        return True
+    return "RateLimit" in type(error).__name__ or "429" in str(error)
+
+
+class TokenBucket:
+    """Thread safe token bucket. A `rate` of `None` means unlimited."""
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate or 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self) -> float:
+        """Seconds to wait before a token is available (caller must hold the limiter lock)."""
+        if self.rate is None:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self):
+        if self.rate is not None:
+            self._tokens -= 1
+
+    def drain(self):
+        """Empty the bucket, i.e. pause traffic after a rate limit error."""
+        if self.rate is not None:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+
+class ProviderLimiter:
+    """Admission control for a single provider.
+
+    Attributes
+    ----------
+    name : str
+        Provider name.
+    limit : float
+        Current maximum of in-flight requests, between `min_in_flight` and `max_in_flight`.
+    in_flight : int
+        Requests currently running.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            rate: Optional[float] = None,
+            max_in_flight: int = 16,
+            min_in_flight: int = 1,
+            target_latency: float = 60.0,
+            decrease_factor: float = 0.5,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate)
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min_in_flight
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self._waiting = {p: 0 for p in Priority}
+        self._lock = threading.Condition()
+
+    def _try_enter(self, priority: Priority) -> float:
+        # returns 0 if the request is admitted, otherwise how long to wait before retrying
+        if priority == Priority.BACKGROUND and self._waiting[Priority.INTERACTIVE] > 0:
+            return 0.05
+        if self.in_flight >= max(self.min_in_flight, int(self.limit)):
+            return 0.05
+        wait = self.bucket.wait_time()
+        if wait > 0:
+            return wait
+        self.bucket.take()
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self):
+        """Block the current thread until the request is admitted."""
+        priority = _priority.get()
+        with self._lock:
+            self._waiting[priority] += 1
+            try:
+                while (wait := self._try_enter(priority)) > 0:
+                    self._lock.wait(timeout=wait)
+            finally:
+                self._waiting[priority] -= 1
+
+    async def aacquire(self):
+        """Wait, without blocking the event loop, until the request is admitted."""
+        priority = _priority.get()
+        with self._lock:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_enter(priority)
+                if wait == 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting[priority] -= 1
+
+    def release(self, latency: float, error: Exception = None):
+        """Free the slot of a finished request and adapt the limit (AIMD)."""
+        with self._lock:
+            self.in_flight -= 1
+            if error is not None and is_rate_limit_error(error):
+                self.limit = max(self.min_in_flight, self.limit * self.decrease_factor)
+                self.bucket.drain()
+                log.warning(f"Provider {self.name} is rate limiting, max in-flight requests lowered to {int(self.limit)}")
+            elif error is None and latency > self.target_latency:
+                self.limit = max(self.min_in_flight, self.limit * self.decrease_factor)
+                log.warning(f"Provider {self.name} is slow ({latency:.1f}s), max in-flight requests lowered to {int(self.limit)}")
+            elif error is None:
+                self.limit = min(self.max_in_flight, self.limit + 1 / self.limit)
+            self._lock.notify_all()
+
+    @contextmanager
+    def admit(self):
+        if _admitted.get():
+            yield
+            return
+        self.acquire()
+        token = _admitted.set(True)
+        start = time.monotonic()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _admitted.reset(token)
+            self.release(time.monotonic() - start, error)
+
+    @asynccontextmanager
+    async def aadmit(self):
+        if _admitted.get():
+            yield
+            return
+        await self.aacquire()
+        token = _admitted.set(True)
+        start = time.monotonic()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _admitted.reset(token)
+            self.release(time.monotonic() - start, error)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting_interactive": self._waiting[Priority.INTERACTIVE],
+            "waiting_background": self._waiting[Priority.BACKGROUND],
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+
+def get_limiter(provider: str, kind: str = "LLM") -> ProviderLimiter:
+    """Get (or create) the limiter of a provider.
+
+    Parameters
+    ----------
+    provider : str
+        Provider name, the factory settings class name (e.g. `LLMOpenAIChatConfig`).
+    kind : str
+        Either `LLM` or `EMBEDDER`, used to read the limits from environment variables.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            default_in_flight, default_latency = (16, 60.0) if kind == "LLM" else (8, 10.0)
+            _limiters[provider] = ProviderLimiter(
+                name=provider,
+                rate=_env_float(f"{kind}_RATE_LIMIT", None),
+                max_in_flight=int(_env_float(f"{kind}_MAX_IN_FLIGHT", default_in_flight)),
+                target_latency=_env_float(f"{kind}_TARGET_LATENCY", default_latency),
+            )
+        return _limiters[provider]
+
+
+def get_limiters_stats() -> Dict[str, Dict]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+def _wrap_sync(limiter: ProviderLimiter, method):
+    def admitted(self, *args, **kwargs):
+        with limiter.admit():
+            return method(self, *args, **kwargs)
+    return admitted
+
+
+def _wrap_async(limiter: ProviderLimiter, method):
+    async def admitted(self, *args, **kwargs):
+        async with limiter.aadmit():
+            return await method(self, *args, **kwargs)
+    return admitted
+
+
+# methods actually calling the providers
+LLM_METHODS = {"_generate": _wrap_sync, "_agenerate": _wrap_async}
+EMBEDDER_METHODS = {
+    "embed_documents": _wrap_sync,
+    "embed_query": _wrap_sync,
+    "aembed_documents": _wrap_async,
+    "aembed_query": _wrap_async,
+}
+
+_admitted_classes: Dict[tuple, Type] = {}
+
+
+def admitted_class(pyclass: Type, provider: str, kind: str = "LLM") -> Type:
+    """Subclass a LLM or embedder class so its calls go through the provider limiter.
+
+    The subclass keeps name and module of the original class, so it behaves the same
+    for `isinstance` checks, serialization and memory export.
+    """
+    key = (pyclass, provider)
+    if key not in _admitted_classes:
+        limiter = get_limiter(provider, kind)
+        methods = LLM_METHODS if kind == "LLM" else EMBEDDER_METHODS
+        namespace = {
+            "__module__": pyclass.__module__,
+            "__qualname__": pyclass.__qualname__,
+            "_admission_original_class": pyclass,
+        }
+        for name, wrap in methods.items():
+            method = getattr(pyclass, name, None)
+            if method is not None:
+                namespace[name] = wrap(limiter, method)
+        _admitted_classes[key] = type(pyclass.__name__, (pyclass,), namespace)
+    return _admitted_classes[key]
+
+
+def original_class(obj) -> Type:
+    """Class of a LLM or embedder before admission wrapping."""
+    return getattr(type(obj), "_admission_original_class", type(obj))
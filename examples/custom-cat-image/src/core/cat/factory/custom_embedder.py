@@ -7,7 +7,8 @@ from itertools import combinations
 from collections import OrderedDict
 from sklearn.feature_extraction.text import CountVectorizer
 from langchain_core.embeddings import Embeddings
-import httpx
+
+from cat.factory.http_client import get_http_client, get_async_http_client
 
 
 class DumbEmbedder(Embeddings):
@@ -61,13 +62,24 @@ class CustomOpenAIEmbeddings(Embeddings):
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         payload = json.dumps({"input": texts})
-        ret = httpx.post(self.url, data=payload, timeout=None)
+        ret = get_http_client().post(self.url, content=payload)
         ret.raise_for_status()
         return  [e['embedding'] for e in ret.json()['data']]
     
     def embed_query(self, text: str) -> List[float]:
         payload = json.dumps({"input": text})
-        ret = httpx.post(self.url, data=payload, timeout=None)
+        ret = get_http_client().post(self.url, content=payload)
         ret.raise_for_status()
         return ret.json()['data'][0]['embedding']
 
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        payload = json.dumps({"input": texts})
+        ret = await get_async_http_client().post(self.url, content=payload)
+        ret.raise_for_status()
+        return [e['embedding'] for e in ret.json()['data']]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        payload = json.dumps({"input": text})
+        ret = await get_async_http_client().post(self.url, content=payload)
+        ret.raise_for_status()
+        return ret.json()['data'][0]['embedding']
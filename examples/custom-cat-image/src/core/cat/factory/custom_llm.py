@@ -1,15 +1,13 @@
 import os
 from typing import Optional, List, Any, Mapping, Dict, Iterator, AsyncIterator
 
-import aiohttp
-import requests
-
 from fastapi import HTTPException
 
 from langchain_core.language_models.llms import LLM
 from langchain_openai.llms import OpenAI
 from langchain_community.llms.ollama import Ollama, OllamaEndpointNotFoundError
 
+from cat.factory.http_client import get_http_client, get_async_http_client
 from cat.log import log
 
 
@@ -51,14 +49,27 @@ class LLMCustom(LLM):
             run_manager: Optional[Any] = None,
     ) -> str:
 
-        request_body = {
-            "text": prompt,
-            "auth_key": self.auth_key,
-            "options": self.options
-        }
+        try:
+            response = get_http_client().post(self.url, json=self._request_body(prompt))
+            response_json = response.json()
+        except Exception as exc:
+            raise ValueError("Custom LLM endpoint error "
+                             "during http POST request") from exc
+
+        generated_text = response_json["text"]
+
+        return generated_text
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+    ) -> str:
 
         try:
-            response_json = requests.post(self.url, json=request_body).json()
+            response = await get_async_http_client().post(self.url, json=self._request_body(prompt))
+            response_json = response.json()
         except Exception as exc:
             raise ValueError("Custom LLM endpoint error "
                              "during http POST request") from exc
@@ -67,6 +78,13 @@ class LLMCustom(LLM):
 
         return generated_text
 
+    def _request_body(self, prompt: str) -> Dict:
+        return {
+            "text": prompt,
+            "auth_key": self.auth_key,
+            "options": self.options
+        }
+
     @property
     def _identifying_params(self) -> Mapping[str, Any]:
         """Identifying parameters."""
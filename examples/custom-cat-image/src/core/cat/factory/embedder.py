@@ -12,6 +12,7 @@ from langchain_openai import OpenAIEmbeddings, AzureOpenAIEmbeddings
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from fastembed.embedding import TextEmbedding
 from cat.factory.custom_embedder import DumbEmbedder, CustomOpenAIEmbeddings
+from cat.factory.admission import admitted_class
 from cat.mad_hatter.mad_hatter import MadHatter
 
 
@@ -31,7 +32,7 @@ class EmbedderSettings(BaseModel):
             raise Exception(
                 "Embedder configuration class has self._pyclass==None. Should be a valid Embedder class"
             )
-        return cls._pyclass.default(**config)
+        return admitted_class(cls._pyclass.default, provider=cls.__name__, kind="EMBEDDER")(**config)
 
 
 class EmbedderFakeConfig(EmbedderSettings):
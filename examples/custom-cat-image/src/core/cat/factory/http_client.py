@@ -0,0 +1,130 @@
+"""Process-wide pooled HTTP clients.
+
+Custom LLMs and embedders share these clients instead of opening a new connection on each call.
+Clients keep connections alive, use HTTP/2 when the `h2` package is installed,
+and are configured with the following environment variables:
+
+    - `HTTP_TIMEOUT`: seconds to wait for a response (default 600);
+    - `HTTP_CONNECT_TIMEOUT`: seconds to wait for a connection (default 10);
+    - `HTTP_MAX_CONNECTIONS`: maximum number of open connections (default 100);
+    - `HTTP_MAX_KEEPALIVE_CONNECTIONS`: maximum number of idle connections kept alive (default 20);
+    - `HTTP_KEEPALIVE_EXPIRY`: seconds an idle connection is kept alive (default 60).
+
+"""
+
+import os
+import asyncio
+import threading
+import importlib.util
+from weakref import WeakKeyDictionary
+
+import httpx
+
+from cat.log import log
+
+
+_lock = threading.Lock()
+_sync_client: httpx.Client = None
+# httpx.AsyncClient connections are bound to an event loop, and the Cat runs more than one of them
+_async_clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = WeakKeyDictionary()
+
+
+def get_http_timeout() -> httpx.Timeout:
+    """Default timeout of the shared HTTP clients, from environment variables."""
+    return httpx.Timeout(
+        float(os.getenv("HTTP_TIMEOUT", 600)),
+        connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", 10)),
+    )
+
+
+def get_http_limits() -> httpx.Limits:
+    """Connection pool limits of the shared HTTP clients, from environment variables."""
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60)),
+    )
+
+
+def is_http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional `h2` package."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _client_kwargs():
+    return {
+        "timeout": get_http_timeout(),
+        "limits": get_http_limits(),
+        "http2": is_http2_available(),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Get the process-wide pooled synchronous HTTP client.
+
+    Returns
+    -------
+    httpx.Client
+        Shared client, created on first use.
+    """
+    global _sync_client
+
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_client_kwargs())
+            log.debug("Shared sync HTTP client created")
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Get the pooled asynchronous HTTP client of the running event loop.
+
+    Returns
+    -------
+    httpx.AsyncClient
+        Client shared by all the coroutines running in the current event loop, created on first use.
+
+    Raises
+    ------
+    RuntimeError
+        If called outside of a running event loop.
+    """
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**_client_kwargs())
+            _async_clients[loop] = client
+            log.debug("Shared async HTTP client created")
+        return client
+
+
+async def aclose_http_client_for_loop() -> None:
+    """Close and forget the async client of the running event loop.
+
+    To be awaited before closing a short-lived loop (e.g. the loop of a `StrayCat` serving a single request):
+    the client keeps the loop alive through its connections, so it would never be collected otherwise.
+    """
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        client = _async_clients.pop(loop, None)
+
+    if client is not None:
+        await client.aclose()
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared clients, to be called at shutdown."""
+    global _sync_client
+
+    with _lock:
+        sync_client, _sync_client = _sync_client, None
+        loop = asyncio.get_running_loop()
+        async_client = _async_clients.pop(loop, None)
+
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -15,7 +15,10 @@ import json
 from pydantic import BaseModel, ConfigDict
 
 from cat.factory.custom_llm import LLMDefault, LLMCustom, CustomOpenAI, CustomOllama
+from cat.factory.admission import admitted_class
+from cat.factory.llm_router import LLMRouter
 from cat.mad_hatter.mad_hatter import MadHatter
+from cat.db import crud
 
 
 # Base class to manage LLM configuration.
@@ -34,7 +37,7 @@ class LLMSettings(BaseModel):
             raise Exception(
                 "Language model configuration class has self._pyclass==None. Should be a valid LLM class"
             )
-        return cls._pyclass.default(**config)
+        return admitted_class(cls._pyclass.default, provider=cls.__name__)(**config)
 
 
 class LLMDefaultConfig(LLMSettings):
@@ -67,7 +70,7 @@ class LLMCustomConfig(LLMSettings):
             else:
                 config["options"] = {}
 
-        return cls._pyclass.default(**config)
+        return admitted_class(cls._pyclass.default, provider=cls.__name__)(**config)
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -287,6 +290,56 @@ class LLMGeminiChatConfig(LLMSettings):
     )
 
 
+class LLMRouterConfig(LLMSettings):
+    primary: str
+    secondary: str = ""
+    hedge_percentile: float = 95
+    hedge_min_delay: float = 2.0
+    timeout: float = 0
+    _pyclass: Type = LLMRouter
+
+    # instantiate primary and secondary LLMs from their saved settings
+    @classmethod
+    def get_llm_from_config(cls, config):
+        llms = {}
+        for role in ["primary", "secondary"]:
+            name = config.get(role, "")
+            if name == "":
+                llms[role] = None
+                continue
+            if name == cls.__name__:
+                raise Exception("LLM router cannot route to itself")
+
+            FactoryClass = get_llm_from_name(name)
+            if FactoryClass is None:
+                raise Exception(f"LLM router: {name} is not a valid language model")
+            setting = crud.get_setting_by_name(name=name)
+            if setting is None:
+                raise Exception(f"LLM router: {name} is not configured, save its settings first")
+            llms[role] = FactoryClass.get_llm_from_config(setting["value"])
+
+        # the router is not wrapped in admission control, the routed LLMs already are
+        return cls._pyclass.default(
+            primary=llms["primary"],
+            secondary=llms["secondary"],
+            primary_name=config["primary"],
+            secondary_name=config.get("secondary") or "secondary",
+            hedge_percentile=config.get("hedge_percentile", 95),
+            hedge_min_delay=config.get("hedge_min_delay", 2.0),
+            timeout=config.get("timeout") or None,
+        )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "humanReadableName": "LLM Router",
+            "description": "Routes prompts to a primary LLM, hedging to a secondary LLM when the primary is slow "
+            "and falling back to it when the primary fails. Both LLMs must be configured first: "
+            "set their settings class names (e.g. LLMOpenAIChatConfig). Timeout 0 means no timeout.",
+            "link": "",
+        }
+    )
+
+
 def get_allowed_language_models():
 
     list_llms_default = [
@@ -301,6 +354,7 @@ def get_allowed_language_models():
         LLMOllamaConfig,
         LLMOpenAICompatibleConfig,
         LLMCustomConfig,
+        LLMRouterConfig,
         LLMDefaultConfig,
     ]
 
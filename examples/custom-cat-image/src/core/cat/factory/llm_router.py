@@ -0,0 +1,339 @@
+import time
+import asyncio
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from cat.log import log
+
+
+# minimum number of samples before the latency percentile is used to decide when to hedge
+MIN_SAMPLES = 10
+
+
+class LatencyStats:
+    """Rolling latency statistics of a language model.
+
+    Latency is the time to the first streamed token, or to the whole answer for models not streaming.
+    """
+
+    def __init__(self, window: int = 200):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+            self.requests += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency percentile (0-100), `None` if there are not enough samples."""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+_latency_stats: Dict[str, LatencyStats] = {}
+_latency_stats_lock = threading.Lock()
+
+
+def get_latency_stats(name: str) -> LatencyStats:
+    with _latency_stats_lock:
+        if name not in _latency_stats:
+            _latency_stats[name] = LatencyStats()
+        return _latency_stats[name]
+
+
+def get_latency_stats_summary() -> Dict[str, Dict]:
+    return {name: stats.summary() for name, stats in _latency_stats.items()}
+
+
+class HedgeCancelled(Exception):
+    """Raised in the token stream of a request that lost the race."""
+
+
+class _Race:
+    """Shared state of the candidates answering the same prompt.
+
+    The first candidate streaming a token (or answering) wins: only its tokens are forwarded to the router callbacks.
+    """
+
+    def __init__(self, run_manager):
+        self.run_manager = run_manager
+        self.winner: Optional[str] = None
+        self.closed = False
+        self.first_token_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, name: str) -> bool:
+        with self._lock:
+            if self.closed and self.winner != name:
+                return False
+            if self.winner is None:
+                self.winner = name
+            if name not in self.first_token_at:
+                self.first_token_at[name] = time.monotonic()
+            return self.winner == name
+
+    def forfeit(self, name: str):
+        # the winner failed, let the fallback stream
+        with self._lock:
+            if self.winner == name:
+                self.winner = None
+
+
+class _HedgeTokenHandler(AsyncCallbackHandler):
+    raise_error = True
+
+    def __init__(self, race: _Race, name: str):
+        self.race = race
+        self.name = name
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if not self.race.claim(self.name):
+            # abort the stream of the losing request
+            raise HedgeCancelled(self.name)
+        if self.race.run_manager:
+            # the run manager of `_call` is not async
+            result = self.race.run_manager.on_llm_new_token(token)
+            if inspect.isawaitable(result):
+                await result
+
+
+def _output_to_text(output) -> str:
+    # completion models return a string, chat models a message
+    if isinstance(output, str):
+        return output
+    return output.content
+
+
+# event loop running the requests of `_call`, so the losing ones can be cancelled as in `_acall`
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm_router", daemon=True).start()
+        return _loop
+
+
+class LLMRouter(LLM):
+    """Route prompts to a primary LLM, hedging and falling back to a secondary one.
+
+    The prompt is sent to the primary LLM. If it does not answer (or stream a first token) within its
+    `hedge_percentile` latency, the same prompt is sent to the secondary LLM: whichever answers first is used
+    and the other request is cancelled. If the primary LLM fails, the secondary one is used as fallback.
+
+    Requests are async calls of the routed LLMs (also when the router is called synchronously, on a loop shared by
+    the router), so cancelling the losing one aborts its HTTP request. LLMs without an async implementation run in
+    a thread of the loop default executor instead: a losing request keeps its thread until it answers (if streaming,
+    until its next token), so hedging such LLMs costs up to one thread per hedged prompt.
+    """
+
+    # instantiated language models
+    primary: Any
+    secondary: Any = None
+
+    # names used to track latency statistics (settings class names)
+    primary_name: str = "primary"
+    secondary_name: str = "secondary"
+
+    # latency percentile of the primary LLM after which the secondary is queried
+    hedge_percentile: float = 95.0
+
+    # seconds to wait before hedging, until enough latency samples are available (and lower bound)
+    hedge_min_delay: float = 2.0
+
+    # seconds after which the request fails if no LLM answered, no timeout if `None`
+    timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "primary": self.primary_name,
+            "secondary": self.secondary_name,
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_min_delay": self.hedge_min_delay,
+            "timeout": self.timeout,
+        }
+
+    def _candidates(self) -> List[Tuple[str, Any]]:
+        candidates = [(self.primary_name, self.primary)]
+        if self.secondary is not None:
+            candidates.append((self.secondary_name, self.secondary))
+        return candidates
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary LLM before querying the secondary one."""
+        percentile = get_latency_stats(self.primary_name).percentile(self.hedge_percentile)
+        if percentile is None:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, percentile)
+
+    def _next_timeout(self, start: float, hedge_pending: bool) -> Optional[float]:
+        elapsed = time.monotonic() - start
+        timeouts = []
+        if hedge_pending:
+            timeouts.append(max(0.0, self.hedge_delay() - elapsed))
+        if self.timeout is not None:
+            timeouts.append(max(0.0, self.timeout - elapsed))
+        return min(timeouts) if timeouts else None
+
+    def _record(self, race: _Race, name: str, start: float, error: Exception = None):
+        stats = get_latency_stats(name)
+        if error is not None:
+            if not isinstance(error, (HedgeCancelled, asyncio.CancelledError)):
+                stats.add_error()
+            return
+        end = race.first_token_at.get(name, time.monotonic())
+        stats.add(end - start)
+
+    def _submit(self, race: _Race, name: str, llm, prompt: str, stop) -> Future:
+        # runs in a copy of the caller context, e.g. for the priority of LLM admission control;
+        # cancelling the future cancels the request
+        return asyncio.run_coroutine_threadsafe(self._arun(race, name, llm, prompt, stop), _get_loop())
+
+    async def _arun(self, race: _Race, name: str, llm, prompt: str, stop) -> str:
+        start = time.monotonic()
+        try:
+            output = await llm.ainvoke(prompt, config={"callbacks": [_HedgeTokenHandler(race, name)]}, stop=stop)
+        except BaseException as e:
+            self._record(race, name, start, e)
+            raise
+        self._record(race, name, start)
+        return _output_to_text(output)
+
+    def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs: Any,
+    ) -> str:
+
+        race = _Race(run_manager)
+        waiting = self._candidates()
+        start = time.monotonic()
+
+        name, llm = waiting.pop(0)
+        pending = {self._submit(race, name, llm, prompt, stop): name}
+        error = None
+        try:
+            while pending:
+                done, _ = wait(
+                    pending.keys(),
+                    timeout=self._next_timeout(start, len(waiting) > 0),
+                    return_when=FIRST_COMPLETED
+                )
+
+                if not done:
+                    if not waiting:
+                        raise TimeoutError(f"No LLM answered in {self.timeout} seconds")
+                    # primary is slow, hedge
+                    name, llm = waiting.pop(0)
+                    log.info(f"LLM router: hedging request to {name}")
+                    pending[self._submit(race, name, llm, prompt, stop)] = name
+                    continue
+
+                for future in done:
+                    name = pending.pop(future)
+                    if future.exception() is None and race.claim(name):
+                        return future.result()
+                    if future.exception() is not None and not isinstance(future.exception(), HedgeCancelled):
+                        error = future.exception()
+                        race.forfeit(name)
+                        log.warning(f"LLM router: {name} failed: {error}")
+
+                # a candidate failed, fall back to the next one
+                if not pending and waiting:
+                    name, llm = waiting.pop(0)
+                    pending[self._submit(race, name, llm, prompt, stop)] = name
+
+            raise error or RuntimeError("No LLM answered")
+        finally:
+            # losers are cancelled, and abort at their next token if already streaming
+            race.closed = True
+            for future in pending:
+                future.cancel()
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs: Any,
+    ) -> str:
+
+        race = _Race(run_manager)
+        waiting = self._candidates()
+        start = time.monotonic()
+
+        name, llm = waiting.pop(0)
+        pending = {asyncio.create_task(self._arun(race, name, llm, prompt, stop)): name}
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending.keys(),
+                    timeout=self._next_timeout(start, len(waiting) > 0),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    if not waiting:
+                        raise TimeoutError(f"No LLM answered in {self.timeout} seconds")
+                    name, llm = waiting.pop(0)
+                    log.info(f"LLM router: hedging request to {name}")
+                    pending[asyncio.create_task(self._arun(race, name, llm, prompt, stop))] = name
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None and race.claim(name):
+                        return task.result()
+                    if task.exception() is not None and not isinstance(task.exception(), HedgeCancelled):
+                        error = task.exception()
+                        race.forfeit(name)
+                        log.warning(f"LLM router: {name} failed: {error}")
+
+                if not pending and waiting:
+                    name, llm = waiting.pop(0)
+                    pending[asyncio.create_task(self._arun(race, name, llm, prompt, stop))] = name
+
+            raise error or RuntimeError("No LLM answered")
+        finally:
+            race.closed = True
+            for task in pending:
+                task.cancel()
@@ -1,12 +1,20 @@
 from typing import Any, Optional, List, Iterator, AsyncIterator, Type
 
-import requests
 from cat.mad_hatter.decorators import tool, hook, plugin
-import aiohttp
 import langchain.llms.ollama
+from langchain_community.llms.ollama import OllamaEndpointNotFoundError
 
 from pydantic import ConfigDict
 
+from cat.factory.http_client import get_http_client, get_async_http_client
+
+
+def _timeout_kwargs(timeout: Optional[int]) -> dict:
+    # without an explicit Ollama timeout, keep the shared client default
+    if timeout is None:
+        return {}
+    return {"timeout": timeout}
+
 def _create_stream_patch(
         self,
         api_url: str,
@@ -42,30 +50,30 @@ def _create_stream_patch(
             **params,
         }
 
-    response = requests.post(
+    with get_http_client().stream(
+        "POST",
         url=api_url,
         headers={
             "Content-Type": "application/json",
         },
         json=request_payload,
-        stream=True,
-        timeout=self.timeout,
-    )
-    response.encoding = "utf-8"
-    if response.status_code != 200:
-        if response.status_code == 404:
-            raise OllamaEndpointNotFoundError(  # noqa: F821
-                "Ollama call failed with status code 404. "
-                "Maybe your model is not found "
-                f"and you should pull the model with `ollama pull {self.model}`."
-            )
-        else:
-            optional_detail = response.json().get("error")
-            raise ValueError(
-                f"Ollama call failed with status code {response.status_code}."
-                f" Details: {optional_detail}"
-            )
-    return response.iter_lines(decode_unicode=True)
+        **_timeout_kwargs(self.timeout),
+    ) as response:
+        if response.status_code != 200:
+            response.read()
+            if response.status_code == 404:
+                raise OllamaEndpointNotFoundError(
+                    "Ollama call failed with status code 404. "
+                    "Maybe your model is not found "
+                    f"and you should pull the model with `ollama pull {self.model}`."
+                )
+            else:
+                optional_detail = response.json().get("error")
+                raise ValueError(
+                    f"Ollama call failed with status code {response.status_code}."
+                    f" Details: {optional_detail}"
+                )
+        yield from response.iter_lines()
 
 
 async def _acreate_stream_patch(
@@ -105,23 +113,24 @@ async def _acreate_stream_patch(
             **params,
         }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-                url=api_url,
-                headers={"Content-Type": "application/json"},
-                json=request_payload,
-                timeout=self.timeout,
-        ) as response:
-            if response.status != 200:
-                if response.status == 404:
-                    raise OllamaEndpointNotFoundError( # noqa: F821
-                        "Ollama call failed with status code 404."
-                    )
-                else:
-                    optional_detail = await response.json().get("error")
-                    raise ValueError(
-                        f"Ollama call failed with status code {response.status}."
-                        f" Details: {optional_detail}"
-                    )
-            async for line in response.content:
-                yield line.decode("utf-8")
\ No newline at end of file
+    async with get_async_http_client().stream(
+            "POST",
+            url=api_url,
+            headers={"Content-Type": "application/json"},
+            json=request_payload,
+            **_timeout_kwargs(self.timeout),
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            if response.status_code == 404:
+                raise OllamaEndpointNotFoundError(
+                    "Ollama call failed with status code 404."
+                )
+            else:
+                optional_detail = response.json().get("error")
+                raise ValueError(
+                    f"Ollama call failed with status code {response.status_code}."
+                    f" Details: {optional_detail}"
+                )
+        async for line in response.aiter_lines():
+            yield line
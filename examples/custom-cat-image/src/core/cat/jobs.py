@@ -0,0 +1,508 @@
+"""Durable ingestion jobs of the Rabbit Hole.
+
+Uploads (files, URLs, crawls, archives and memory exports) are not ingested in the request background tasks but submitted as jobs:
+
+    - job records are persisted in a TinyDB file, and the checkpoint of the chunks already stored in a file per job
+      (so the records are not rewritten at every batch);
+    - uploaded files are copied in the jobs folder, so they survive a restart;
+    - jobs run on a bounded pool of worker threads, higher `priority` first;
+    - a job can be cancelled while queued or running;
+    - jobs interrupted by a shutdown are resumed at the next boot, skipping the chunks already stored;
+    - records of finished jobs are removed after a while.
+
+Chunks are checkpointed by batch (see `RabbitHole.ingest_file`), and stored with ids derived from the job id and
+their position in the document: a batch stored again after an interruption overwrites its own points.
+Bulk ingestions of folders and archives (see `RabbitHole.ingest_bulk`) are checkpointed by file.
+
+Configuration is read from environment variables:
+
+    - `RABBITHOLE_JOB_WORKERS`: jobs running at the same time (default 2);
+    - `RABBITHOLE_JOBS_FOLDER`: folder of the job records and uploaded files
+      (by default `rabbithole_jobs` next to the metadata file);
+    - `RABBITHOLE_JOBS_RETENTION`: seconds the records of finished jobs are kept (default 7 days).
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import itertools
+import threading
+from enum import Enum
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from tinydb import TinyDB, Query
+
+from cat.db.database import Database
+from cat.looking_glass.stray_cat import StrayCat
+from cat.log import log
+from cat import metrics
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+# seconds between checks of the stop flag while waiting for jobs
+_POLL_INTERVAL = 0.1
+
+# progress of a job (checkpoint, chunks stored), in the folder of the job
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class JobInterrupted(Exception):
+    """The job has been cancelled, or the Cat is shutting down."""
+
+
+def get_jobs_folder() -> str:
+    """Folder of the job records and uploaded files, from the `RABBITHOLE_JOBS_FOLDER` environment variable.
+
+    Defaults to `rabbithole_jobs` in the folder of the metadata file.
+    """
+    default = os.path.join(os.path.dirname(Database().get_file_name()), "rabbithole_jobs")
+    return os.getenv("RABBITHOLE_JOBS_FOLDER", default)
+
+
+def get_jobs_retention() -> float:
+    """Seconds the records of finished jobs are kept, from the `RABBITHOLE_JOBS_RETENTION` environment variable."""
+    return float(os.getenv("RABBITHOLE_JOBS_RETENTION", 7 * 24 * 60 * 60))
+
+
+class IngestionJob:
+    """Running ingestion job, with the checkpoint of the batches of chunks already stored.
+
+    A document is ingested in parts (e.g. PDF pages), and the chunks of each part in batches.
+    The checkpoint holds the number of leading parts completely stored and the batches stored of the following parts,
+    or, for bulk ingestions, the chunks stored for each file completely ingested.
+    """
+
+    def __init__(self, record: Dict, jobs: "IngestionJobs"):
+        self.id = record["job_id"]
+        self.kind = record["kind"]
+        self.source = record["source"]
+        self.path = record.get("path")
+        self.user_id = record.get("user_id")
+        self.chunk_size = record.get("chunk_size")
+        self.chunk_overlap = record.get("chunk_overlap")
+        self.incremental = record.get("incremental", False)
+        self.max_depth = record.get("max_depth")
+        self.max_pages = record.get("max_pages")
+        self.priority = record.get("priority", 0)
+        self.chunks = record.get("chunks", 0)
+
+        checkpoint = record.get("checkpoint") or {}
+        self.__parts = checkpoint.get("parts", 0)
+        self.__committed: Dict[int, set] = {int(p): set(b) for p, b in checkpoint.get("batches", {}).items()}
+        self.__files: Dict[str, int] = dict(checkpoint.get("files", {}))
+        self.__batches: Dict[int, int] = {}
+
+        self.__jobs = jobs
+        self.__lock = threading.Lock()
+        self.__cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def cancel(self):
+        self.__cancelled.set()
+
+    def raise_if_stopped(self):
+        """Raise `JobInterrupted` if the job has been cancelled or the Cat is shutting down."""
+        if self.cancelled or self.__jobs.stopping:
+            raise JobInterrupted(f"Ingestion of {self.source} interrupted")
+
+    def part_committed(self, part: int) -> bool:
+        """Whether all the chunks of a part have been stored."""
+        with self.__lock:
+            return part < self.__parts
+
+    def is_committed(self, part: int, batch: int) -> bool:
+        """Whether a batch of chunks of a part has been stored."""
+        with self.__lock:
+            return part < self.__parts or batch in self.__committed.get(part, ())
+
+    def progress(self) -> Dict:
+        """Chunks stored so far, and files ingested by a bulk ingestion."""
+        progress = {"chunks": self.chunks}
+        if self.kind in ("archive", "folder"):
+            progress["files_ingested"] = len(self.__files)
+        return progress
+
+    def set_batches(self, part: int, batches: int):
+        """Record the number of batches of a part, once split."""
+        with self.__lock:
+            self.__batches[part] = batches
+            self.__advance()
+            self.__save()
+
+    def commit(self, key: Tuple[int, int], chunks: int):
+        """Record a batch of chunks as stored, `key` is the (part, batch) of the batch."""
+        part, batch = key
+        with self.__lock:
+            self.__committed.setdefault(part, set()).add(batch)
+            self.chunks += chunks
+            self.__advance()
+            self.__save()
+
+    def point_ids(self, key: Tuple[int, int], n: int) -> List[str]:
+        """Ids of the points of a batch, the same at every run of the job."""
+        namespace = uuid.UUID(self.id)
+        part, batch = key
+        return [uuid.uuid5(namespace, f"{part}-{batch}-{i}").hex for i in range(n)]
+
+    def files_committed(self) -> Dict[str, int]:
+        """Files completely ingested by a bulk ingestion, with the number of chunks stored for each one."""
+        with self.__lock:
+            return dict(self.__files)
+
+    def commit_file(self, name: str, chunks: int):
+        """Record a file of a bulk ingestion as completely ingested."""
+        with self.__lock:
+            self.__files[name] = chunks
+            self.chunks += chunks
+            self.__save()
+
+    def chunk_ids(self, name: str, part: int, n: int) -> List[str]:
+        """Ids of the chunks of a part of a file of a bulk ingestion, the same at every run of the job."""
+        namespace = uuid.UUID(self.id)
+        return [uuid.uuid5(namespace, f"{name}-{part}-{i}").hex for i in range(n)]
+
+    def __advance(self):
+        # move the leading parts completely stored out of the pending ones
+        while self.__parts in self.__batches and \
+                len(self.__committed.get(self.__parts, ())) >= self.__batches[self.__parts]:
+            self.__committed.pop(self.__parts, None)
+            self.__batches.pop(self.__parts)
+            self.__parts += 1
+
+    def __save(self):
+        # under the lock, so checkpoints are saved in order
+        self.__jobs._checkpoint(self.id, checkpoint=self.__checkpoint(), **self.progress())
+
+    def __checkpoint(self) -> Dict:
+        checkpoint = {
+            "parts": self.__parts,
+            "batches": {str(p): sorted(b) for p, b in self.__committed.items()},
+        }
+        if self.__files:
+            checkpoint["files"] = dict(self.__files)
+        return checkpoint
+
+
+class IngestionJobs:
+    """Queue and workers of the ingestion jobs.
+
+    Parameters
+    ----------
+    strays : dict
+        Sessions of the users, jobs run with the session of the user who submitted them.
+    main_loop : asyncio.AbstractEventLoop
+        Event loop of the web server, to create the sessions of the users of resumed jobs.
+    folder : str
+        Folder of the job records and uploaded files, `get_jobs_folder()` by default.
+    workers : int
+        Number of jobs running at the same time, the `RABBITHOLE_JOB_WORKERS` environment variable by default.
+    """
+
+    def __init__(self, strays: Dict, main_loop, folder: str = None, workers: int = None):
+        self.strays = strays
+        self.main_loop = main_loop
+        self.folder = folder or get_jobs_folder()
+        self.workers = workers or int(os.getenv("RABBITHOLE_JOB_WORKERS", 2))
+
+        os.makedirs(self.folder, exist_ok=True)
+        self.db = TinyDB(os.path.join(self.folder, "jobs.json"))
+
+        self.__db_lock = threading.Lock()
+        self.__queue = queue.PriorityQueue()
+        self.__sequence = itertools.count()
+        # queued and running jobs
+        self.__active: Dict[str, IngestionJob] = {}
+        self.__stop = threading.Event()
+        self.__threads: List[threading.Thread] = []
+
+    @property
+    def stopping(self) -> bool:
+        return self.__stop.is_set()
+
+    def start(self):
+        """Queue the jobs interrupted by the last shutdown and start the workers."""
+
+        self.__prune()
+        for record in self.__search(
+                (Query().status == JobStatus.QUEUED) | (Query().status == JobStatus.RUNNING)
+        ):
+            log.info(f"Resuming ingestion of {record['source']} (job {record['job_id']})")
+            self._update(record["job_id"], status=JobStatus.QUEUED)
+            self.__enqueue(IngestionJob(record | self.__load_checkpoint(record["job_id"]), self))
+
+        for w in range(self.workers):
+            thread = threading.Thread(target=self.__work, name=f"ingestion-job-{w}", daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+
+    def shutdown(self, timeout: float = 10):
+        """Stop the workers. Running jobs are interrupted, and resumed at the next start."""
+        self.__stop.set()
+        for thread in self.__threads:
+            thread.join(timeout)
+        self.__threads = []
+
+    def submit_file(
+            self,
+            stray,
+            file: BinaryIO,
+            filename: str,
+            chunk_size: int,
+            chunk_overlap: int,
+            priority: int = 0,
+            incremental: bool = False,
+    ) -> Dict:
+        """Copy an uploaded file in the jobs folder and queue its ingestion."""
+        return self.__submit(stray, "file", filename, file, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                             priority=priority, incremental=incremental)
+
+    def submit_url(
+            self,
+            stray,
+            url: str,
+            chunk_size: int,
+            chunk_overlap: int,
+            priority: int = 0,
+            incremental: bool = False,
+    ) -> Dict:
+        """Queue the ingestion of a web page."""
+        return self.__submit(stray, "url", url, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                             priority=priority, incremental=incremental)
+
+    def submit_crawl(
+            self,
+            stray,
+            url: str,
+            chunk_size: int,
+            chunk_overlap: int,
+            max_depth: int,
+            max_pages: int,
+            priority: int = 0,
+    ) -> Dict:
+        """Queue the crawl of a website, from a page."""
+        return self.__submit(stray, "crawl", url, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                             max_depth=max_depth, max_pages=max_pages, priority=priority, report=None)
+
+    def submit_archive(
+            self,
+            stray,
+            file: BinaryIO,
+            filename: str,
+            chunk_size: int,
+            chunk_overlap: int,
+            priority: int = 0,
+            incremental: bool = False,
+    ) -> Dict:
+        """Copy an uploaded zip/tar archive in the jobs folder and queue the ingestion of its files."""
+        return self.__submit(stray, "archive", filename, file, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                             priority=priority, incremental=incremental, files_ingested=0, report=None)
+
+    def submit_folder(
+            self,
+            stray,
+            path: str,
+            chunk_size: int,
+            chunk_overlap: int,
+            priority: int = 0,
+            incremental: bool = False,
+    ) -> Dict:
+        """Queue the ingestion of the files of a server-side folder (or archive), see `cat.bulk.resolve_server_path`."""
+        return self.__submit(stray, "folder", path, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                             priority=priority, incremental=incremental, files_ingested=0, report=None)
+
+    def submit_memory(self, stray, file: BinaryIO, filename: str, priority: int = 0) -> Dict:
+        """Copy an uploaded memory export in the jobs folder and queue its import."""
+        return self.__submit(stray, "memory", filename, file, priority=priority)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job record, `None` if there is no such job."""
+        records = self.__search(Query().job_id == job_id)
+        return self.__public(records[0]) if records else None
+
+    def list(self) -> List[Dict]:
+        """All the job records, most recent first."""
+        records = self.__search(Query().job_id.exists())
+        return [self.__public(r) for r in sorted(records, key=lambda r: r["created_at"], reverse=True)]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued or running job. Returns the job record, `None` if there is no such job."""
+        record = self.get(job_id)
+        if record is None or record["status"] in FINAL_STATUSES:
+            return record
+
+        job = self.__active.get(job_id)
+        if job is not None:
+            job.cancel()
+        if record["status"] == JobStatus.QUEUED:
+            # a running job is marked as cancelled by its worker, once stopped
+            self.__finish(job_id, JobStatus.CANCELLED)
+        return self.get(job_id)
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        with self.__db_lock:
+            self.db.update(fields, Query().job_id == job_id)
+
+    def _checkpoint(self, job_id: str, **fields):
+        """Save the progress of a running job in its own file, the job record is updated when the job is over."""
+        folder = os.path.join(self.folder, job_id)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(fields, f)
+        # never left half written by a crash
+        os.replace(path + ".tmp", path)
+
+    def __load_checkpoint(self, job_id: str) -> Dict:
+        try:
+            with open(os.path.join(self.folder, job_id, CHECKPOINT_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def __prune(self):
+        # records of the jobs finished long ago
+        expired = time.time() - get_jobs_retention()
+        with self.__db_lock:
+            removed = self.db.remove(Query().status.one_of(list(FINAL_STATUSES)) & (Query().updated_at < expired))
+        if removed:
+            log.info(f"Removed {len(removed)} finished ingestion jobs")
+
+    def __search(self, query) -> List[Dict]:
+        with self.__db_lock:
+            return self.db.search(query)
+
+    def __public(self, record: Dict) -> Dict:
+        public = {k: v for k, v in record.items() if k not in ("path", "checkpoint")}
+        job = self.__active.get(record["job_id"])
+        if job is not None and record["status"] == JobStatus.RUNNING:
+            # progress is saved in the record when the job is over
+            public.update(job.progress())
+        return public
+
+    def __submit(self, stray, kind: str, source: str, file: BinaryIO = None, **fields) -> Dict:
+        job_id = str(uuid.uuid4())
+
+        path = None
+        if file is not None:
+            folder = os.path.join(self.folder, job_id)
+            os.makedirs(folder)
+            path = os.path.join(folder, os.path.basename(source))
+            with open(path, "wb") as f:
+                shutil.copyfileobj(file, f)
+
+        now = time.time()
+        record = {
+            "job_id": job_id,
+            "kind": kind,
+            "source": source,
+            "path": path,
+            "user_id": stray.user_id,
+            "status": JobStatus.QUEUED,
+            "chunks": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            **fields,
+        }
+        with self.__db_lock:
+            self.db.insert(record)
+
+        self.__enqueue(IngestionJob(record, self))
+        metrics.increment("ingestion_jobs_submitted")
+        return self.__public(record)
+
+    def __enqueue(self, job: IngestionJob):
+        self.__active[job.id] = job
+        self.__queue.put((-job.priority, next(self.__sequence), job.id))
+        metrics.add_to_gauge("ingestion_jobs_queued", 1)
+
+    def __work(self):
+        while not self.__stop.is_set():
+            try:
+                _, _, job_id = self.__queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            metrics.add_to_gauge("ingestion_jobs_queued", -1)
+
+            job = self.__active.get(job_id)
+            if job is None or job.cancelled:
+                self.__active.pop(job_id, None)
+                continue
+            try:
+                self.__run(job)
+            finally:
+                self.__active.pop(job_id, None)
+
+    def __run(self, job: IngestionJob):
+        self._update(job.id, status=JobStatus.RUNNING)
+        stray = self.__get_stray(job.user_id)
+        metrics.add_to_gauge("ingestion_jobs_running", 1)
+        try:
+            if job.kind == "memory":
+                stray.rabbit_hole.ingest_memory(stray, job.path, job=job)
+            elif job.kind in ("archive", "folder"):
+                report = stray.rabbit_hole.ingest_bulk(
+                    stray, job.path or job.source, job.chunk_size, job.chunk_overlap,
+                    job=job, incremental=job.incremental
+                )
+                self._update(job.id, report=report)
+            elif job.kind == "crawl":
+                report = stray.rabbit_hole.ingest_crawl(
+                    stray, job.source, job.chunk_size, job.chunk_overlap, job.max_depth, job.max_pages, job=job
+                )
+                job.chunks = report["chunks"]
+                self._update(job.id, report=report)
+            else:
+                stray.rabbit_hole.ingest_file(
+                    stray, job.path or job.source, job.chunk_size, job.chunk_overlap,
+                    job=job, incremental=job.incremental
+                )
+        except Exception as e:
+            if job.cancelled:
+                log.warning(f"Ingestion of {job.source} cancelled")
+                stray.send_ws_message(f"Ingestion of {job.source} cancelled")
+                self.__finish(job.id, JobStatus.CANCELLED)
+            elif isinstance(e, JobInterrupted):
+                # shutting down, the job is resumed at the next start
+                log.warning(f"Ingestion of {job.source} interrupted, it will be resumed at restart")
+                self._update(job.id, status=JobStatus.QUEUED)
+            else:
+                log.error(f"Ingestion of {job.source} failed")
+                log.error(e)
+                stray.send_ws_message(f"Ingestion of {job.source} failed: {e}", "error")
+                self.__finish(job.id, JobStatus.FAILED, error=str(e))
+        else:
+            self.__finish(job.id, JobStatus.COMPLETED)
+        finally:
+            metrics.add_to_gauge("ingestion_jobs_running", -1)
+
+    def __finish(self, job_id: str, status: JobStatus, error: str = None):
+        job = self.__active.get(job_id)
+        progress = job.progress() if job is not None else {}
+        self._update(job_id, status=status, error=error, **progress)
+        metrics.increment(f"ingestion_jobs_{status.value}")
+        # uploaded files and checkpoint are not needed anymore
+        shutil.rmtree(os.path.join(self.folder, job_id), ignore_errors=True)
+        self.__prune()
+
+    def __get_stray(self, user_id: str):
+        # same as `cat.headers.session`, the user may not be connected (e.g. jobs resumed at boot)
+        if user_id not in self.strays:
+            self.strays[user_id] = StrayCat(user_id=user_id, main_loop=self.main_loop)
+        return self.strays[user_id]
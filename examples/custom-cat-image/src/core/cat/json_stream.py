@@ -0,0 +1,178 @@
+"""Incremental reader of large JSON files.
+
+The file is read in chunks, and only the values asked for are decoded: the others are skipped scanning for brackets
+and strings, without building them. Memory exports can be imported one point at a time this way.
+
+Examples
+--------
+>>> stream = JSONStream(open("export.json", "rb"))
+>>> for key in stream.members():
+...     if key == "collections":
+...         for collection in stream.members():
+...             for _ in stream.items():
+...                 point = stream.value()
+"""
+
+import re
+import json
+import codecs
+from typing import Any, BinaryIO, Iterator
+
+
+_WHITESPACE = re.compile(r"\s*")
+# characters after the end of a number or literal
+_SCALAR_END = re.compile(r"[\s,\]}]")
+# characters changing the nesting of the skipped values
+_STRUCTURE = re.compile(r'["\[\]{}]')
+# rest of a string, after the opening quote
+_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+
+class JSONStream:
+    """Pull reader of a JSON document.
+
+    `members` and `items` iterate over the object or array at the current position, the value of each member or
+    item can then be read with `value`, iterated again with `members` and `items`, or left alone to be skipped.
+
+    Parameters
+    ----------
+    file : BinaryIO
+        UTF-8 encoded JSON document.
+    chunk_size : int
+        Bytes read at a time.
+    """
+
+    def __init__(self, file: BinaryIO, chunk_size: int = 1024 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.__decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__json = json.JSONDecoder()
+        self.__buffer = ""
+        self.__pos = 0
+        self.__eof = False
+        # values started, to know whether the value of a member or item was read
+        self.__started = 0
+
+    def value(self) -> Any:
+        """Decode the value at the current position."""
+        self.__started += 1
+        if self.__peek() not in ('"', "[", "{"):
+            # a number may go on in the next chunk, read up to its end
+            while _SCALAR_END.search(self.__buffer, self.__pos) is None and self.__fill():
+                pass
+        while True:
+            try:
+                value, end = self.__json.raw_decode(self.__buffer, self.__pos)
+            except json.JSONDecodeError:
+                if self.__fill():
+                    continue
+                raise
+            self.__pos = end
+            return value
+
+    def skip(self):
+        """Move past the value at the current position, without decoding it."""
+        if self.__peek() not in ("[", "{"):
+            self.value()
+            return
+
+        self.__started += 1
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.__buffer, self.__pos)
+            if match is None:
+                self.__pos = len(self.__buffer)
+                self.__require_fill()
+                continue
+            self.__pos = match.end()
+            char = match.group()
+            if char == '"':
+                self.__skip_string()
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def members(self) -> Iterator[str]:
+        """Iterate over the keys of the object at the current position, the stream is left at the value of each key."""
+        self.__started += 1
+        self.__expect("{")
+        if self.__peek() == "}":
+            self.__pos += 1
+            return
+        while True:
+            key = self.value()
+            self.__expect(":")
+            started = self.__started
+            yield key
+            if self.__started == started:
+                self.skip()
+            if not self.__next("}"):
+                return
+
+    def items(self) -> Iterator[int]:
+        """Iterate over the array at the current position, the stream is left at each item (yields its index)."""
+        self.__started += 1
+        self.__expect("[")
+        if self.__peek() == "]":
+            self.__pos += 1
+            return
+        index = 0
+        while True:
+            started = self.__started
+            yield index
+            if self.__started == started:
+                self.skip()
+            if not self.__next("]"):
+                return
+            index += 1
+
+    def __fill(self) -> bool:
+        """Read the next chunk, dropping the part of the buffer already read. False at the end of the file."""
+        if self.__eof:
+            return False
+        data = self.file.read(self.chunk_size)
+        self.__eof = not data
+        self.__buffer = self.__buffer[self.__pos:] + self.__decoder.decode(data, final=self.__eof)
+        self.__pos = 0
+        return not self.__eof
+
+    def __require_fill(self):
+        if not self.__fill():
+            raise ValueError("Unexpected end of the JSON document")
+
+    def __peek(self) -> str:
+        """Next character that is not whitespace, empty at the end of the file."""
+        while True:
+            self.__pos = _WHITESPACE.match(self.__buffer, self.__pos).end()
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__fill():
+                return ""
+
+    def __expect(self, char: str):
+        found = self.__peek()
+        if found != char:
+            raise ValueError(f"Invalid JSON document: expected `{char}`, found `{found}`")
+        self.__pos += 1
+
+    def __next(self, closing: str) -> bool:
+        """Move past the separator after a member or item, False at the end of the object or array."""
+        found = self.__peek()
+        self.__pos += 1
+        if found == ",":
+            return True
+        if found == closing:
+            return False
+        raise ValueError(f"Invalid JSON document: expected `,` or `{closing}`, found `{found}`")
+
+    def __skip_string(self):
+        while True:
+            match = _STRING_END.match(self.__buffer, self.__pos)
+            if match is not None:
+                self.__pos = match.end()
+                return
+            # the string goes on in the next chunk, keep it in the buffer
+            self.__require_fill()
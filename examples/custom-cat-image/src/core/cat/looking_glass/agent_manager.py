@@ -17,6 +17,7 @@ from cat.mad_hatter.mad_hatter import MadHatter
 from cat.mad_hatter.decorators.tool import CatTool
 from cat.looking_glass import prompts
 from cat.looking_glass.callbacks import NewTokenHandler
+from cat.looking_glass.prompt_budget import PromptBudget
 from cat.looking_glass.output_parser import ChooseProcedureOutputParser, AgentAction, AgentFinish
 from cat.utils import verbal_timedelta
 from cat.log import log
@@ -83,10 +84,10 @@ class AgentManager:
             input_variables=["input", "intermediate_steps"]
         )
 
-        # main chain
+        # main chain (tool selection only needs the utility LLM)
         agent_chain = LLMChain(
             prompt=prompt,
-            llm=stray._llm,
+            llm=stray._utility_llm,
             verbose=self.verbose
         )
 
@@ -179,6 +180,10 @@ class AgentManager:
             Reply of the Agent in the format `{"output": ..., "intermediate_steps": ...}`.
         """
 
+        # token budget for each section of the prompt, applied while formatting the agent input
+        token_budget = self.mad_hatter.execute_hook("agent_prompt_token_budget", {}, cat=stray)
+        stray.working_memory["prompt_budget"] = PromptBudget(stray._llm, token_budget)
+
         # prepare input to be passed to the agent.
         #   Info will be extracted from working memory
         agent_input = self.format_agent_input(stray.working_memory)
@@ -239,6 +244,9 @@ class AgentManager:
 
         The method formats the strings of recalled memories and chat history that will be provided to the Langchain
         Agent and inserted in the prompt.
+        If `working_memory["prompt_budget"]` is set, memories and chat history are added by score (and recency) until
+        the token budget of their prompt section is used up, and the token count of each section is stored in
+        `working_memory["prompt_tokens"]`.
 
         Returns
         -------
@@ -253,26 +261,46 @@ class AgentManager:
 
         See Also
         --------
+        agent_prompt_token_budget
         agent_prompt_episodic_memories
         agent_prompt_declarative_memories
         agent_prompt_chat_history
         """
 
-
+        budget = working_memory.get("prompt_budget")
+        if budget is None:
+            # no budget was set up for this turn, insert everything as is
+            return {
+                "input": working_memory["user_message_json"]["text"],
+                "episodic_memory": self.agent_prompt_episodic_memories(working_memory["episodic_memories"]),
+                "declarative_memory": self.agent_prompt_declarative_memories(working_memory["declarative_memories"]),
+                "chat_history": self.agent_prompt_chat_history(working_memory["history"]),
+            }
 
         # format memories to be inserted in the prompt
-        episodic_memory_formatted_content = self.agent_prompt_episodic_memories(
-            working_memory["episodic_memories"]
+        episodic_memory_formatted_content = budget.report(
+            "episodic_memory",
+            self.agent_prompt_episodic_memories(
+                budget.select_memories("episodic_memory", working_memory["episodic_memories"])
+            )
         )
-        declarative_memory_formatted_content = self.agent_prompt_declarative_memories(
-            working_memory["declarative_memories"]
+        declarative_memory_formatted_content = budget.report(
+            "declarative_memory",
+            self.agent_prompt_declarative_memories(
+                budget.select_memories("declarative_memory", working_memory["declarative_memories"])
+            )
         )
 
         # format conversation history to be inserted in the prompt
-        conversation_history_formatted_content = self.agent_prompt_chat_history(
-            working_memory["history"]
+        conversation_history_formatted_content = budget.report(
+            "chat_history",
+            self.agent_prompt_chat_history(
+                budget.select_chat_history(working_memory["history"])
+            )
         )
 
+        working_memory["prompt_tokens"] = budget.tokens
+
         return {
             "input": working_memory["user_message_json"]["text"],
             "episodic_memory": episodic_memory_formatted_content,
@@ -2,11 +2,20 @@
 from langchain.callbacks.base import BaseCallbackHandler
 
 
+class TurnCancelled(Exception):
+    """Raised inside a conversation turn cancelled by `StrayCat.cancel` (e.g. the client disconnected)."""
+
+
 class NewTokenHandler(BaseCallbackHandler):
 
+    # let `TurnCancelled` abort the LLM stream
+    raise_error = True
+
     def __init__(self, stray):
         # cat could be an instance of CheshireCat or StrayCat
         self.stray = stray
         
     def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if getattr(self.stray, "cancelled", False):
+            raise TurnCancelled()
         self.stray.send_ws_message(token, msg_type="chat_token")
@@ -12,6 +12,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 from cat.db import crud
 from cat.factory.custom_llm import CustomOpenAI
+from cat.factory.admission import original_class
+from cat.factory.llm_router import LLMRouter
 from cat.factory.embedder import get_embedder_from_name
 import cat.factory.embedder as embedders
 from cat.factory.llm import LLMDefaultConfig
@@ -97,6 +99,7 @@ class CheshireCat():
         """
         # LLM and embedder
         self._llm = self.load_language_model()
+        self._utility_llm = self.load_utility_language_model()
         self.embedder = self.load_language_embedder()
 
     def load_language_model(self) -> BaseLanguageModel:
@@ -136,6 +139,38 @@ class CheshireCat():
 
         return llm
 
+    def load_utility_language_model(self) -> BaseLanguageModel:
+        """Utility Large Language Model selection at bootstrap time.
+
+        The utility LLM answers short, structured prompts (tools selection and forms extraction).
+        It is meant to be smaller and faster than the main LLM, and defaults to it if not configured.
+
+        Returns
+        -------
+        llm : BaseLanguageModel
+            Langchain `BaseLanguageModel` instance of the selected utility model, or the main LLM.
+        """
+
+        selected_llm = crud.get_setting_by_name(name="llm_utility_selected")
+
+        if selected_llm is None:
+            return self._llm
+
+        # get LLM factory class
+        selected_llm_class = selected_llm["value"]["name"]
+        FactoryClass = get_llm_from_name(selected_llm_class)
+
+        # obtain configuration and instantiate LLM
+        selected_llm_config = crud.get_setting_by_name(name=f"utility_{selected_llm_class}")
+        try:
+            llm = FactoryClass.get_llm_from_config(selected_llm_config["value"])
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            llm = self._llm
+
+        return llm
+
     def load_language_embedder(self) -> embedders.EmbedderSettings:
         """Hook into the  embedder selection.
 
@@ -173,26 +208,31 @@ class CheshireCat():
                 embedder = embedders.EmbedderDumbConfig.get_embedder_from_config({})
             return embedder
 
+        # LLM class, as instantiated by the factory before admission control
+        # (a router is matched by its primary LLM)
+        llm = self._llm.primary if isinstance(self._llm, LLMRouter) else self._llm
+        llm_class = original_class(llm)
+
         # OpenAI embedder
-        if type(self._llm) in [OpenAI, ChatOpenAI]:
+        if llm_class in [OpenAI, ChatOpenAI]:
             embedder = embedders.EmbedderOpenAIConfig.get_embedder_from_config(
                 {
-                    "openai_api_key": self._llm.openai_api_key,
+                    "openai_api_key": llm.openai_api_key,
                 }
             )
 
         # Azure
-        elif type(self._llm) in [AzureOpenAI, AzureChatOpenAI]:
+        elif llm_class in [AzureOpenAI, AzureChatOpenAI]:
             embedder = embedders.EmbedderAzureOpenAIConfig.get_embedder_from_config(
                 {
-                    "openai_api_key": self._llm.openai_api_key,
+                    "openai_api_key": llm.openai_api_key,
                     "openai_api_type": "azure",
                     "model": "text-embedding-ada-002",
                     # Now the only model for embeddings is text-embedding-ada-002
                     # It is also possible to use the Azure "deployment" name that is user defined
                     # when the model is deployed to Azure.
                     # "deployment": "my-text-embedding-ada-002",
-                    "openai_api_base": self._llm.openai_api_base,
+                    "openai_api_base": llm.openai_api_base,
                     # https://learn.microsoft.com/en-us/azure/cognitive-services/openai/reference#embeddings
                     # current supported versions 2022-12-01,2023-03-15-preview, 2023-05-15
                     # Don't mix api versions https://github.com/hwchase17/langchain/issues/4775
@@ -201,27 +241,27 @@ class CheshireCat():
             )
 
         # Cohere
-        elif type(self._llm) in [Cohere]:
+        elif llm_class in [Cohere]:
             embedder = embedders.EmbedderCohereConfig.get_embedder_from_config(
                 {
-                    "cohere_api_key": self._llm.cohere_api_key,
+                    "cohere_api_key": llm.cohere_api_key,
                     "model": "embed-multilingual-v2.0",
                     # Now the best model for embeddings is embed-multilingual-v2.0
                 }
             )
 
         # Llama-cpp-python
-        elif type(self._llm) in [CustomOpenAI]:
+        elif llm_class in [CustomOpenAI]:
             embedder = embedders.EmbedderOpenAICompatibleConfig.get_embedder_from_config(
                 {
-                    "url": self._llm.url
+                    "url": llm.url
                 }
             )
-        elif type(self._llm) in [ChatGoogleGenerativeAI]:
+        elif llm_class in [ChatGoogleGenerativeAI]:
             embedder = embedders.EmbedderGeminiChatConfig.get_embedder_from_config(
                 {
                     "model": "models/embedding-001",
-                    "google_api_key": self._llm.google_api_key,
+                    "google_api_key": llm.google_api_key,
                 }
             )
 
@@ -0,0 +1,103 @@
+import asyncio
+from typing import Dict
+
+from fastapi import WebSocket
+
+from cat.log import log
+from cat.serialization import dumps_str
+from cat.looking_glass.verbosity import get_default_verbosity, most_verbose, trim_message
+
+
+class ConnectionRegistry:
+    """Live websocket connections of a user.
+
+    Outbound messages (tokens, notifications and answers) are serialized once and sent to every connection,
+    so all the devices of a user get the same stream. A connection failing to receive is detached.
+    Each connection has its own verbosity, trimming the `why` of answers (serialized once per verbosity level).
+
+    A single task forwards the messages queued by the `StrayCat` to the connections,
+    it runs while at least one connection is attached.
+    """
+
+    def __init__(self, user_id: str, messages: asyncio.Queue):
+        self.user_id = user_id
+        self._messages = messages
+        # live connections, with their verbosity
+        self._connections: Dict[WebSocket, str] = {}
+        self._forwarder: asyncio.Task = None
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    @property
+    def latest(self) -> WebSocket:
+        """Most recent live connection, `None` if there are none."""
+        if not self._connections:
+            return None
+        return list(self._connections)[-1]
+
+    @property
+    def verbosity(self) -> str:
+        """Most verbose level among live connections, the default one if there are none."""
+        if not self._connections:
+            return get_default_verbosity()
+        return most_verbose(list(self._connections.values()))
+
+    def attach(self, websocket: WebSocket, verbosity: str = None):
+        """Add an accepted connection. Must be called from the main event loop."""
+        self._connections[websocket] = verbosity or get_default_verbosity()
+        if self._forwarder is None or self._forwarder.done():
+            self._forwarder = asyncio.create_task(self._forward())
+
+    def detach(self, websocket: WebSocket):
+        """Remove a connection, stop forwarding messages when none is left."""
+        self._connections.pop(websocket, None)
+        if not self._connections and self._forwarder is not None:
+            # messages queued from now on wait for the next connection
+            self._forwarder.cancel()
+            self._forwarder = None
+
+    async def broadcast(self, message: Dict):
+        """Send a message to all the live connections."""
+        # serialized once for all connections with the same verbosity
+        texts: Dict[str, str] = {}
+        sends = []
+        for websocket, verbosity in list(self._connections.items()):
+            if verbosity not in texts:
+                texts[verbosity] = dumps_str(trim_message(message, verbosity))
+            sends.append(self._send(websocket, texts[verbosity]))
+        await asyncio.gather(*sends)
+
+    async def _send(self, websocket: WebSocket, text: str):
+        try:
+            await websocket.send_text(text)
+        except Exception as e:
+            log.warning(f"Websocket of user {self.user_id} is not reachable, detaching it: {e}")
+            self.detach(websocket)
+
+    async def drain(self):
+        """Wait until the queued messages have been sent.
+
+        Messages left when no connection is attached (e.g. the client went away meanwhile) are discarded.
+        """
+        while self._connections and self._forwarder is not None and not self._forwarder.done():
+            forwarder = self._forwarder
+            sent = asyncio.ensure_future(self._messages.join())
+            # the forwarder is cancelled when the last connection is detached
+            await asyncio.wait({sent, forwarder}, return_when=asyncio.FIRST_COMPLETED)
+            if sent.done():
+                return
+            sent.cancel()
+
+        while not self._messages.empty():
+            self._messages.get_nowait()
+            self._messages.task_done()
+
+    async def _forward(self):
+        while True:
+            # extract from FIFO list websocket notification
+            message = await self._messages.get()
+            try:
+                await self.broadcast(message)
+            finally:
+                self._messages.task_done()
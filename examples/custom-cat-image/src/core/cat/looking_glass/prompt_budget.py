@@ -0,0 +1,127 @@
+import os
+import time
+from typing import List, Dict, Tuple
+
+from cat.utils import get_llm_tokenizer
+from cat.log import log
+
+
+# Default maximum number of tokens for each section of the main prompt.
+# `None` means the section is not limited, sections are limited only when a budget is configured.
+DEFAULT_TOKEN_BUDGET = {
+    "episodic_memory": None,
+    "declarative_memory": None,
+    "chat_history": None,
+}
+
+# when the tokenizer of each model could not be loaded, so loading is not retried (and does not stall) at every turn
+_tokenizer_failures: Dict[str, float] = {}
+
+
+def get_tokenizer_retry_interval() -> float:
+    """Seconds before loading a tokenizer is retried after a failure, from `TOKENIZER_RETRY_INTERVAL` (default 300)."""
+    return float(os.getenv("TOKENIZER_RETRY_INTERVAL", 300))
+
+
+class PromptBudget:
+    """Token accounting for the sections of the main prompt.
+
+    Recalled memories are added to their section by descending score and chat history turns from the most recent one,
+    until the token budget of the section is used up.
+
+    Attributes
+    ----------
+    budget : Dict[str, int]
+        Maximum number of tokens for each prompt section, `None` if the section is not limited.
+    tokens : Dict[str, int]
+        Number of tokens used by each formatted prompt section.
+    """
+
+    def __init__(self, llm, budget: Dict[str, int] = None):
+        self.tokenizer = None
+        model = str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
+        failed = _tokenizer_failures.get(model)
+        if failed is None or time.monotonic() - failed >= get_tokenizer_retry_interval():
+            try:
+                self.tokenizer = get_llm_tokenizer(llm)
+                _tokenizer_failures.pop(model, None)
+            except Exception as e:
+                # tiktoken downloads its encodings on first use, which may be impossible offline
+                log.warning(f"Unable to load tokenizer for {model}, token counts will be estimated: {e}")
+                _tokenizer_failures[model] = time.monotonic()
+        self.budget = DEFAULT_TOKEN_BUDGET | (budget or {})
+        self.tokens: Dict[str, int] = {}
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in a string for the current LLM."""
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            # rough estimate, a token is about 4 characters in English
+            return len(text) // 4 + 1
+        return len(self.tokenizer.encode(text, disallowed_special=()))
+
+    def select_memories(self, section: str, memory_docs: List[Tuple]) -> List[Tuple]:
+        """Select the best scored memories fitting in the section budget.
+
+        Parameters
+        ----------
+        section : str
+            Name of the prompt section, e.g. `episodic_memory`.
+        memory_docs : List[Tuple]
+            Recalled memories in the format `(Document, score, vector, id)`.
+
+        Returns
+        -------
+        selected : List[Tuple]
+            Memories fitting in the budget, ordered by descending score.
+        """
+        limit = self.budget.get(section)
+        ranked = sorted(memory_docs, key=lambda m: m[1], reverse=True)
+        if limit is None:
+            return ranked
+
+        selected = []
+        used = 0
+        for m in ranked:
+            cost = self.count_tokens(m[0].page_content)
+            if used + cost > limit:
+                # a shorter memory with lower score may still fit
+                continue
+            selected.append(m)
+            used += cost
+        return selected
+
+    def select_chat_history(self, chat_history: List[Dict]) -> List[Dict]:
+        """Select the most recent conversation turns fitting in the `chat_history` budget.
+
+        Parameters
+        ----------
+        chat_history : List[Dict]
+            Conversation turns with keys `who` and `message`.
+
+        Returns
+        -------
+        selected : List[Dict]
+            Most recent turns fitting in the budget, in chronological order.
+        """
+        limit = self.budget.get("chat_history")
+        if limit is None:
+            return chat_history
+
+        selected = []
+        used = 0
+        for turn in reversed(chat_history):
+            cost = self.count_tokens(f"{turn['who']}: {turn['message']}")
+            if used + cost > limit:
+                # older turns would break the conversation flow, stop here
+                break
+            selected.append(turn)
+            used += cost
+        selected.reverse()
+        return selected
+
+    def report(self, section: str, content: str) -> str:
+        """Store the token count of a formatted section and return the content unchanged."""
+        self.tokens[section] = self.count_tokens(content)
+        return content
@@ -1,5 +1,6 @@
 import time
 import asyncio
+import threading
 import traceback
 from typing import Literal, get_args
 
@@ -11,8 +12,13 @@ from fastapi import WebSocket
 
 from cat.log import log
 from cat.looking_glass.cheshire_cat import CheshireCat
-from cat.looking_glass.callbacks import NewTokenHandler
+from cat.factory.http_client import aclose_http_client_for_loop
+from cat.looking_glass.callbacks import NewTokenHandler, TurnCancelled
+from cat.looking_glass.turn_scheduler import TurnScheduler
+from cat.looking_glass.connections import ConnectionRegistry
+from cat.looking_glass.verbosity import trim_why
 from cat.memory.working_memory import WorkingMemory
+from cat import metrics
 
 
 MAX_TEXT_INPUT = 2000
@@ -32,13 +38,76 @@ class StrayCat:
         self.__ws_messages = asyncio.Queue()
         self.working_memory = WorkingMemory()
 
-        # attribute to store ws connection
-        self.ws = ws
+        # live ws connections of the user, receiving the messages in `__ws_messages`
+        self.connections = ConnectionRegistry(user_id, self.__ws_messages)
+        if ws is not None:
+            self.connections.attach(ws)
 
         self.__main_loop = main_loop
 
         self.__loop = asyncio.new_event_loop()
 
+        # conversation turn currently running on `self.loop`, if any
+        self.__turn: asyncio.Task = None
+        # a turn is about to run (see `prepare_turn`), it can be cancelled before it starts
+        self.__turn_prepared = False
+        self.__turn_lock = threading.Lock()
+        self.__cancelled = threading.Event()
+
+        # whether conversation turns are stored in episodic memory
+        self.store_episodic_memory = True
+
+        # turns of all the websocket connections of this user run one at a time
+        self.turn_scheduler = TurnScheduler(self)
+
+    @property
+    def ws(self) -> WebSocket:
+        """Most recent ws connection of the user, `None` if not connected."""
+        return self.connections.latest
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the running conversation turn has been cancelled."""
+        return self.__cancelled.is_set()
+
+    def cancel(self) -> bool:
+        """Cancel the running conversation turn, if any.
+
+        The LLM stream is aborted at its next token, tools not yet executed are skipped
+        and nothing is stored in episodic memory. Safe to call from any thread.
+
+        Returns
+        -------
+        bool
+            Whether a running turn was cancelled.
+        """
+
+        with self.__turn_lock:
+            if self.cancelled:
+                return False
+            turn = self.__turn
+            if turn is not None and not turn.done():
+                self.__cancelled.set()
+                self.__loop.call_soon_threadsafe(turn.cancel)
+            elif self.__turn_prepared:
+                # not started yet (e.g. waiting for a thread), `run` will not start it
+                self.__cancelled.set()
+            else:
+                return False
+
+        log.info(f"Cancelling conversation turn of user {self.user_id}")
+        metrics.increment("turns_cancelled")
+        return True
+
+    def prepare_turn(self):
+        """Mark a conversation turn as about to run, so it can be cancelled before `run` starts it.
+
+        Must be followed by `run`.
+        """
+        with self.__turn_lock:
+            self.__cancelled.clear()
+            self.__turn_prepared = True
+
     def send_ws_message(self, content: str, msg_type: MSG_TYPES="notification"):
         
         """Send a message via websocket.
@@ -174,7 +243,7 @@ class StrayCat:
         # hook to modify/enrich retrieved memories
         self.mad_hatter.execute_hook("after_cat_recalls_memories", cat=self)
 
-    def llm(self, prompt: str, stream: bool = False) -> str:
+    def llm(self, prompt: str, stream: bool = False, utility: bool = False) -> str:
         """Generate a response using the LLM model.
 
         This method is useful for generating a response with both a chat and a completion model using the same syntax
@@ -183,6 +252,10 @@ class StrayCat:
         ----------
         prompt : str
             The prompt for generating the response.
+        stream : bool
+            Whether to send the generated tokens to the websocket.
+        utility : bool
+            Whether to use the utility LLM, faster for short and structured outputs (classification, extraction).
 
         Returns
         -------
@@ -196,13 +269,15 @@ class StrayCat:
         if stream:
             callbacks.append(NewTokenHandler(self))
 
-        # Check if self._llm is a completion model and generate a response
-        if isinstance(self._llm, BaseLLM):
-            return self._llm(prompt, callbacks=callbacks)
+        llm = self._utility_llm if utility else self._llm
+
+        # Check if llm is a completion model and generate a response
+        if isinstance(llm, BaseLLM):
+            return llm(prompt, callbacks=callbacks)
 
-        # Check if self._llm is a chat model and call it as a completion model
-        if isinstance(self._llm, BaseChatModel):
-            return self._llm.call_as_llm(prompt, callbacks=callbacks)
+        # Check if llm is a chat model and call it as a completion model
+        if isinstance(llm, BaseChatModel):
+            return llm.call_as_llm(prompt, callbacks=callbacks)
 
     async def __call__(self, user_message_json):
             """Call the Cat instance.
@@ -242,6 +317,11 @@ class StrayCat:
                 # TODO: reflex hook!
                 self.send_long_message_to_declarative()
 
+            # seconds spent in each stage of the turn
+            timings = {}
+            self.working_memory["timings"] = timings
+            stage_start = time.perf_counter()
+
             # recall episodic and declarative memories from vector collections
             #   and store them in working_memory
             try:
@@ -261,6 +341,9 @@ class StrayCat:
                     "description": err_message,
                 }
             
+            timings["recall"] = time.perf_counter() - stage_start
+            stage_start = time.perf_counter()
+
             # reply with agent
             try:
                 cat_message = await self.agent_manager.execute_agent(self)
@@ -282,9 +365,16 @@ class StrayCat:
                     "output": unparsable_llm_output
                 }
 
+            timings["agent"] = time.perf_counter() - stage_start
+            stage_start = time.perf_counter()
+
             log.info("cat_message:")
             log.info(cat_message)
 
+            # do not store the turn if it was cancelled while the agent was finishing
+            if self.cancelled:
+                raise TurnCancelled()
+
             user_message = self.working_memory["user_message_json"]["text"]
 
             doc = Document(
@@ -300,12 +390,15 @@ class StrayCat:
             # store user message in episodic memory
             # TODO: vectorize and store also conversation chunks
             #   (not raw dialog, but summarization)
-            user_message_embedding = self.embedder.embed_documents([user_message])
-            _ = self.memory.vectors.episodic.add_point(
-                doc.page_content,
-                user_message_embedding[0],
-                doc.metadata,
-            )
+            if self.store_episodic_memory:
+                user_message_embedding = self.embedder.embed_documents([user_message])
+                _ = self.memory.vectors.episodic.add_point(
+                    doc.page_content,
+                    user_message_embedding[0],
+                    doc.metadata,
+                )
+
+            timings["episodic_memory"] = time.perf_counter() - stage_start
 
             # build data structure for output (response and why with memories)
             # TODO: these 3 lines are a mess, simplify
@@ -325,6 +418,7 @@ class StrayCat:
                         "declarative": declarative_report,
                         "procedural": procedural_report,
                     },
+                    "prompt_tokens": self.working_memory.get("prompt_tokens", {}),
                 },
             }
 
@@ -332,14 +426,31 @@ class StrayCat:
 
             # update conversation history
             self.working_memory.update_conversation_history(who="Human", message=user_message)
-            self.working_memory.update_conversation_history(who="AI", message=final_output["content"], why=final_output["why"])
+            # keep in history only what the most verbose connection can see
+            why = trim_why(final_output["why"], self.connections.verbosity)
+            self.working_memory.update_conversation_history(who="AI", message=final_output["content"], why=why)
 
             return final_output
 
     def run(self, user_message_json):
-        return self.loop.run_until_complete(
-            self.__call__(user_message_json)
-        )
+        """Run a conversation turn, returns `None` if the turn is cancelled."""
+        with self.__turn_lock:
+            if not self.__turn_prepared:
+                self.__cancelled.clear()
+            self.__turn_prepared = False
+            if self.cancelled:
+                log.info(f"Conversation turn of user {self.user_id} cancelled before starting")
+                return None
+            self.__turn = self.loop.create_task(
+                self.__call__(user_message_json)
+            )
+        try:
+            return self.loop.run_until_complete(self.__turn)
+        except (asyncio.CancelledError, TurnCancelled):
+            log.info(f"Conversation turn of user {self.user_id} cancelled")
+            return None
+        finally:
+            self.__turn = None
 
     def send_long_message_to_declarative(self):
         #Split input after MAX_TEXT_INPUT tokens, on a whitespace, if any, and send it to the rabbit hole
@@ -369,6 +480,10 @@ class StrayCat:
     @property
     def _llm(self):
         return CheshireCat()._llm
+
+    @property
+    def _utility_llm(self):
+        return CheshireCat()._utility_llm
     
     @property
     def embedder(self):
@@ -392,4 +507,14 @@ class StrayCat:
 
     @property
     def loop(self):
-        return self.__loop
\ No newline at end of file
+        return self.__loop
+
+    def close(self):
+        """Close the event loop of the stray, and the pooled HTTP client bound to it.
+
+        For strays serving a single request, once their turn is over.
+        """
+        if self.__loop.is_closed() or self.__loop.is_running():
+            return
+        self.__loop.run_until_complete(aclose_http_client_for_loop())
+        self.__loop.close()
@@ -0,0 +1,142 @@
+import os
+import traceback
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+import asyncio
+from fastapi import WebSocket
+from fastapi.concurrency import run_in_threadpool
+
+from cat.log import log
+from cat import metrics
+from cat import utils
+from cat.serialization import dumps_str
+
+
+# what to do with a message received while a turn is running
+SCHEDULING_MODES = ["queue", "supersede", "reject"]
+
+
+class TurnScheduler:
+    """Per-session scheduler of conversation turns.
+
+    Messages are accepted while a turn is running, and turns run one at a time so the working memory
+    is updated consistently. Messages received while the session is busy are handled according to `mode`:
+
+        - `queue`: run after the current turn, in order of arrival (up to `max_queue` waiting messages);
+        - `supersede`: cancel the running turn and drop the waiting ones, only the newest message runs;
+        - `reject`: answer with an error.
+
+    Answers are sent to all the connections of the user, rejections only to the connection sending the message.
+    Defaults are read from the `TURN_SCHEDULING` and `TURN_QUEUE_SIZE` environment variables.
+    The number of waiting messages, across all sessions, is the `turn_queue_depth` metric.
+    """
+
+    def __init__(self, stray, mode: str = None, max_queue: int = None):
+        self.stray = stray
+        self.mode = mode or os.getenv("TURN_SCHEDULING", "queue")
+        if self.mode not in SCHEDULING_MODES:
+            raise ValueError(f"Turn scheduling `{self.mode}` is not valid. Valid modes: {', '.join(SCHEDULING_MODES)}")
+        self.max_queue = max_queue or int(os.getenv("TURN_QUEUE_SIZE", 10))
+
+        # waiting messages, with the websocket that sent them
+        self._pending: Deque[Tuple[Dict, WebSocket]] = deque()
+        # websocket that sent the message of the running turn, `None` if idle
+        self._running: WebSocket = None
+        self._worker: asyncio.Task = None
+
+    @property
+    def depth(self) -> int:
+        """Number of messages waiting for their turn."""
+        return len(self._pending)
+
+    @property
+    def busy(self) -> bool:
+        return self._running is not None or len(self._pending) > 0
+
+    async def submit(self, user_message: Dict, websocket: WebSocket) -> bool:
+        """Schedule a message received from `websocket`, the answer is broadcast when its turn is over.
+
+        Must be called from the main event loop. Returns whether the message was accepted.
+        """
+
+        if self.mode == "reject" and self.busy:
+            await self._reject(websocket, "A message is already being processed, retry later.")
+            return False
+
+        if self.mode == "supersede":
+            self._drop_pending()
+            if self._running is not None and self.stray.cancel():
+                metrics.increment("turns_superseded")
+
+        if len(self._pending) >= self.max_queue:
+            await self._reject(websocket, f"Too many messages waiting ({self.max_queue}), retry later.")
+            return False
+
+        self._pending.append((user_message, websocket))
+        metrics.add_to_gauge("turn_queue_depth", 1)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._work())
+        return True
+
+    def clear(self):
+        """Drop the waiting messages and cancel the running turn, e.g. when the user has no connection left."""
+
+        if self._pending:
+            metrics.add_to_gauge("turn_queue_depth", -len(self._pending))
+            self._pending.clear()
+
+        if self._running is not None:
+            self.stray.cancel()
+
+    def _drop_pending(self):
+        if self._pending:
+            metrics.add_to_gauge("turn_queue_depth", -len(self._pending))
+            metrics.increment("turns_superseded", len(self._pending))
+            self._pending.clear()
+
+    async def _reject(self, websocket: WebSocket, description: str):
+        metrics.increment("turns_rejected")
+        await self._send(websocket, {
+            "type": "error",
+            "name": "TurnRejected",
+            "description": description,
+        })
+
+    async def _send(self, websocket: WebSocket, message: Dict):
+        try:
+            await websocket.send_text(dumps_str(message))
+        except Exception as e:
+            # client went away in the meantime
+            log.warning(f"Unable to send message to user {self.stray.user_id}: {e}")
+
+    async def _work(self):
+        while self._pending:
+            user_message, websocket = self._pending.popleft()
+            metrics.add_to_gauge("turn_queue_depth", -1)
+
+            self._running = websocket
+            # cancellable (e.g. superseded) while waiting for a thread
+            self.stray.prepare_turn()
+            try:
+                # Run the `stray` object's method in a threadpool since it might be a CPU-bound operation.
+                cat_message = await run_in_threadpool(self.stray.run, user_message)
+            except Exception as e:
+                # Log any unexpected errors and send an error message back to the user.
+                log.error(e)
+                traceback.print_exc()
+                cat_message = {
+                    "type": "error",
+                    "name": type(e).__name__,
+                    "description": utils.explicit_error_message(e),
+                }
+            finally:
+                self._running = None
+
+            # turn cancelled, nothing to send
+            if cat_message is None:
+                continue
+
+            # Send the response message back to the user, on all devices.
+            await self.stray.connections.broadcast(cat_message)
@@ -0,0 +1,52 @@
+import os
+from typing import Dict, List, Literal, get_args
+
+
+# how much of the `why` of a reply is sent to clients and kept in conversation history:
+#   - `minimal`: no `why` at all;
+#   - `ids`: ids and scores of recalled memories, tools used with their inputs (no outputs);
+#   - `full`: everything, including memories content and metadata.
+VERBOSITY = Literal["minimal", "ids", "full"]
+VERBOSITY_LEVELS: List[str] = list(get_args(VERBOSITY))
+
+
+def get_default_verbosity() -> str:
+    """Verbosity used when not specified, from the `WHY_VERBOSITY` environment variable (default `full`)."""
+    verbosity = os.getenv("WHY_VERBOSITY", "full")
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Verbosity `{verbosity}` is not valid. Valid levels: {', '.join(VERBOSITY_LEVELS)}")
+    return verbosity
+
+
+def most_verbose(levels: List[str]) -> str:
+    """Most verbose of the given levels, `minimal` if none is given."""
+    return max(levels, key=VERBOSITY_LEVELS.index, default="minimal")
+
+
+def trim_why(why: Dict, verbosity: str) -> Dict:
+    """Reduce the `why` of a reply to the requested verbosity."""
+
+    if verbosity == "full":
+        return why
+    if verbosity == "minimal":
+        return {}
+
+    trimmed = dict(why)
+    if "intermediate_steps" in why:
+        trimmed["intermediate_steps"] = [
+            [step[0], None] for step in why["intermediate_steps"]
+        ]
+    if "memory" in why:
+        trimmed["memory"] = {
+            collection: [{"id": m.get("id"), "score": m.get("score")} for m in memories]
+            for collection, memories in why["memory"].items()
+        }
+    return trimmed
+
+
+def trim_message(message: Dict, verbosity: str) -> Dict:
+    """Copy of a message with its `why` (if any) reduced to the requested verbosity."""
+
+    if verbosity == "full" or "why" not in message:
+        return message
+    return message | {"why": trim_why(message["why"], verbosity)}
@@ -108,3 +108,35 @@ def agent_prompt_suffix(prompt_suffix: str, cat) -> str:
     """
 
     return prompt_suffix
+
+
+@hook(priority=0)
+def agent_prompt_token_budget(token_budget: Dict, cat) -> Dict:
+    """Hook the token budget of the main prompt sections.
+
+    Allows to set the maximum number of tokens used by recalled memories and chat history in the *Main Prompt*.
+    Memories are inserted by descending score and chat history from the most recent turn, until the budget
+    of the section is used up.
+
+    Parameters
+    ----------
+    token_budget : Dict
+        Dictionary with the sections to limit as keys and the maximum number of tokens as values.
+        Missing keys fall back to the default budget.
+    cat : CheshireCat
+        Cheshire Cat instance.
+
+    Returns
+    -------
+    token_budget : Dict
+        Edited token budget.
+
+    Notes
+    -----
+    Available sections are `episodic_memory`, `declarative_memory` and `chat_history`.
+    By default no section is limited. Set a section to a number of tokens to limit it, or to `None` to disable its limit.
+    The number of tokens actually used by each section is reported in the `why` of the Cat's reply.
+
+    """
+
+    return token_budget
@@ -9,6 +9,7 @@ These hooks allow to intercept the uploaded documents at different places before
 from typing import List
 
 from langchain.docstore.document import Document
+from langchain.text_splitter import TextSplitter
 
 from cat.mad_hatter.decorators import hook
 
@@ -91,6 +92,41 @@ def before_rabbithole_splits_text(doc: Document, cat) -> Document:
     return doc
 
 
+# Hook called when rabbithole splits text. Input is the text splitter
+@hook(priority=0)
+def rabbithole_splits_text(text_splitter: TextSplitter, cat) -> TextSplitter:
+    """Hook the splitter used to chunk the uploaded documents.
+
+    Allows replacing the text splitter, or changing its settings, before the *RabbitHole* splits the documents.
+
+    Parameters
+    ----------
+    text_splitter : TextSplitter
+        Langchain `TextSplitter`, already set with the chunk size and overlap of the upload.
+    cat : CheshireCat
+        Cheshire Cat instance.
+
+    Returns
+    -------
+    text_splitter : TextSplitter
+        Langchain `TextSplitter` splitting the documents.
+
+    Notes
+    -----
+    The default splitter is a `RecursiveCharacterTextSplitter` counting tokens with tiktoken. For large documents,
+    return a `TokenOffsetsTextSplitter` (from `cat.text_splitter`) with the same settings: the text is tokenized
+    once and chunks are cut by token offsets, at the preferred separators::
+
+        return TokenOffsetsTextSplitter(
+            chunk_size=text_splitter._chunk_size,
+            chunk_overlap=text_splitter._chunk_overlap,
+        )
+
+    """
+
+    return text_splitter
+
+
 # Hook called after rabbithole have splitted text into chunks.
 #   Input is the chunks
 @hook(priority=0)
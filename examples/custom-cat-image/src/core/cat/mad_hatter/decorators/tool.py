@@ -5,6 +5,8 @@ from inspect import signature
 
 from langchain_core.tools import BaseTool
 
+from cat.looking_glass.callbacks import TurnCancelled
+
 # All @tool decorated functions in plugins become a CatTool.
 # The difference between base langchain Tool and CatTool is that CatTool has an instance of the cat as attribute (set by the MadHatter)
 class CatTool(BaseTool):
@@ -49,9 +51,16 @@ class CatTool(BaseTool):
         if inspect.iscoroutinefunction(self.func):
             raise NotImplementedError("Tool does not support sync")
 
+        # skip tools of cancelled turns
+        if getattr(self.cat, "cancelled", False):
+            raise TurnCancelled()
+
         return self.func(input_by_llm, cat=self.cat)
 
     async def _arun(self, input_by_llm):
+        if getattr(self.cat, "cancelled", False):
+            raise TurnCancelled()
+
         if inspect.iscoroutinefunction(self.func):
             return await self.func(input_by_llm, cat=self.cat)
         
@@ -5,16 +5,21 @@ import uvicorn
 
 from fastapi import Depends, FastAPI
 from fastapi.routing import APIRoute
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 
 from cat.log import log
-from cat.routes import base, settings, llm, embedder, memory, plugins, upload, websocket 
+from cat.routes import base, settings, llm, embedder, memory, plugins, upload, websocket, message
 from cat.routes.static import public, admin, static
 from cat.headers import check_api_key
 from cat.routes.openapi import get_openapi_configuration_function
 from cat.looking_glass.cheshire_cat import CheshireCat 
+from cat.factory.http_client import aclose_http_clients
+from cat.jobs import IngestionJobs
+from cat.serialization import CatJSONResponse
+from cat.upload_limits import UploadLimitMiddleware
 
 
 @asynccontextmanager
@@ -34,11 +39,21 @@ async def lifespan(app: FastAPI):
     # set a reference to asyncio event loop
     app.state.event_loop = asyncio.get_running_loop()
 
+    # ingestion jobs of the Rabbit Hole, resuming the ones interrupted by the last shutdown
+    app.state.ingestion_jobs = IngestionJobs(app.state.strays, app.state.event_loop)
+    app.state.ingestion_jobs.start()
+
     # startup message with admin, public and swagger addresses
     log.welcome()
 
     yield
 
+    # running ingestion jobs are resumed at the next start
+    await run_in_threadpool(app.state.ingestion_jobs.shutdown)
+
+    # close pooled connections to LLM and embedder services
+    await aclose_http_clients()
+
 
 def custom_generate_unique_id(route: APIRoute):
     return f"{route.name}"
@@ -47,9 +62,13 @@ def custom_generate_unique_id(route: APIRoute):
 # REST API
 cheshire_cat_api = FastAPI(
     lifespan=lifespan,
-    generate_unique_id_function=custom_generate_unique_id
+    generate_unique_id_function=custom_generate_unique_id,
+    default_response_class=CatJSONResponse
 )
 
+# Rejects uploads larger than the limit of their endpoint (inside CORS, so errors have CORS headers)
+cheshire_cat_api.add_middleware(UploadLimitMiddleware)
+
 # Configures the CORS middleware for the FastAPI app
 cors_allowed_origins_str = os.getenv("CORS_ALLOWED_ORIGINS", "")
 origins = cors_allowed_origins_str.split(",") if cors_allowed_origins_str else ["*"]
@@ -69,6 +88,7 @@ cheshire_cat_api.include_router(embedder.router, tags=["Embedder"], prefix="/emb
 cheshire_cat_api.include_router(plugins.router, tags=["Plugins"], prefix="/plugins", dependencies=[Depends(check_api_key)])
 cheshire_cat_api.include_router(memory.router, tags=["Memory"], prefix="/memory", dependencies=[Depends(check_api_key)])
 cheshire_cat_api.include_router(upload.router, tags=["Rabbit Hole"], prefix="/rabbithole", dependencies=[Depends(check_api_key)])
+cheshire_cat_api.include_router(message.router, tags=["Message"], dependencies=[Depends(check_api_key)])
 cheshire_cat_api.include_router(websocket.router, tags=["WebSocket"])
 
 # mount static files
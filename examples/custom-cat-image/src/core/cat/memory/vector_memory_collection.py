@@ -2,7 +2,7 @@ import os
 import sys
 import uuid
 import socket
-from typing import Any, List, Iterable, Optional
+from typing import Any, Dict, List, Iterable, Optional
 import requests
 
 from qdrant_client import QdrantClient
@@ -14,6 +14,10 @@ from qdrant_client.http.models import (
     Filter,
     FieldCondition,
     MatchValue,
+    MatchAny,
+    IsEmptyCondition,
+    PayloadField,
+    PayloadSchemaType,
     SearchParams,
     ScalarQuantization,
     ScalarQuantizationConfig,
@@ -205,9 +209,49 @@ class VectorMemoryCollection():
             **kwargs
         )
 
-        # TODO: this should be an UpdateStatus object, not sure what to do with it 
+        # TODO: this should be an UpdateStatus object, not sure what to do with it
         return update_status
 
+    def add_points(
+        self,
+        contents: List[str],
+        vectors: List[Iterable],
+        metadatas: List[dict] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ):
+        """Add a batch of points (and their metadata) to the vectorstore with a single request.
+
+        Args:
+            contents: original texts.
+            vectors: Embedding vectors, one for each text.
+            metadatas: Optional metadata dicts, one for each text.
+            ids: Optional ids, uuid-like strings, one for each text.
+
+        Returns:
+            Update status of the vectorstore.
+        """
+
+        metadatas = metadatas or [None] * len(contents)
+        ids = ids or [uuid.uuid4().hex for _ in contents]
+        points = [
+            PointStruct(
+                id=id,
+                payload={
+                    "page_content": content,
+                    "metadata": metadata,
+                },
+                vector=vector
+            )
+            for id, content, vector, metadata in zip(ids, contents, vectors, metadatas)
+        ]
+
+        return self.client.upsert(
+            collection_name=self.collection_name,
+            points=points,
+            **kwargs
+        )
+
     def delete_points_by_metadata_filter(self, metadata=None):
         res = self.client.delete(
             collection_name=self.collection_name,
@@ -215,6 +259,86 @@ class VectorMemoryCollection():
         )
         return res
 
+    def get_points_by_metadata_filter(self, metadata=None, with_payload=True, with_vectors=False, batch_size=1000):
+        """Iterate over all the points matching a metadata filter, scrolling the collection in pages.
+
+        Args:
+            metadata: metadata filter, as in `delete_points_by_metadata_filter`.
+            with_payload: whether to return the payloads, or the list of payload keys to return.
+            with_vectors: whether to return the vectors.
+            batch_size: points retrieved by each request.
+
+        Returns:
+            Iterator of Qdrant records.
+        """
+
+        return self._scroll(self._qdrant_filter_from_dict(metadata), with_payload, with_vectors, batch_size)
+
+    def get_points_matching_any(self, metadata: Dict[str, List], exclude: Dict[str, List] = None,
+                                with_payload=True, batch_size=1000):
+        """Iterate over the points with at least one of the metadata values, e.g. the candidate duplicates of a chunk.
+
+        Args:
+            metadata: values of each metadata key, a point matches if it has any of them.
+            exclude: values of each metadata key, points with any of them are skipped.
+            with_payload: whether to return the payloads, or the list of payload keys to return.
+            batch_size: points retrieved by each request.
+
+        Returns:
+            Iterator of Qdrant records.
+        """
+
+        def conditions(values: Dict[str, List]) -> List[FieldCondition]:
+            return [
+                FieldCondition(key=f"metadata.{key}", match=MatchAny(any=list(value)))
+                for key, value in (values or {}).items() if value
+            ]
+
+        should = conditions(metadata)
+        if not should:
+            return iter(())
+        return self._scroll(Filter(should=should, must_not=conditions(exclude) or None), with_payload, False, batch_size)
+
+    def get_points_without_metadata(self, key: str, with_payload=True, batch_size=1000):
+        """Iterate over the points missing a metadata key (or with an empty value), e.g. stored by an older version."""
+        return self._scroll(
+            Filter(must=[IsEmptyCondition(is_empty=PayloadField(key=f"metadata.{key}"))]), with_payload, False, batch_size
+        )
+
+    def create_metadata_index(self, key: str):
+        """Index the (keyword) values of a metadata key to speed up filters, only with a remote Qdrant."""
+        if not self.db_is_remote():
+            # payload indexes have no effect in the local Qdrant
+            return
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name=f"metadata.{key}",
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+
+    def _scroll(self, scroll_filter: Optional[Filter], with_payload, with_vectors, batch_size):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+            yield from points
+            if offset is None:
+                return
+
+    def update_point_metadata(self, id, metadata: dict):
+        """Replace the metadata of a point, keeping its content and vector."""
+        return self.client.set_payload(
+            collection_name=self.collection_name,
+            payload={"metadata": metadata},
+            points=[id],
+        )
+
     # delete point in collection
     def delete_points(self, points_ids):
         res = self.client.delete(
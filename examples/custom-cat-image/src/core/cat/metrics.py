@@ -0,0 +1,38 @@
+"""Process-wide runtime metrics.
+
+Counters only grow (e.g. cancelled turns), gauges hold the last value set (e.g. queue depth).
+Metrics are exposed by the `GET /metrics` endpoint.
+"""
+
+import threading
+from typing import Dict
+
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Increment a counter, creating it at zero if missing."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def add_to_gauge(name: str, value: float) -> None:
+    """Add (or subtract, with a negative value) to a gauge, creating it at zero if missing."""
+    with _lock:
+        _gauges[name] = _gauges.get(name, 0) + value
+
+
+def get_metrics() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+        }
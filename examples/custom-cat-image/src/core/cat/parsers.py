@@ -0,0 +1,168 @@
+"""Document parsers used by the Rabbit Hole, in addition to the Langchain ones."""
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from langchain.docstore.document import Document
+from langchain.document_loaders.base import BaseBlobParser
+from langchain.document_loaders.blob_loaders.schema import Blob
+
+
+def extract_pdf_pages(pdf_file: BinaryIO, page_numbers: Iterable[int] = None) -> Iterator[Tuple[int, str]]:
+    """Extract the text of PDF pages with PDFMiner, in a single pass over the file.
+
+    Yields `(page_number, text)` for the given (zero based) page numbers, all the pages by default.
+    """
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    remaining = set(page_numbers) if page_numbers is not None else None
+    text_io = io.StringIO()
+    resource_manager = PDFResourceManager()
+    device = TextConverter(resource_manager, text_io, laparams=LAParams())
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    try:
+        for page_number, page in enumerate(PDFPage.get_pages(pdf_file)):
+            if remaining is not None:
+                if not remaining:
+                    break
+                if page_number not in remaining:
+                    continue
+                remaining.discard(page_number)
+
+            interpreter.process_page(page)
+            yield page_number, text_io.getvalue()
+            text_io.truncate(0)
+            text_io.seek(0)
+    finally:
+        device.close()
+
+
+def count_pdf_pages(pdf_file: BinaryIO) -> int:
+    from pdfminer.pdfpage import PDFPage
+    return sum(1 for _ in PDFPage.get_pages(pdf_file))
+
+
+class PDFMinerPagesParser(BaseBlobParser):
+    """Parse PDF files with PDFMiner, one `Document` per page.
+
+    Pages are yielded as soon as they are parsed, in a single pass over the file
+    (`PDFMinerParser(concatenate_pages=False)` parses the file from the start for each page).
+    """
+
+    def lazy_parse(self, blob: Blob) -> Iterator[Document]:
+        with blob.as_bytes_io() as pdf_file:
+            for page_number, text in extract_pdf_pages(pdf_file):
+                yield Document(
+                    page_content=text,
+                    metadata={"source": blob.source, "page": page_number}
+                )
+
+
+# process pools of the parallel PDF parsers, by number of workers
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pdf_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by the parsers with the same number of workers, created at first use."""
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn: forking a process running threads (e.g. the web server) is not safe
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def discard_pdf_process_pool(pool: ProcessPoolExecutor):
+    """Forget a broken pool (e.g. a worker crashed), the next parser gets a new one."""
+    with _pools_lock:
+        for workers, other in list(_pools.items()):
+            if other is pool:
+                del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_pdf_pages(path: str, first: int, last: int) -> List[Tuple[int, str]]:
+    # runs in a worker process
+    with open(path, "rb") as pdf_file:
+        return list(extract_pdf_pages(pdf_file, range(first, last)))
+
+
+class ParallelPDFMinerParser(BaseBlobParser):
+    """Parse PDF files with PDFMiner in a process pool, one `Document` per page.
+
+    The document is split in ranges of `pages_per_task` pages, parsed in parallel by `workers` processes
+    (so parsing does not hold the GIL of the web server). Pages are yielded in order, as soon as their range is parsed.
+    Documents with less than `min_pages` pages are parsed in process, as starting a task costs more than parsing them.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes, the `PDF_PARSER_WORKERS` environment variable by default.
+    pages_per_task : int
+        Number of pages parsed by each task.
+    min_pages : int
+        Minimum number of pages to parse the document in parallel.
+    """
+
+    def __init__(self, workers: int = None, pages_per_task: int = 16, min_pages: int = 32):
+        self.workers = workers or get_pdf_parser_workers()
+        self.pages_per_task = pages_per_task
+        self.min_pages = min_pages
+
+    def lazy_parse(self, blob: Blob) -> Iterator[Document]:
+        with blob.as_bytes_io() as pdf_file:
+            pages = count_pdf_pages(pdf_file)
+
+        if pages < self.min_pages or self.workers < 2:
+            yield from PDFMinerPagesParser().lazy_parse(blob)
+            return
+
+        # workers read the file from disk
+        path = blob.path
+        temporary = None
+        if blob.data is not None or path is None:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f, blob.as_bytes_io() as data:
+                shutil.copyfileobj(data, f)
+                temporary = path = f.name
+
+        pool = get_pdf_process_pool(self.workers)
+        futures = []
+        try:
+            futures = [
+                pool.submit(_parse_pdf_pages, str(path), first, min(first + self.pages_per_task, pages))
+                for first in range(0, pages, self.pages_per_task)
+            ]
+            for future in futures:
+                for page_number, text in future.result():
+                    yield Document(
+                        page_content=text,
+                        metadata={"source": blob.source, "page": page_number}
+                    )
+        except BrokenProcessPool:
+            # a worker crashed: this document fails, the next ones get a new pool
+            discard_pdf_process_pool(pool)
+            raise
+        finally:
+            # parsing stopped before the end (e.g. ingestion failed)
+            for future in futures:
+                future.cancel()
+            if temporary is not None:
+                os.remove(temporary)
+
+
+def get_pdf_parser_workers() -> int:
+    """Number of processes parsing PDF files, from the `PDF_PARSER_WORKERS` environment variable.
+
+    Defaults to the number of CPUs, up to 4. With 1 PDF files are parsed in the ingestion thread.
+    """
+    return int(os.getenv("PDF_PARSER_WORKERS", min(4, os.cpu_count() or 1)))
@@ -0,0 +1,154 @@
+"""Streaming pipelines of concurrent stages.
+
+Items flow from a source iterable through a chain of stages, each stage running in its own worker threads
+and connected to the next one by a bounded queue: a slow stage makes the previous ones wait (backpressure)
+instead of piling up items in memory, and every stage works as soon as its first item is ready.
+
+Examples
+--------
+>>> run_pipeline(
+...     pages,
+...     [
+...         Stage("split", split_page),
+...         Stage("embed", embed_chunks, workers=4),
+...         Stage("upsert", store_vectors),
+...     ],
+... )
+"""
+
+import queue
+import threading
+import contextvars
+from typing import Any, Callable, Iterable, List
+
+
+# end of the items for a worker
+_DONE = object()
+
+# seconds between checks of the stop flag while waiting on a queue
+_POLL_INTERVAL = 0.1
+
+
+class Stage:
+    """Step of a pipeline.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage, used for thread names.
+    function : Callable[[Any], Iterable[Any]]
+        Called on each input item, returns (or yields) the items for the next stage.
+        The items of the last stage are discarded.
+    workers : int
+        Number of threads running the stage, items are not processed in order if more than one.
+    flush : Callable[[], Iterable[Any]], optional
+        Called by each worker once there are no more input items, returns (or yields) the last items for the
+        next stage, e.g. the items held back by a stage grouping its input.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            function: Callable[[Any], Iterable[Any]],
+            workers: int = 1,
+            flush: Callable[[], Iterable[Any]] = None
+    ):
+        if workers < 1:
+            raise ValueError(f"Stage `{name}` needs at least one worker")
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.flush = flush
+
+
+def run_pipeline(source: Iterable, stages: List[Stage], queue_size: int = 8) -> None:
+    """Run the items of `source` through `stages`, returns when all the items went through.
+
+    The source is consumed in a thread of its own, so it can be a (slow) generator, e.g. a lazy parser.
+    Workers run in a copy of the caller context (e.g. the admission priority).
+    If the source or a stage raises, the pipeline stops and the first exception is raised here.
+    """
+
+    # input queue of each stage
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    lock = threading.Lock()
+    running = [stage.workers for stage in stages]
+
+    def put(index: int, item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                queues[index].put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(index: int) -> Any:
+        while not stop.is_set():
+            try:
+                return queues[index].get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def fail(error: BaseException):
+        with lock:
+            errors.append(error)
+        stop.set()
+
+    def close(index: int):
+        """Tell all the workers of a stage there are no more items."""
+        for _ in range(stages[index].workers):
+            put(index, _DONE)
+
+    def feed():
+        try:
+            for item in source:
+                if not put(0, item):
+                    return
+        except BaseException as e:
+            fail(e)
+        finally:
+            close(0)
+
+    def work(index: int, stage: Stage):
+        try:
+            while True:
+                item = get(index)
+                if item is _DONE:
+                    break
+                for output in stage.function(item) or []:
+                    if index + 1 < len(stages) and not put(index + 1, output):
+                        return
+            if stage.flush is not None and not stop.is_set():
+                for output in stage.flush() or []:
+                    if index + 1 < len(stages) and not put(index + 1, output):
+                        return
+        except BaseException as e:
+            fail(e)
+        finally:
+            with lock:
+                running[index] -= 1
+                last = running[index] == 0
+            # the last worker of a stage closes the next one
+            if last and index + 1 < len(stages):
+                close(index + 1)
+
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(feed,), name="pipeline-source")]
+    for index, stage in enumerate(stages):
+        for w in range(stage.workers):
+            threads.append(threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(work, index, stage),
+                name=f"pipeline-{stage.name}-{w}"
+            ))
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
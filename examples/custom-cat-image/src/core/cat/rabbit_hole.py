@@ -1,27 +1,129 @@
 import os
 import time
+import uuid
 import json
+import threading
+import tempfile
 import mimetypes
-import httpx
-from typing import List, Union
-from urllib.request import urlopen
+import contextlib
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Union
 from urllib.parse import urlparse
-from urllib.error import HTTPError
 
 from starlette.datastructures import UploadFile
 from langchain.docstore.document import Document
-from qdrant_client.http import models
-
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders.parsers import PDFMinerParser
+
 from langchain.document_loaders.parsers.generic import MimeTypeBasedParser
 from langchain.document_loaders.parsers.txt import TextParser
 from langchain.document_loaders.blob_loaders.schema import Blob
 from langchain.document_loaders.parsers.html.bs4 import BS4HTMLParser
 
-from cat.utils import singleton
+from cat.utils import singleton, get_tiktoken_encoding
+from cat.factory.admission import background_priority
+from cat.parsers import ParallelPDFMinerParser
+from cat.pipeline import Stage, run_pipeline
+from cat.dedup import ChunkDeduplicator, content_hash, simhash
+from cat.bulk import BulkReport, extract_archive, list_files
+from cat.web import Crawler, download
+from cat.json_stream import JSONStream
+from cat.serialization import vector_from_base64
+from cat import metrics
 from cat.log import log
 
+
+# extensions of the collections exported by `/memory/collections/{id}/export`
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+class UploadBlob(Blob):
+    """Blob of an uploaded file, read from its spooled temporary file instead of being copied in memory."""
+
+    file: Any = None
+
+    def as_string(self) -> str:
+        return self.as_bytes().decode(self.encoding)
+
+    def as_bytes(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    @contextlib.contextmanager
+    def as_bytes_io(self):
+        self.file.seek(0)
+        yield self.file
+
+
+class IngestionProgress:
+    """Progress of the ingestion of a source, notified to the user every `interval` seconds.
+
+    Progress is the share of parsed bytes already stored. Until parsing is over, the total is
+    estimated with the source size.
+    """
+
+    def __init__(self, stray, source: str, size: int, interval: float = 10):
+        self.stray = stray
+        self.source = source
+        self.size = size
+        self.interval = interval
+        self.parsed = 0
+        self.parsing_completed = False
+        self.processed = 0
+        self.chunks = 0
+        self._last_notification = time.time()
+        self._lock = threading.Lock()
+
+    def add_parsed(self, size: int):
+        with self._lock:
+            self.parsed += size
+
+    def complete_parsing(self):
+        with self._lock:
+            self.parsing_completed = True
+
+    def add_processed(self, chunks: int, size: int):
+        with self._lock:
+            self.chunks += chunks
+            self.processed += size
+            if time.time() - self._last_notification <= self.interval:
+                return
+            self._last_notification = time.time()
+            total = self.parsed if self.parsing_completed else max(self.size, self.parsed)
+            perc_read = int(self.processed / total * 100) if total else 0
+
+        read_message = f"Read {perc_read}% of {self.source}"
+        self.stray.send_ws_message(read_message)
+        log.warning(read_message)
+
+class StoredChunks:
+    """Chunks of a source already in the declarative memory, by content hash (incremental ingestion).
+
+    Each new chunk with the same content as a stored one claims it, instead of being embedded again.
+    Stored chunks not claimed by the end of the ingestion disappeared from the source.
+    """
+
+    def __init__(self, collection, source: str):
+        self.__ids: Dict[str, List] = {}
+        self.__lock = threading.Lock()
+        for point in collection.get_points_by_metadata_filter({"source": source}, with_payload=["metadata"]):
+            # chunks stored before hashes were introduced are replaced
+            stored_hash = (point.payload.get("metadata") or {}).get("content_hash")
+            self.__ids.setdefault(stored_hash, []).append(point.id)
+
+    def claim(self, chunk_hash: str) -> bool:
+        """Whether a chunk with this content is already stored (and was not claimed yet)."""
+        with self.__lock:
+            ids = self.__ids.get(chunk_hash)
+            if not ids:
+                return False
+            ids.pop()
+            return True
+
+    def unclaimed(self) -> List:
+        """Ids of the stored chunks not claimed."""
+        with self.__lock:
+            return [id for ids in self.__ids.values() for id in ids]
+
+
 @singleton
 class RabbitHole:
     """Manages content ingestion. I'm late... I'm late!"""
@@ -29,7 +131,8 @@ class RabbitHole:
         self.__cat = cat
 
         self.__file_handlers = {
-            "application/pdf": PDFMinerParser(),
+            # parsed in parallel by `PDF_PARSER_WORKERS` processes (by default the number of CPUs, up to 4)
+            "application/pdf": ParallelPDFMinerParser(),
             "text/plain": TextParser(),
             "text/markdown": TextParser(),
             "text/html": BS4HTMLParser()
@@ -37,18 +140,40 @@ class RabbitHole:
 
         self.__reload_file_handlers()
 
+        # streaming ingestion (opt-in), see `ingest_file`
+        self.streaming = os.getenv("RABBITHOLE_STREAMING", "false") == "true"
+        self.split_workers = int(os.getenv("RABBITHOLE_SPLIT_WORKERS", 1))
+        self.embed_workers = int(os.getenv("RABBITHOLE_EMBED_WORKERS", 2))
+        self.upsert_workers = int(os.getenv("RABBITHOLE_UPSERT_WORKERS", 1))
+        self.embed_batch_size = int(os.getenv("RABBITHOLE_EMBED_BATCH_SIZE", 16))
+        self.queue_size = int(os.getenv("RABBITHOLE_QUEUE_SIZE", 8))
+        # files parsed at the same time by `ingest_bulk`
+        self.bulk_workers = int(os.getenv("RABBITHOLE_BULK_WORKERS", 4))
+
+        # points upserted at a time by `ingest_memory`
+        self.memory_batch_size = int(os.getenv("RABBITHOLE_MEMORY_BATCH_SIZE", 256))
+
+        # duplicate chunks, see `__deduplicate`
+        self.dedup = os.getenv("RABBITHOLE_DEDUP", "off")
+        if self.dedup not in ("off", "skip", "reference"):
+            log.warning(f"Unknown RABBITHOLE_DEDUP mode `{self.dedup}`, deduplication is off")
+            self.dedup = "off"
+        self.dedup_distance = int(os.getenv("RABBITHOLE_DEDUP_DISTANCE", 3))
+
     # each time we access the file handlers, plugins can intervene
     def __reload_file_handlers(self):
         # no access to stray
         self.__file_handlers = self.__cat.mad_hatter.execute_hook("rabbithole_instantiates_parsers", self.__file_handlers, cat=self.__cat)
 
-    def ingest_memory(self, stray, file: UploadFile):
+    def ingest_memory(self, stray, file: Union[str, UploadFile], job=None):
         """Upload memories to the declarative memory from a JSON file.
 
         Parameters
         ----------
-        file : UploadFile
-            File object sent via `rabbithole/memory` hook.
+        file : str, UploadFile
+            Path of the file, or file object sent via `rabbithole/memory` hook.
+        job : IngestionJob, optional
+            Job running the import (see `cat.jobs`), the import stops between batches when the job is cancelled.
 
         Notes
         -----
@@ -57,108 +182,550 @@ class RabbitHole:
         when uploading.
         The method also performs a check on the dimensionality of the embeddings (i.e. length of each vector).
 
-        """
+        Files with the `.ndjson` or `.jsonl` extension are collections exported by `/memory/collections/{id}/export`:
+        the first line describes the export, each of the next ones is a point, imported in the same collection.
+
+        Files are read incrementally (see `cat.json_stream`), and memories are upserted in batches of
+        `RABBITHOLE_MEMORY_BATCH_SIZE` points (default 256), so large exports are never loaded in memory at once.
+        Files are read twice: all the memories are checked (embedder, vector size) before upserting any, so an
+        invalid file is not imported partially. An import interrupted later (e.g. the vector database is
+        unreachable) may be partial, and can be retried: memories keep their ids, so they are not duplicated.
 
-        # Get file bytes
-        file_bytes = file.file.read()
+        """
 
-        # Load fyle byte in a dict
-        memories = json.loads(file_bytes.decode("utf-8"))
+        filename = file if isinstance(file, str) else file.filename
+        import_memories = self.__import_ndjson if filename.lower().endswith(NDJSON_EXTENSIONS) else self.__import_json
 
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                return import_memories(stray, f, job)
+        return import_memories(stray, file.file, job)
+
+    def __import_json(self, stray, file: BinaryIO, job=None):
+        embedders = []
+
+        # Get Declarative memories in file, one at a time
+        def memories():
+            file.seek(0)
+            stream = JSONStream(file)
+            for key in stream.members():
+                if key == "embedder" and not embedders:
+                    # exports start with it, so it is checked before reading any memory
+                    embedders.append(stream.value())
+                    self.__check_memory_embedder(stray, embedders[0])
+                if key != "collections":
+                    continue
+                for collection in stream.members():
+                    if collection != "declarative":
+                        continue
+                    for _ in stream.items():
+                        yield stream.value()
+
+        declarative = stray.memory.vectors.declarative
+        self.__check_memories(declarative, memories(), job)
+        if not embedders:
+            self.__check_memory_embedder(stray, None)
+        self.__upsert_memories(declarative, memories(), job)
+
+    def __import_ndjson(self, stray, file: BinaryIO, job=None):
+        header = json.loads(file.readline() or "{}")
+        self.__check_memory_embedder(stray, header.get("embedder"))
+
+        collection_name = header.get("collection", "declarative")
+        collection = stray.memory.vectors.collections.get(collection_name)
+        if collection is None:
+            raise Exception(f"Collection {collection_name} does not exist")
+        # checked on the header, before reading any point
+        if header.get("vector_size", collection.embedder_size) != collection.embedder_size:
+            message = f'Embedding size mismatch: vectors length should be {collection.embedder_size}'
+            raise Exception(message)
+        start = file.tell()
+
+        def memories():
+            file.seek(start)
+            for line in file:
+                if not line.strip():
+                    continue
+                memory = json.loads(line)
+                if header.get("vectors_format") == "base64":
+                    memory["vector"] = vector_from_base64(memory["vector"])
+                yield memory
+
+        self.__check_memories(collection, memories(), job)
+        self.__upsert_memories(collection, memories(), job)
+
+    def __check_memory_embedder(self, stray, upload_embedder: str):
         # Check the embedder used for the uploaded memories is the same the Cat is using now
-        upload_embedder = memories["embedder"]
         cat_embedder = str(stray.embedder.__class__.__name__)
 
         if upload_embedder != cat_embedder:
             message = f'Embedder mismatch: file embedder {upload_embedder} is different from {cat_embedder}'
             raise Exception(message)
 
-        # Get Declarative memories in file
-        declarative_memories = memories["collections"]["declarative"]
-
-        # Store data to upload the memories in batch
-        ids = [i["id"] for i in declarative_memories]
-        payloads = [{
-            "page_content": p["page_content"],
-            "metadata": p["metadata"]
-        } for p in declarative_memories]
-        vectors = [v["vector"] for v in declarative_memories]
-
-        log.info(f"Preparing to load {len(vectors)} vector memories")
-
-        # Check embedding size is correct
-        embedder_size = stray.memory.vectors.declarative.embedder_size
-        len_mismatch = [len(v) == embedder_size for v in vectors]
+    def __check_memories(self, collection, memories: Iterable[Dict], job=None):
+        """Check all the memories of a file before upserting any, so an invalid file is not imported partially."""
+        embedder_size = collection.embedder_size
+        for checked, memory in enumerate(memories):
+            if job is not None and checked % self.memory_batch_size == 0:
+                job.raise_if_stopped()
+            missing = {"id", "page_content", "metadata", "vector"} - set(memory)
+            if missing:
+                raise Exception(f"Invalid memory {memory.get('id')}: missing {', '.join(sorted(missing))}")
+            # Check embedding size is correct
+            if len(memory["vector"]) != embedder_size:
+                message = f'Embedding size mismatch: vectors length should be {embedder_size}'
+                raise Exception(message)
+
+    def __upsert_memories(self, collection, memories: Iterable[Dict], job=None):
+        """Upsert memories (already checked) in batches."""
+        batch = []
+        loaded = 0
+
+        def upsert():
+            if job is not None:
+                # memories already upserted are kept
+                job.raise_if_stopped()
+            collection.add_points(
+                contents=[m["page_content"] for m in batch],
+                vectors=[m["vector"] for m in batch],
+                metadatas=[m["metadata"] for m in batch],
+                ids=[m["id"] for m in batch],
+            )
+            batch.clear()
 
-        if not any(len_mismatch):
-            message = f'Embedding size mismatch: vectors length should be {embedder_size}'
-            raise Exception(message)
+        for memory in memories:
+            batch.append(memory)
+            loaded += 1
+            if len(batch) >= self.memory_batch_size:
+                upsert()
+        if batch:
+            upsert()
 
-        # Upsert memories in batch mode # TODO REFACTOR: use VectorMemoryCollection.add_point
-        stray.memory.vectors.vector_db.upsert(
-            collection_name="declarative",
-            points=models.Batch(
-                ids=ids,
-                payloads=payloads,
-                vectors=vectors
-            )
-        )
+        log.info(f"Loaded {loaded} vector memories in {collection.collection_name}")
 
     def ingest_file(
             self,
             stray,
-            file: Union[str, UploadFile],
+            file: Union[str, UploadFile, Blob],
             chunk_size: int = 512,
             chunk_overlap: int = 128,
-    ):
+            job=None,
+            incremental: bool = False,
+    ) -> int:
         """Load a file in the Cat's declarative memory.
 
         The method splits and converts the file in Langchain `Document`. Then, it stores the `Document` in the Cat's
         memory.
 
+        By default the file is converted with `file_to_docs` and stored with `store_documents`.
+        With `RABBITHOLE_STREAMING=true`, ingestion is a streaming pipeline instead: the file is parsed lazily
+        (e.g. page by page) and each parsed part is split, embedded and stored while the next ones are still being
+        parsed. Stages are connected by bounded queues, so only a few parts are held in memory at a time. The number
+        of workers of each stage is set by the `RABBITHOLE_SPLIT_WORKERS` (default 1), `RABBITHOLE_EMBED_WORKERS`
+        (default 2) and `RABBITHOLE_UPSERT_WORKERS` (default 1) environment variables, chunks are embedded in batches
+        of `RABBITHOLE_EMBED_BATCH_SIZE` (default 16) and queues hold up to `RABBITHOLE_QUEUE_SIZE` (default 8) items.
+
         Parameters
         ----------
-        file : str, UploadFile
-            The file can be a path passed as a string or an `UploadFile` object if the document is ingested using the
-            `rabbithole` endpoint.
+        file : str, UploadFile, Blob
+            The file can be a path or a URL passed as a string, an `UploadFile` object if the document is ingested
+            using the `rabbithole` endpoint, or a `Blob` already loaded (e.g. a crawled page).
         chunk_size : int
             Number of tokens in each document chunk.
         chunk_overlap : int
             Number of overlapping tokens between consecutive chunks.
+        job : IngestionJob, optional
+            Job running the ingestion (see `cat.jobs`): the ingestion stops when the job is cancelled, the batches of
+            chunks stored are checkpointed and the ones stored by an interrupted run of the job are skipped.
+        incremental : bool
+            Re-ingest a new version of the source: only the chunks not already stored for the same source are
+            embedded and stored, and the stored chunks that are not in the new version are deleted.
+
+        Returns
+        -------
+        chunks : int
+            Number of chunks stored.
 
         Notes
         ----------
         Currently supported formats are `.txt`, `.pdf` and `.md`.
+        In streaming mode, text hooks receive the chunks of a parsed part at a time (e.g. a PDF page), and
+        `before_rabbithole_stores_documents` a batch of chunks at a time, instead of all the chunks of the file at once.
+        Chunks are compared by the hash of their content, saved in the `content_hash` metadata.
+        Duplicate chunks are dropped right after `before_rabbithole_insert_memory`, if enabled (see `__deduplicate`).
 
         See Also
         ----------
         before_rabbithole_stores_documents
         """
 
-        # split file into a list of docs
-        docs = self.file_to_docs(
-            stray=stray,
-            file=file, 
-            chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
-        )
+        blob = self.__file_to_blob(file)
 
         # store in memory
-        if isinstance(file, str):
+        if job is not None:
+            filename = job.source
+        elif isinstance(file, str):
             filename = file
+        elif isinstance(file, Blob):
+            filename = str(file.source)
         else:
             filename = file.filename
 
-        self.store_documents(
-            stray=stray,
-            docs=docs, 
-            source=filename 
-        )
+        if not self.streaming:
+            # split file into a list of docs
+            docs = self.file_to_docs(
+                stray=stray,
+                file=blob,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
+            )
+            # embedder calls are throttled by the admission layer, with lower priority than chat
+            with background_priority():
+                return self.store_documents(
+                    stray=stray,
+                    docs=docs,
+                    source=filename,
+                    incremental=incremental,
+                    job=job
+                )
+
+        parser = MimeTypeBasedParser(handlers=self.file_handlers)
+        progress = IngestionProgress(stray, filename, self.__blob_size(blob))
+        stored = StoredChunks(stray.memory.vectors.declarative, filename) if incremental else None
+        # in incremental mode the chunks stored by an interrupted run of the job are found by hash,
+        # and must be claimed not to be deleted
+        resume = job is not None and not incremental
+        dedup = self.__deduplicator(stray, {filename}, incremental)
+
+        def parse():
+            for part, doc in enumerate(parser.lazy_parse(blob)):
+                size = len(doc.page_content.encode("utf-8"))
+                progress.add_parsed(size)
+                if resume and job.part_committed(part):
+                    # stored by an interrupted run of the job
+                    progress.add_processed(0, size)
+                    continue
+                yield part, doc
+            progress.complete_parsing()
+
+        def split(item):
+            part, doc = item
+            if job is not None:
+                job.raise_if_stopped()
+            docs = self.__split_text(
+                stray=stray,
+                text=[doc],
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
+            )
+            # the parsed bytes are accounted to the last batch of the part
+            size = len(doc.page_content.encode("utf-8"))
+            batches = self.__batches(docs)
+            if job is not None:
+                job.set_batches(part, len(batches))
+            for b, batch in enumerate(batches):
+                batch_size = size if b == len(batches) - 1 else 0
+                if resume and job.is_committed(part, b):
+                    progress.add_processed(0, batch_size)
+                    continue
+                yield batch, batch_size, (part, b)
+            if not batches:
+                progress.add_processed(0, size)
+
+        stray.send_ws_message("I'm parsing the content. Big content could require some minutes...")
+
+        # embedder calls are throttled by the admission layer, with lower priority than chat
+        with background_priority():
+            run_pipeline(
+                parse(),
+                [
+                    Stage("split", split, self.split_workers),
+                    Stage(
+                        "embed",
+                        lambda item: self.__embed(stray, filename, *item, job=job, stored=stored, dedup=dedup),
+                        self.embed_workers
+                    ),
+                    Stage("upsert", lambda item: self.__upsert(stray, progress, *item, job=job), self.upsert_workers),
+                ],
+                queue_size=self.queue_size
+            )
+
+        if stored is not None:
+            self.__delete_unclaimed(stray, filename, stored)
+        if dedup is not None and self.dedup == "reference":
+            self.__add_references(stray, dedup)
+        self.__notify_finished(stray, filename, progress.chunks)
+        return progress.chunks
+
+    def ingest_crawl(
+            self,
+            stray,
+            url: str,
+            chunk_size: int = 512,
+            chunk_overlap: int = 128,
+            max_depth: int = 2,
+            max_pages: int = 50,
+            job=None,
+    ) -> Dict:
+        """Crawl a website from a page and load the pages in the Cat's declarative memory.
+
+        Links are followed to the pages of the same host, up to `max_depth` links away from the first page and
+        `max_pages` pages (see `cat.web.Crawler`). Each page is ingested, incrementally, as soon as it is downloaded,
+        and pages not changed since the last crawl are not ingested again, unless their chunks are not in memory anymore.
+
+        Parameters
+        ----------
+        url : str
+            First page of the crawl.
+        chunk_size : int
+            Number of tokens in each document chunk.
+        chunk_overlap : int
+            Number of overlapping tokens between consecutive chunks.
+        max_depth : int
+            Number of links followed from the first page.
+        max_pages : int
+            Maximum number of pages downloaded.
+        job : IngestionJob, optional
+            Job running the crawl (see `cat.jobs`), the crawl stops when the job is cancelled.
+
+        Returns
+        -------
+        report : Dict
+            Summary of the crawl: pages downloaded, ingested, unchanged and failed.
+        """
+
+        declarative = stray.memory.vectors.declarative
+
+        def is_stored(page_url: str) -> bool:
+            points = declarative.get_points_by_metadata_filter({"source": page_url}, with_payload=False, batch_size=1)
+            return next(points, None) is not None
+
+        # pages deleted from memory (or wiped) since the last crawl are ingested again
+        crawler = Crawler(url, max_depth, max_pages, is_stored=is_stored)
+        handlers = self.file_handlers
+        ingested = 0
+        chunks = 0
+        skipped = []
+        errors = {}
+
+        for page in crawler.crawl():
+            if job is not None:
+                job.raise_if_stopped()
+            if page.download.content_type not in handlers:
+                skipped.append(page.url)
+                continue
+            blob = Blob.from_data(page.download.content, mime_type=page.download.content_type, path=page.url)
+            try:
+                chunks += self.ingest_file(stray, blob, chunk_size, chunk_overlap, incremental=True)
+            except Exception as e:
+                log.error(f"Ingestion of {page.url} failed")
+                log.error(e)
+                errors[page.url] = str(e)
+                continue
+            crawler.page_ingested(page)
+            ingested += 1
+
+        errors.update(crawler.errors)
+        report = {
+            "source": url,
+            "pages": crawler.pages,
+            "ingested": ingested,
+            "unchanged": crawler.unchanged,
+            "skipped": len(skipped),
+            "failed": len(errors),
+            "chunks": chunks,
+            "skipped_pages": skipped,
+            "errors": errors,
+        }
+        metrics.increment("rabbithole_crawled_pages", crawler.pages)
+
+        message = f"Finished crawling {url}: {ingested} of {crawler.pages} pages changed, " \
+                  f"I made {chunks} thoughts on them."
+        stray.send_ws_message(message)
+        log.warning(message)
+
+        return report
+
+    def ingest_bulk(
+            self,
+            stray,
+            path: str,
+            chunk_size: int = 512,
+            chunk_overlap: int = 128,
+            job=None,
+            incremental: bool = False,
+    ) -> Dict:
+        """Load all the files of a folder, or of a zip/tar archive, in the Cat's declarative memory.
+
+        Files are ingested by a single streaming pipeline (see `ingest_file`): they are parsed by
+        `RABBITHOLE_BULK_WORKERS` workers (default 4) with the same parsers, instantiated once, and the chunks of
+        different files are embedded in shared batches. Files not supported by the parsers are skipped, and a file
+        that fails to be parsed does not stop the others. Progress is notified for the whole folder.
+
+        Parameters
+        ----------
+        path : str
+            Path of the folder or of the archive.
+        chunk_size : int
+            Number of tokens in each document chunk.
+        chunk_overlap : int
+            Number of overlapping tokens between consecutive chunks.
+        job : IngestionJob, optional
+            Job running the ingestion (see `cat.jobs`): the files ingested are checkpointed, and the ones ingested
+            by an interrupted run of the job are skipped.
+        incremental : bool
+            Re-ingest a new version of each file, as in `ingest_file`.
+
+        Returns
+        -------
+        report : Dict
+            Summary of the ingestion (see `cat.bulk.BulkReport`).
+
+        Notes
+        -----
+        The source of the chunks of each file is its path in the folder, e.g. `guides/setup.md`.
+        """
+
+        source = job.source if job is not None else os.path.basename(os.path.normpath(path))
+
+        with tempfile.TemporaryDirectory() as extracted:
+            if os.path.isdir(path):
+                folder = path
+            else:
+                extract_archive(path, extracted)
+                folder = extracted
+            files = list_files(folder)
+
+            # parsers are instantiated (by `rabbithole_instantiates_parsers`) once for all the files
+            handlers = self.file_handlers
+            parser = MimeTypeBasedParser(handlers=handlers)
+
+            report = BulkReport(source, len(files))
+            committed = job.files_committed() if job is not None else {}
+            sizes = {}
+            for name, file_path in files:
+                if name in committed:
+                    report.done(name, committed[name])
+                elif mimetypes.guess_type(name)[0] not in handlers:
+                    report.skip(name)
+                else:
+                    sizes[name] = os.path.getsize(file_path)
+
+            progress = IngestionProgress(stray, source, sum(sizes.values()))
+            stored: Dict[str, StoredChunks] = {}
+            dedup = self.__deduplicator(stray, {name for name, _ in files}, incremental)
+            declarative = stray.memory.vectors.declarative
+
+            def ingested(names: List[str]):
+                for name in names:
+                    if incremental:
+                        self.__delete_unclaimed(stray, name, stored.pop(name))
+                    if job is not None:
+                        job.commit_file(name, report.ingested[name])
+                    progress.add_processed(0, sizes[name])
+
+            def parse(item):
+                name, file_path = item
+                if job is not None:
+                    job.raise_if_stopped()
+                if incremental:
+                    stored[name] = StoredChunks(declarative, name)
+                blob = Blob.from_path(file_path, mime_type=mimetypes.guess_type(name)[0], metadata={"source": name})
+                try:
+                    for part, doc in enumerate(parser.lazy_parse(blob)):
+                        report.add_part(name)
+                        yield name, part, doc
+                except Exception as e:
+                    log.error(f"Ingestion of {name} ({source}) failed")
+                    log.error(e)
+                    report.fail(name, str(e))
+                    progress.add_processed(0, sizes[name])
+                    return
+                progress.add_parsed(sizes[name])
+                ingested(report.parsed(name))
+
+            def split(item):
+                name, part, doc = item
+                if job is not None:
+                    job.raise_if_stopped()
+                docs = self.__split_text(stray=stray, text=[doc], chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+                docs = self.__prepare(stray, name, docs, stored=stored.get(name), dedup=dedup)
+                # the same ids if the file is ingested again by a resumed job
+                ids = job.chunk_ids(name, part, len(docs)) if job is not None else [uuid.uuid4().hex for _ in docs]
+                completed = report.split(name, len(docs))
+                if docs:
+                    yield [(name, doc, id) for doc, id in zip(docs, ids)]
+                ingested(completed)
+
+            # chunks of different files are grouped in the same embedding batches
+            pending = []
+
+            def batch(chunks):
+                pending.extend(chunks)
+                while len(pending) >= self.embed_batch_size:
+                    yield pending[:self.embed_batch_size]
+                    del pending[:self.embed_batch_size]
+
+            def flush():
+                if pending:
+                    yield list(pending)
+
+            def embed(chunks):
+                if job is not None:
+                    job.raise_if_stopped()
+                yield chunks, stray.embedder.embed_documents([doc.page_content for _, doc, _ in chunks])
+
+            def upsert(item):
+                chunks, vectors = item
+                declarative.add_points(
+                    [doc.page_content for _, doc, _ in chunks],
+                    vectors,
+                    [doc.metadata for _, doc, _ in chunks],
+                    ids=[id for _, _, id in chunks],
+                )
+                progress.add_processed(len(chunks), 0)
+                counts = {}
+                for name, _, _ in chunks:
+                    counts[name] = counts.get(name, 0) + 1
+                ingested(report.stored(counts))
+
+            stray.send_ws_message(f"I'm reading the {len(sizes)} files of {source}. It could require some minutes...")
+
+            # embedder calls are throttled by the admission layer, with lower priority than chat
+            with background_priority():
+                run_pipeline(
+                    [(name, file_path) for name, file_path in files if name in sizes],
+                    [
+                        Stage("parse", parse, self.bulk_workers),
+                        Stage("split", split, self.split_workers),
+                        Stage("batch", batch, flush=flush),
+                        Stage("embed", embed, self.embed_workers),
+                        Stage("upsert", upsert, self.upsert_workers),
+                    ],
+                    queue_size=self.queue_size
+                )
+
+        if dedup is not None and self.dedup == "reference":
+            self.__add_references(stray, dedup)
+
+        summary = report.report()
+        metrics.increment("rabbithole_bulk_files_ingested", summary["ingested"])
+        metrics.increment("rabbithole_bulk_files_skipped", summary["skipped"])
+        metrics.increment("rabbithole_bulk_files_failed", summary["failed"])
+
+        message = f"Finished reading {source}: {summary['ingested']} of {summary['files']} files, " \
+                  f"I made {summary['chunks']} thoughts on them."
+        if summary["skipped"] or summary["failed"]:
+            message += f" {summary['skipped']} files skipped (not supported), {summary['failed']} failed."
+        stray.send_ws_message(message)
+        log.warning(message)
+
+        return summary
 
     def file_to_docs(
             self,
             stray,
-            file: Union[str, UploadFile],
+            file: Union[str, UploadFile, Blob],
             chunk_size: int = 512,
             chunk_overlap: int = 128
     ) -> List[Document]:
@@ -169,9 +736,10 @@ class RabbitHole:
 
         Parameters
         ----------
-        file : str, UploadFile
+        file : str, UploadFile, Blob
             The file can be either a string path if loaded programmatically, a FastAPI `UploadFile`
-            if coming from the `/rabbithole/` endpoint or a URL if coming from the `/rabbithole/web` endpoint.
+            if coming from the `/rabbithole/` endpoint, a URL if coming from the `/rabbithole/web` endpoint
+            or a `Blob` already loaded.
         chunk_size : int
             Number of tokens in each document chunk.
         chunk_overlap : int
@@ -189,52 +757,13 @@ class RabbitHole:
 
         """
 
-        # Check type of incoming file.
-        if isinstance(file, UploadFile):
-            # Get mime type and source of UploadFile
-            content_type = mimetypes.guess_type(file.filename)[0]
-            source = file.filename
-
-            # Get file bytes
-            file_bytes = file.file.read()
-        elif isinstance(file, str):
-            # Check if string file is a string or url
-            parsed_file = urlparse(file)
-            is_url = all([parsed_file.scheme, parsed_file.netloc])
-
-            if is_url:
-                # Make a request with a fake browser name
-                request = httpx.get(file, headers={"User-Agent": "Magic Browser"})
-
-                # Define mime type and source of url
-                content_type = request.headers["Content-Type"].split(";")[0]
-                source = file
-
-                try:
-                    # Get binary content of url
-                    file_bytes = request.content
-                except HTTPError as e:
-                    log.error(e)
-            else:
-                # Get mime type from file extension and source
-                content_type = mimetypes.guess_type(file)[0]
-                source = os.path.basename(file)
-
-                # Get file bytes
-                with open(file, "rb") as f:
-                    file_bytes = f.read()
-        else:
-            raise ValueError(f"{type(file)} is not a valid type.")
-        return self.string_to_docs(
+        return self.__blob_to_docs(
             stray=stray,
-            file_bytes=file_bytes,
-            source=source,
-            content_type=content_type,
+            blob=self.__file_to_blob(file),
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
 
-
     def string_to_docs(
             self,
             stray,
@@ -271,11 +800,52 @@ class RabbitHole:
         """
 
         # Load the bytes in the Blob schema
-        blob = Blob(data=file_bytes,
-                    mimetype=content_type,
-                    source=source).from_data(data=file_bytes,
-                                             mime_type=content_type,
-                                             path=source)
+        blob = Blob.from_data(data=file_bytes, mime_type=content_type, path=source)
+        return self.__blob_to_docs(
+            stray=stray,
+            blob=blob,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+
+    def __file_to_blob(self, file: Union[str, UploadFile, Blob]) -> Blob:
+        """Wrap a path, URL or uploaded file in a `Blob`, with its mime type and source."""
+
+        # Check type of incoming file.
+        if isinstance(file, Blob):
+            # already downloaded (e.g. by a crawl)
+            return file
+
+        if isinstance(file, UploadFile):
+            # Get mime type and source of UploadFile
+            content_type = mimetypes.guess_type(file.filename)[0]
+            # the file is spooled to disk by Starlette when large, parsers read it from there
+            return UploadBlob(data=None, file=file.file, mimetype=content_type, metadata={"source": file.filename})
+
+        if isinstance(file, str):
+            # Check if string file is a string or url
+            parsed_file = urlparse(file)
+            is_url = all([parsed_file.scheme, parsed_file.netloc])
+
+            if is_url:
+                # streamed with the shared HTTP client, up to the maximum download size
+                page = download(file)
+                return Blob.from_data(data=page.content, mime_type=page.content_type, path=file)
+
+            # Get mime type from file extension, the file is read lazily by the parser
+            content_type = mimetypes.guess_type(file)[0]
+            return Blob.from_path(file, mime_type=content_type, metadata={"source": os.path.basename(file)})
+
+        raise ValueError(f"{type(file)} is not a valid type.")
+
+    def __blob_size(self, blob: Blob) -> int:
+        if isinstance(blob, UploadBlob):
+            return blob.file.seek(0, os.SEEK_END)
+        if blob.data is not None:
+            return len(blob.data)
+        return os.path.getsize(blob.path)
+
+    def __blob_to_docs(self, stray, blob: Blob, chunk_size: int, chunk_overlap: int) -> List[Document]:
         # Parser based on the mime type
         parser = MimeTypeBasedParser(handlers=self.file_handlers)
 
@@ -292,12 +862,12 @@ class RabbitHole:
         )
         return docs
 
-
-    def store_documents(self, stray, docs: List[Document], source: str) -> None:
+    def store_documents(self, stray, docs: List[Document], source: str, incremental: bool = False, job=None) -> int:
         """Add documents to the Cat's declarative memory.
 
         This method loops a list of Langchain `Document` and adds some metadata. Namely, the source filename and the
         timestamp of insertion. Once done, the method notifies the client via Websocket connection.
+        Documents are embedded in batches and stored while the next batches are embedded, as in `ingest_file`.
 
         Parameters
         ----------
@@ -305,6 +875,16 @@ class RabbitHole:
             List of Langchain `Document` to be inserted in the Cat's declarative memory.
         source : str
             Source name to be added as a metadata. It can be a file name or an URL.
+        incremental : bool
+            Only embed and store the documents not already stored for the same source (compared by content hash),
+            and delete the stored documents of the source that are not in `docs`.
+        job : IngestionJob, optional
+            Job running the ingestion, as in `ingest_file`.
+
+        Returns
+        -------
+        chunks : int
+            Number of chunks stored.
 
         Notes
         -------
@@ -323,41 +903,222 @@ class RabbitHole:
             "before_rabbithole_stores_documents", docs, cat=stray
         )
 
-        # classic embed
-        time_last_notification = time.time()
-        time_interval = 10  # a notification every 10 secs
-        for d, doc in enumerate(docs):
-            if time.time() - time_last_notification > time_interval:
-                time_last_notification = time.time()
-                perc_read = int(d / len(docs) * 100)
-                read_message = f"Read {perc_read}% of {source}"
-                stray.send_ws_message(read_message)
-                log.warning(read_message)
+        stored = StoredChunks(stray.memory.vectors.declarative, source) if incremental else None
+        dedup = self.__deduplicator(stray, {source}, incremental)
+
+        sizes = [len(doc.page_content.encode("utf-8")) for doc in docs]
+        progress = IngestionProgress(stray, source, sum(sizes))
+        progress.complete_parsing()
+        progress.add_parsed(sum(sizes))
+
+        # the documents are a single part, checkpointed by batch
+        starts = range(0, len(docs), self.embed_batch_size)
+        if job is not None:
+            job.set_batches(0, len(starts))
+        batches = []
+        for b, start in enumerate(starts):
+            end = start + self.embed_batch_size
+            if job is not None and not incremental and job.is_committed(0, b):
+                # stored by an interrupted run of the job
+                progress.add_processed(0, sum(sizes[start:end]))
+                continue
+            batches.append((docs[start:end], sum(sizes[start:end]), (0, b)))
+
+        run_pipeline(
+            batches,
+            [
+                Stage(
+                    "embed",
+                    lambda item: self.__embed(
+                        stray, source, *item, stores_hook=False, job=job, stored=stored, dedup=dedup
+                    ),
+                    self.embed_workers
+                ),
+                Stage("upsert", lambda item: self.__upsert(stray, progress, *item, job=job), self.upsert_workers),
+            ],
+            queue_size=self.queue_size
+        )
+
+        if stored is not None:
+            self.__delete_unclaimed(stray, source, stored)
+        if dedup is not None and self.dedup == "reference":
+            self.__add_references(stray, dedup)
+        self.__notify_finished(stray, source, progress.chunks)
+        return progress.chunks
+
+    def __batches(self, docs: List[Document]) -> List[List[Document]]:
+        return [docs[i:i + self.embed_batch_size] for i in range(0, len(docs), self.embed_batch_size)]
+
+    def __embed(self, stray, source: str, docs: List[Document], size: int, key=None, stores_hook: bool = True,
+                job=None, stored: StoredChunks = None, dedup: ChunkDeduplicator = None):
+        """Pipeline stage: add metadata to a batch of chunks, run the hooks and embed them."""
+
+        if job is not None:
+            job.raise_if_stopped()
+
+        to_store = self.__prepare(stray, source, docs, stores_hook, stored, dedup)
+        vectors = stray.embedder.embed_documents([doc.page_content for doc in to_store]) if to_store else []
+        yield to_store, vectors, size, key
 
+    def __prepare(self, stray, source: str, docs: List[Document], stores_hook: bool = True,
+                  stored: StoredChunks = None, dedup: ChunkDeduplicator = None) -> List[Document]:
+        """Add metadata to chunks and run the hooks, returns the chunks to embed."""
+
+        # hook the docs before they are stored in the vector memory
+        if stores_hook:
+            docs = stray.mad_hatter.execute_hook(
+                "before_rabbithole_stores_documents", docs, cat=stray
+            )
+
+        to_store = []
+        for doc in docs:
             doc.metadata["source"] = source
             doc.metadata["when"] = time.time()
             doc = stray.mad_hatter.execute_hook(
                 "before_rabbithole_insert_memory", doc, cat=stray
             )
-            inserting_info = f"{d + 1}/{len(docs)}):    {doc.page_content}"
-            if doc.page_content != "":
-                doc_embedding = stray.embedder.embed_documents([doc.page_content])
-                _ = stray.memory.vectors.declarative.add_point(
-                    doc.page_content,
-                    doc_embedding[0],
-                    doc.metadata,
-                )
+            if doc.page_content == "":
+                log.info(f"Skipped memory insertion of empty doc ({source})")
+                continue
+            doc.metadata["content_hash"] = content_hash(doc.page_content)
+            if stored is not None and stored.claim(doc.metadata["content_hash"]):
+                # unchanged since the last ingestion of the source
+                continue
+            to_store.append(doc)
+
+        # compared by the content stored, as edited by the hooks
+        if dedup is not None:
+            to_store = self.__deduplicate(dedup, to_store, source)
+        return to_store
+
+    def __upsert(self, stray, progress: IngestionProgress, docs: List[Document], vectors: List[List[float]], size: int,
+                 key=None, job=None):
+        """Pipeline stage: store a batch of embedded chunks."""
+
+        if docs:
+            stray.memory.vectors.declarative.add_points(
+                [doc.page_content for doc in docs],
+                vectors,
+                [doc.metadata for doc in docs],
+                # the same ids if the batch is stored again by a resumed job
+                ids=job.point_ids(key, len(docs)) if job is not None else None,
+            )
+            log.info(f"Inserted {len(docs)} chunks of {progress.source} into memory")
+        if job is not None:
+            job.commit(key, len(docs))
+        progress.add_processed(len(docs), size)
 
-                log.info(f"Inserted into memory ({inserting_info})")
-            else:
-                log.info(f"Skipped memory insertion of empty doc ({inserting_info})")
+    def __deduplicator(self, stray, sources: Set[str], incremental: bool) -> Optional[ChunkDeduplicator]:
+        """Index of the chunks of an upload, looking up their duplicates in declarative memory.
+
+        Returns `None` if deduplication is off.
+        """
+
+        if self.dedup == "off":
+            return None
 
-            # wait a little to avoid APIs rate limit errors
-            time.sleep(0.1)
+        declarative = stray.memory.vectors.declarative
 
+        def lookup(chunk_hash: str, bands: List[str]):
+            points = declarative.get_points_matching_any(
+                {"content_hash": [chunk_hash], "simhash_bands": bands},
+                # in incremental mode the chunks of the previous version are compared by `StoredChunks`
+                exclude={"source": sorted(sources)} if incremental else None,
+                with_payload=["metadata"],
+            )
+            for point in points:
+                metadata = point.payload.get("metadata") or {}
+                # chunks without bands are too short to be compared by fingerprint
+                fingerprint = metadata.get("simhash") if metadata.get("simhash_bands") else None
+                yield metadata.get("content_hash"), int(fingerprint, 16) if fingerprint else None
+
+        dedup = ChunkDeduplicator(self.dedup_distance, lookup=lookup)
+        self.__fingerprint_stored(declarative, dedup)
+        return dedup
+
+    def __fingerprint_stored(self, declarative, dedup: ChunkDeduplicator):
+        """Fingerprint the chunks stored without (e.g. while deduplication was off), only once."""
+
+        declarative.create_metadata_index("content_hash")
+        declarative.create_metadata_index("simhash_bands")
+
+        fingerprinted = 0
+        for point in declarative.get_points_without_metadata("simhash"):
+            metadata = point.payload.get("metadata") or {}
+            content = point.payload.get("page_content") or ""
+            if not metadata.get("content_hash"):
+                metadata["content_hash"] = content_hash(content)
+            self.__fingerprint(dedup, metadata, content)
+            declarative.update_point_metadata(point.id, metadata)
+            fingerprinted += 1
+        if fingerprinted:
+            log.info(f"Fingerprinted {fingerprinted} chunks in declarative memory")
+
+    def __fingerprint(self, dedup: ChunkDeduplicator, metadata: Dict, text: str) -> Optional[int]:
+        """Save the SimHash fingerprint of a chunk and its bands in the metadata.
+
+        Returns `None` if the chunk is too short to be compared by fingerprint (and has no bands).
+        """
+        fingerprint, shingles = simhash(text)
+        metadata["simhash"] = format(fingerprint, "016x")
+        if shingles < dedup.min_shingles:
+            fingerprint = None
+        metadata["simhash_bands"] = dedup.bands(fingerprint)
+        return fingerprint
+
+    def __deduplicate(self, dedup: ChunkDeduplicator, docs: List[Document], source: str) -> List[Document]:
+        """Drop the chunks duplicating (or nearly duplicating) a chunk in memory or a previous chunk of the upload.
+
+        Deduplication is set by the `RABBITHOLE_DEDUP` environment variable:
+
+            - `off` (default): all the chunks are stored;
+            - `skip`: duplicate chunks are not embedded nor stored;
+            - `reference`: as `skip`, and the source of the duplicate is added to the `duplicates` metadata
+              of the chunk it duplicates (if from another source).
+
+        Near duplicates have SimHash fingerprints differing by at most `RABBITHOLE_DEDUP_DISTANCE` bits (default 3).
+        The fingerprint is saved in the `simhash` metadata and its bands in `simhash_bands`, so the candidate
+        duplicates in memory are found by a filter on `content_hash` and `simhash_bands` (indexed in a remote Qdrant)
+        instead of scrolling the collection. Chunks stored without fingerprint are fingerprinted once.
+        """
+
+        kept = []
+        for doc in docs:
+            fingerprint = self.__fingerprint(dedup, doc.metadata, doc.page_content)
+            original = dedup.duplicate_of(doc.page_content, doc.metadata["content_hash"], fingerprint)
+            if original is None:
+                kept.append(doc)
+            elif self.dedup == "reference":
+                dedup.reference(original, source)
+
+        if len(kept) < len(docs):
+            log.info(f"Skipped {len(docs) - len(kept)} duplicate chunks of {source}")
+            metrics.increment("rabbithole_duplicate_chunks", len(docs) - len(kept))
+        return kept
+
+    def __add_references(self, stray, dedup: ChunkDeduplicator):
+        """Add the sources of the skipped duplicates to the chunks they duplicate."""
+
+        declarative = stray.memory.vectors.declarative
+        for chunk_hash, sources in dedup.references.items():
+            for point in declarative.get_points_by_metadata_filter({"content_hash": chunk_hash}):
+                metadata = point.payload.get("metadata") or {}
+                duplicates = set(metadata.get("duplicates", [])) | (sources - {metadata.get("source")})
+                if duplicates != set(metadata.get("duplicates", [])):
+                    metadata["duplicates"] = sorted(duplicates)
+                    declarative.update_point_metadata(point.id, metadata)
+
+    def __delete_unclaimed(self, stray, source: str, stored: StoredChunks):
+        """Delete, with a single request, the chunks of the source not found again by an incremental ingestion."""
+        ids = stored.unclaimed()
+        if ids:
+            stray.memory.vectors.declarative.delete_points(ids)
+        log.info(f"Deleted {len(ids)} chunks of {source} not found in the new version")
+
+    def __notify_finished(self, stray, source: str, chunks: int):
         # notify client
         finished_reading_message = f"Finished reading {source}, " \
-                                   f"I made {len(docs)} thoughts on it."
+                                   f"I made {chunks} thoughts on it."
 
         stray.send_ws_message(finished_reading_message)
 
@@ -367,7 +1128,7 @@ class RabbitHole:
     def __split_text(self, stray, text, chunk_size, chunk_overlap):
         """Split text in overlapped chunks.
 
-        This method executes the `rabbithole_splits_text` to split the incoming text in overlapped
+        This method executes the `rabbithole_splits_text` to choose the splitter of the incoming text in overlapped
         chunks of text. Other two hooks are available to edit the text before and after the split step.
 
         Parameters
@@ -386,8 +1147,10 @@ class RabbitHole:
 
         Notes
         -----
-        The default behavior only executes the `rabbithole_splits_text` hook. `before_rabbithole_splits_text` and
-        `after_rabbithole_splitted_text` hooks return the original input without any modification.
+        The default splitter is a recursive splitter counting tokens with tiktoken, plugins can choose another one
+        (e.g. `TokenOffsetsTextSplitter`) in the `rabbithole_splits_text` hook.
+        `before_rabbithole_splits_text` and `after_rabbithole_splitted_text` hooks return the original input
+        without any modification.
 
         See Also
         --------
@@ -401,15 +1164,21 @@ class RabbitHole:
             "before_rabbithole_splits_text", text, cat=stray
         )
 
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separators=["\\n\\n", "\n\n", ".\\n", ".\n", "\\n", "\n", " ", ""],
-            encoding_name = "cl100k_base",
+            # counts tokens like `from_tiktoken_encoder`, with the encoding loaded once per process
+            length_function=lambda t: len(get_tiktoken_encoding("cl100k_base").encode(t)),
             keep_separator=True,
             strip_whitespace = True
         )
 
+        # plugins can choose another splitter
+        text_splitter = stray.mad_hatter.execute_hook(
+            "rabbithole_splits_text", text_splitter, cat=stray
+        )
+
         log.info(f"Chunk size: {chunk_size}, chunk overlap: {chunk_overlap}")
         # split text
         docs = text_splitter.split_documents(text)
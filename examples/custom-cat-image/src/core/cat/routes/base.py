@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 from typing import Dict
 from cat.db.database import Database
+from cat.metrics import get_metrics
+from cat.factory.llm_router import get_latency_stats_summary
+from cat.factory.admission import get_limiters_stats
 import tomli
 
 
@@ -18,3 +21,14 @@ async def home() -> Dict:
         "status": "We're all mad here, dear!",
         "version": project_toml['version']
     }
+
+
+# runtime metrics
+@router.get("/metrics")
+async def metrics() -> Dict:
+    """Runtime metrics: counters and gauges, LLM latencies, LLM and embedder providers admission"""
+
+    return get_metrics() | {
+        "llm_latency": get_latency_stats_summary(),
+        "providers": get_limiters_stats(),
+    }
@@ -3,6 +3,7 @@ from typing import Dict
 from fastapi import Request, APIRouter, Body, HTTPException
 
 from cat.factory.embedder import get_allowed_embedder_models,get_embedders_schemas
+from cat.factory.admission import original_class
 from cat.db import crud, models
 from cat.log import log
 from cat import utils
@@ -34,7 +35,7 @@ def get_embedders_settings(request: Request) -> Dict:
         # Deduce selected embedder:
         ccat = request.app.state.ccat
         for embedder_config_class in reversed(SUPPORTED_EMDEDDING_MODELS):
-            if embedder_config_class._pyclass.default == type(ccat.embedder):
+            if embedder_config_class._pyclass.default == original_class(ccat.embedder):
                 selected = embedder_config_class.__name__
     
     saved_settings = crud.get_settings_by_category(category=EMBEDDER_CATEGORY)
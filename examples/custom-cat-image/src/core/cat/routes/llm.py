@@ -3,6 +3,7 @@ from typing import Dict
 from fastapi import Request, APIRouter, Body, HTTPException
 
 from cat.factory.llm import get_llms_schemas
+from cat.factory.llm_router import get_latency_stats_summary
 from cat.db import crud, models
 from cat.log import log
 from cat import utils
@@ -50,6 +51,7 @@ def get_llms_settings() -> Dict:
     return {
         "settings": settings,
         "selected_configuration": selected,
+        "latency_stats": get_latency_stats_summary(),
     }
 
 
@@ -140,3 +142,131 @@ def upsert_llm_setting(
     ccat.mad_hatter.find_plugins()
 
     return status
+
+
+# general utility LLM settings are saved in settings table under this category
+LLM_UTILITY_SELECTED_CATEGORY = "llm_utility"
+
+# utility LLM type and config are saved in settings table under this category
+LLM_UTILITY_CATEGORY = "llm_utility_factory"
+
+# utility llm selected configuration is saved under this name
+LLM_UTILITY_SELECTED_NAME = "llm_utility_selected"
+
+
+# utility LLM settings are saved apart from the main LLM ones, as the same class may be configured for both
+def get_utility_setting_name(languageModelName: str) -> str:
+    return f"utility_{languageModelName}"
+
+
+def check_language_model_name(languageModelName: str, LLM_SCHEMAS: Dict):
+    allowed_configurations = list(LLM_SCHEMAS.keys())
+    if languageModelName not in allowed_configurations:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": f"{languageModelName} not supported. Must be one of {allowed_configurations}"
+            }
+        )
+
+
+# get configured utility LLMs and configuration schemas
+@router.get("/utility/settings")
+def get_utility_llms_settings() -> Dict:
+    """Get the list of the utility Large Language Models, used for tools selection and forms extraction"""
+    LLM_SCHEMAS = get_llms_schemas()
+
+    # get selected utility LLM, if any (otherwise the main LLM is used)
+    selected = crud.get_setting_by_name(name=LLM_UTILITY_SELECTED_NAME)
+    if selected is not None:
+        selected = selected["value"]["name"]
+
+    saved_settings = crud.get_settings_by_category(category=LLM_UTILITY_CATEGORY)
+    saved_settings = { s["name"]: s for s in saved_settings }
+
+    settings = []
+    for class_name, schema in LLM_SCHEMAS.items():
+
+        setting_name = get_utility_setting_name(class_name)
+        if setting_name in saved_settings:
+            saved_setting = saved_settings[setting_name]["value"]
+        else:
+            saved_setting = {}
+
+        settings.append({
+            "name"  : class_name,
+            "value" : saved_setting,
+            "schema": schema,
+        })
+
+    return {
+        "settings": settings,
+        "selected_configuration": selected,
+    }
+
+
+# get utility LLM settings and its schema
+@router.get("/utility/settings/{languageModelName}")
+def get_utility_llm_settings(request: Request, languageModelName: str) -> Dict:
+    """Get settings and schema of the specified utility Large Language Model"""
+    LLM_SCHEMAS = get_llms_schemas()
+    check_language_model_name(languageModelName, LLM_SCHEMAS)
+
+    setting = crud.get_setting_by_name(name=get_utility_setting_name(languageModelName))
+    schema = LLM_SCHEMAS[languageModelName]
+
+    if setting is None:
+        setting = {}
+    else:
+        setting = setting["value"]
+
+    return {
+        "name": languageModelName,
+        "value": setting,
+        "schema": schema
+    }
+
+
+@router.put("/utility/settings/{languageModelName}")
+def upsert_utility_llm_setting(
+    request: Request,
+    languageModelName: str,
+    payload: Dict = Body(examples={"openai_api_key": "your-key-here", "model_name": "gpt-3.5-turbo"}),
+) -> Dict:
+    """Upsert the utility Large Language Model setting"""
+    LLM_SCHEMAS = get_llms_schemas()
+    check_language_model_name(languageModelName, LLM_SCHEMAS)
+
+    # create the setting and upsert it
+    final_setting = crud.upsert_setting_by_name(
+        models.Setting(name=get_utility_setting_name(languageModelName), category=LLM_UTILITY_CATEGORY, value=payload)
+    )
+
+    crud.upsert_setting_by_name(
+        models.Setting(name=LLM_UTILITY_SELECTED_NAME, category=LLM_UTILITY_SELECTED_CATEGORY, value={"name":languageModelName})
+    )
+
+    # reload utility llm of the cat (embedder and memory do not depend on it)
+    ccat = request.app.state.ccat
+    ccat._utility_llm = ccat.load_utility_language_model()
+
+    return {
+        "name": languageModelName,
+        "value": final_setting["value"]
+    }
+
+
+@router.delete("/utility/settings")
+def delete_utility_llm_setting(request: Request) -> Dict:
+    """Stop using a utility Large Language Model, the main one will be used instead"""
+
+    selected = crud.get_setting_by_name(name=LLM_UTILITY_SELECTED_NAME)
+    if selected is not None:
+        crud.delete_setting_by_id(selected["setting_id"])
+
+    ccat = request.app.state.ccat
+    ccat._utility_llm = ccat.load_utility_language_model()
+
+    return {
+        "deleted": selected is not None
+    }
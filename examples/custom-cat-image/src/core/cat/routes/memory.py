@@ -1,6 +1,9 @@
-from typing import Dict
+from typing import Dict, Literal
 from cat.headers import session
+from cat.serialization import CatJSONResponse, dumps, vector_to_base64
+from cat.web import CrawlCache
 from fastapi import Query, Request, APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 
 router = APIRouter()
 
@@ -10,9 +13,18 @@ async def recall_memories_from_text(
     request: Request,
     text: str = Query(description="Find memories similar to this text."),
     k: int = Query(default=100, description="How many memories to return."),
+    vectors_format: Literal["list", "base64"] = Query(
+        default="list",
+        description="Return vectors as lists of numbers or as base64 of little-endian float32 bytes (much smaller)."
+    ),
 ) -> Dict:
     """Search k memories similar to given text."""
 
+    if vectors_format == "base64":
+        encode_vector = vector_to_base64
+    else:
+        encode_vector = lambda vector: vector
+
     ccat = request.app.state.ccat
     vector_memory = ccat.memory.vectors
 
@@ -20,7 +32,7 @@ async def recall_memories_from_text(
     query_embedding = ccat.embedder.embed_query(text)
     query = {
         "text": text,
-        "vector": query_embedding,
+        "vector": encode_vector(query_embedding),
     }
 
     # Loop over collections and retrieve nearby memories
@@ -49,16 +61,18 @@ async def recall_memories_from_text(
             memory_dict.pop("lc_kwargs", None)  # langchain stuff, not needed
             memory_dict["id"] = id
             memory_dict["score"] = float(score)
-            memory_dict["vector"] = vector
+            memory_dict["vector"] = encode_vector(vector)
             recalled[c].append(memory_dict)
 
-    return {
+    # returned directly to skip the slow validation of thousands of floats
+    return CatJSONResponse({
         "query": query,
         "vectors": {
             "embedder": str(ccat.embedder.__class__.__name__),  # TODO: should be the config class name
+            "vectors_format": vectors_format,
             "collections": recalled
         }
-    }
+    })
 
 
 # GET collection list with some metadata
@@ -84,6 +98,65 @@ async def get_collections(request: Request) -> Dict:
     }
 
 
+# GET points of a collection as NDJSON
+@router.get("/collections/{collection_id}/export")
+async def export_collection(
+    request: Request,
+    collection_id: str,
+    vectors_format: Literal["list", "base64"] = Query(
+        default="list",
+        description="Export vectors as lists of numbers or as base64 of little-endian float32 bytes (much smaller)."
+    ),
+    batch_size: int = Query(default=1000, gt=0, description="Points read from the vector database at a time."),
+) -> StreamingResponse:
+    """Export all the points of a collection as NDJSON, streamed while the collection is scrolled.
+
+    The first line describes the export (embedder, collection, vector size and format), each of the next ones is a
+    point with its `id`, `page_content`, `metadata` and `vector`. The file can be imported with `/rabbithole/memory`.
+    """
+
+    ccat = request.app.state.ccat
+    vector_memory = ccat.memory.vectors
+
+    # check if collection exists
+    collections = list(vector_memory.collections.keys())
+    if collection_id not in collections:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Collection does not exist."}
+        )
+
+    if vectors_format == "base64":
+        encode_vector = vector_to_base64
+    else:
+        encode_vector = lambda vector: vector
+
+    collection = vector_memory.collections[collection_id]
+    header = {
+        "embedder": str(ccat.embedder.__class__.__name__),
+        "collection": collection_id,
+        "vector_size": collection.embedder_size,
+        "vectors_format": vectors_format,
+    }
+
+    # iterated in the threadpool, one page of points in memory at a time
+    def lines():
+        yield dumps(header) + b"\n"
+        for point in collection.get_points_by_metadata_filter(with_vectors=True, batch_size=batch_size):
+            yield dumps({
+                "id": point.id,
+                "page_content": point.payload.get("page_content"),
+                "metadata": point.payload.get("metadata") or {},
+                "vector": encode_vector(point.vector),
+            }) + b"\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{collection_id}.ndjson"'},
+    )
+
+
 # DELETE all collections
 @router.delete("/collections")
 async def wipe_collections(
@@ -102,6 +175,8 @@ async def wipe_collections(
 
     ccat.load_memory()  # recreate the long term memories
     ccat.mad_hatter.find_plugins()
+    # crawled pages must be ingested again
+    CrawlCache().clear()
 
     return {
         "deleted": to_return,
@@ -131,6 +206,9 @@ async def wipe_single_collection(request: Request, collection_id: str) -> Dict:
 
     ccat.load_memory()  # recreate the long term memories
     ccat.mad_hatter.find_plugins()
+    if collection_id == "declarative":
+        # crawled pages must be ingested again
+        CrawlCache().clear()
 
     return {
         "deleted": to_return,
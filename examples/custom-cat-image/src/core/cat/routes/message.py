@@ -0,0 +1,224 @@
+import os
+import time
+import asyncio
+from typing import Dict, List
+
+from fastapi import APIRouter, Request, Body, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+
+from cat.looking_glass.stray_cat import StrayCat
+from cat.looking_glass.verbosity import VERBOSITY, trim_message
+from cat.log import log
+from cat.serialization import dumps, dumps_str
+from cat import utils
+
+router = APIRouter()
+
+
+def get_batch_max_concurrency() -> int:
+    """Maximum `concurrency` of `/message/batch`, from `MESSAGE_BATCH_MAX_CONCURRENCY` (default 8).
+
+    Each running message holds a thread of the (40 threads) threadpool, which is shared with chat and uploads.
+    """
+    return int(os.getenv("MESSAGE_BATCH_MAX_CONCURRENCY", 8))
+
+
+class HTTPConnection:
+    """Stands for a websocket in the connections of a `StrayCat` serving a single HTTP request.
+
+    Messages sent by the Cat during the turn (tokens, notifications) are collected
+    to be streamed as Server-Sent Events, or discarded if the reply is not streamed.
+    """
+
+    def __init__(self, stream: bool):
+        self.stream = stream
+        # serialized messages, `None` when the turn is over
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    async def send_text(self, text: str):
+        if self.stream:
+            await self.events.put(text)
+
+    async def close(self, cat_message: Dict):
+        await self.events.put(dumps_str(cat_message))
+        await self.events.put(None)
+
+
+async def run_turn(stray: StrayCat, user_message: Dict, connection: HTTPConnection) -> Dict:
+
+    # cancellable (e.g. the client goes away) while waiting for a thread
+    stray.prepare_turn()
+    try:
+        # Run the `stray` object's method in a threadpool since it might be a CPU-bound operation.
+        cat_message = await run_in_threadpool(stray.run, user_message)
+    except Exception as e:
+        log.error(e)
+        cat_message = {
+            "type": "error",
+            "name": type(e).__name__,
+            "description": utils.explicit_error_message(e),
+        }
+    finally:
+        # the request stray is not used anymore, its loop runs to close its HTTP client
+        await run_in_threadpool(stray.close)
+
+    # turn cancelled, the client went away
+    if cat_message is None:
+        return None
+
+    # wait for tokens and notifications to be sent before the final message
+    await stray.connections.drain()
+    cat_message = trim_message(cat_message, stray.connections.verbosity)
+    stray.connections.detach(connection)
+    await connection.close(cat_message)
+    return cat_message
+
+
+@router.post("/message")
+async def message(
+    request: Request,
+    payload: Dict = Body(examples=[{"text": "Hello, Cat!", "user_id": "user"}]),
+    stream: bool = False,
+    verbosity: VERBOSITY = None,
+):
+    """Send a message to the Cat over plain HTTP, without keeping a websocket open.
+
+    The message is processed by the same pipeline as websocket messages, with a fresh working memory
+    (no conversation history). The reply is the same JSON sent on the websocket or, with `stream=true`
+    or an `Accept: text/event-stream` header, a Server-Sent Events stream with tokens and notifications
+    followed by the final reply. `verbosity` (`minimal`, `ids` or `full`) controls how much of the `why` is returned.
+    """
+
+    if not isinstance(payload.get("text"), str):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Message must have a `text` field."}
+        )
+
+    stream = stream or "text/event-stream" in request.headers.get("accept", "")
+
+    user_message = dict(payload)
+    user_message["user_id"] = str(payload.get("user_id", "user"))
+
+    # Temporary conversation-based `cat` object, living for this request only
+    stray = StrayCat(
+        user_id=user_message["user_id"],
+        main_loop=asyncio.get_running_loop()
+    )
+    connection = HTTPConnection(stream=stream)
+    stray.connections.attach(connection, verbosity)
+
+    if not stream:
+        return await run_turn(stray, user_message, connection)
+
+    async def events():
+        turn = asyncio.create_task(run_turn(stray, user_message, connection))
+        try:
+            while (text := await connection.events.get()) is not None:
+                yield f"data: {text}\n\n"
+        finally:
+            # client disconnected before the end of the turn
+            if not turn.done():
+                stray.cancel()
+                stray.connections.detach(connection)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/message/batch")
+async def message_batch(
+    payload: Dict = Body(examples=[{
+        "messages": [
+            {"user_id": "Alice", "text": "Where is the White Rabbit?"},
+            {"user_id": "Bill", "text": "Who stole the tarts?"},
+        ],
+        "concurrency": 4,
+        "store_episodic_memory": False,
+        "why": False,
+    }]),
+):
+    """Process many messages, e.g. to replay historical questions for evaluation or cache warming.
+
+    Each message runs through the same pipeline as `/message`, up to `concurrency` at a time
+    (at most `MESSAGE_BATCH_MAX_CONCURRENCY`, default 8).
+    Results are streamed as NDJSON in order of completion: each line is the Cat reply with the `index`
+    of the message in the batch and the seconds spent in each stage (`timings`).
+    The `why` of replies is included only if requested, and with `store_episodic_memory` set to `false`
+    the messages are not stored in episodic memory.
+    """
+
+    messages = payload.get("messages")
+    if not isinstance(messages, list) or \
+            not all(isinstance(m, dict) and isinstance(m.get("text"), str) for m in messages):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "`messages` must be a list of messages with a `text` field."}
+        )
+
+    concurrency = payload.get("concurrency", 4)
+    if not isinstance(concurrency, int) or concurrency < 1:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "`concurrency` must be a positive integer."}
+        )
+    concurrency = min(concurrency, get_batch_max_concurrency())
+
+    store_episodic_memory = payload.get("store_episodic_memory", True) is not False
+    include_why = payload.get("why", False) is True
+
+    main_loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    # strays running a turn, to cancel them if the client goes away
+    running: List[StrayCat] = []
+    stopped = False
+
+    async def process(index: int, message: Dict) -> Dict:
+        async with semaphore:
+            if stopped:
+                return None
+
+            user_message = dict(message)
+            user_message["user_id"] = str(message.get("user_id", "user"))
+
+            stray = StrayCat(
+                user_id=user_message["user_id"],
+                main_loop=main_loop
+            )
+            stray.store_episodic_memory = store_episodic_memory
+            connection = HTTPConnection(stream=False)
+            stray.connections.attach(connection, "full" if include_why else "minimal")
+
+            running.append(stray)
+            start = time.perf_counter()
+            try:
+                cat_message = await run_turn(stray, user_message, connection)
+            finally:
+                running.remove(stray)
+
+            if cat_message is None:
+                return None
+
+            result = {"index": index} | cat_message
+            if not include_why:
+                result.pop("why", None)
+            result["timings"] = stray.working_memory.get("timings", {}) | {
+                "total": time.perf_counter() - start
+            }
+            return result
+
+    async def results():
+        nonlocal stopped
+        tasks = [asyncio.create_task(process(i, m)) for i, m in enumerate(messages)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if result is not None:
+                    yield dumps(result) + b"\n"
+        finally:
+            # client disconnected: skip waiting messages and cancel running turns
+            stopped = True
+            for stray in running:
+                stray.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
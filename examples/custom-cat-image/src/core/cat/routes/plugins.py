@@ -1,8 +1,10 @@
+import shutil
 import mimetypes
 from copy import deepcopy
 from typing import Dict
 from tempfile import NamedTemporaryFile
 from fastapi import Body, Request, APIRouter, HTTPException, UploadFile, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from cat.log import log
 from cat.mad_hatter.registry import registry_search_plugins, registry_download_plugin
 from urllib.parse import urlparse
@@ -93,7 +95,8 @@ async def install_plugin(
     log.info(f"Uploading {content_type} plugin {file.filename}")
     plugin_archive_path = f"/tmp/{file.filename}"
     with open(plugin_archive_path, "wb+") as f:
-        f.write(file.file.read())
+        # copied in chunks, outside of the event loop
+        await run_in_threadpool(shutil.copyfileobj, file.file, f)
     ccat.mad_hatter.install_plugin(plugin_archive_path)
 
     return {
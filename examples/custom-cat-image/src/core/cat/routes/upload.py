@@ -1,10 +1,16 @@
 import mimetypes
-import requests
 from typing import Dict
 
-from fastapi import Body, Depends, Request, APIRouter, UploadFile, BackgroundTasks, HTTPException
+import httpx
+
+from fastapi import Body, Depends, Request, APIRouter, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from cat.headers import session
+from cat.factory.http_client import get_async_http_client
+from cat.web import USER_AGENT, get_web_timeout
+from cat.bulk import ARCHIVE_EXTENSIONS, is_archive, resolve_server_path
+from cat.rabbit_hole import NDJSON_EXTENSIONS
 from cat.log import log
 
 router = APIRouter()
@@ -15,16 +21,21 @@ router = APIRouter()
 async def upload_file(
     request: Request,
     file: UploadFile,
-    background_tasks: BackgroundTasks,
     chunk_size: int = Body(
         default=512,
         description="Maximum length of each chunk after the document is split (in characters)",
     ),
     chunk_overlap: int = Body(default=128, description="Chunk overlap (in characters)"),
+    priority: int = Body(default=0, description="Ingestion jobs with higher priority run first"),
+    incremental: bool = Body(
+        default=False,
+        description="Only embed the chunks changed since the last upload of the same source, and delete the ones removed",
+    ),
     stray = Depends(session),
 ) -> Dict:
     """Upload a file containing text (.txt, .md, .pdf, etc.). File content will be extracted and segmented into chunks.
     Chunks will be then vectorized and stored into documents memory.
+    The file is ingested by a job, whose status is available at `/rabbithole/jobs/{job_id}`.
     """
 
     # Check the file format is supported
@@ -42,9 +53,10 @@ async def upload_file(
                 "error": f'MIME type {content_type} not supported. Admitted types: {" - ".join(admitted_types)}'}
         )
 
-    # upload file to long term memory, in the background
-    background_tasks.add_task(
-        stray.rabbit_hole.ingest_file, stray, file, chunk_size, chunk_overlap
+    # upload file to long term memory, with an ingestion job
+    job = await run_in_threadpool(
+        request.app.state.ingestion_jobs.submit_file,
+        stray, file.file, file.filename, chunk_size, chunk_overlap, priority, incremental
     )
 
     # reply to client
@@ -52,13 +64,81 @@ async def upload_file(
         "filename": file.filename,
         "content_type": file.content_type,
         "info": "File is being ingested asynchronously",
+        "job_id": job["job_id"],
+    }
+
+
+@router.post("/bulk")
+async def upload_bulk(
+    request: Request,
+    file: UploadFile = None,
+    path: str = Body(
+        default=None,
+        description="Folder (or archive) on the server, relative to the RABBITHOLE_BULK_FOLDER folder",
+    ),
+    chunk_size: int = Body(
+        default=512,
+        description="Maximum length of each chunk after the document is split (in characters)",
+    ),
+    chunk_overlap: int = Body(default=128, description="Chunk overlap (in characters)"),
+    priority: int = Body(default=0, description="Ingestion jobs with higher priority run first"),
+    incremental: bool = Body(
+        default=False,
+        description="Only embed the chunks changed since the last upload of each file, and delete the ones removed",
+    ),
+    stray = Depends(session),
+) -> Dict:
+    """Upload a zip/tar archive of files, or give the path of a folder on the server, to ingest all its files.
+    Files of supported types are segmented into chunks, vectorized and stored into documents memory.
+    The files are ingested by a single job, whose status (and summary report, once done) is available at
+    `/rabbithole/jobs/{job_id}`.
+    """
+
+    if (file is None) == (path is None):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Upload an archive or give the path of a folder, not both"}
+        )
+
+    jobs = request.app.state.ingestion_jobs
+
+    if file is not None:
+        if not is_archive(file.filename):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": f'{file.filename} is not a supported archive. Admitted types: {" - ".join(ARCHIVE_EXTENSIONS)}'
+                }
+            )
+        log.info(f"Uploaded archive {file.filename} down the rabbit hole")
+
+        job = await run_in_threadpool(
+            jobs.submit_archive, stray, file.file, file.filename, chunk_size, chunk_overlap, priority, incremental
+        )
+        return {
+            "filename": file.filename,
+            "info": "Archive is being ingested asynchronously",
+            "job_id": job["job_id"],
+        }
+
+    try:
+        folder = resolve_server_path(path)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail={"error": str(e)})
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+
+    job = jobs.submit_folder(stray, folder, chunk_size, chunk_overlap, priority, incremental)
+    return {
+        "path": path,
+        "info": "Folder is being ingested asynchronously",
+        "job_id": job["job_id"],
     }
 
 
 @router.post("/web")
 async def upload_url(
     request: Request,
-    background_tasks: BackgroundTasks,
     url: str = Body(
         description="URL of the website to which you want to save the content"
     ),
@@ -67,37 +147,33 @@ async def upload_url(
         description="Maximum length of each chunk after the document is split (in characters)",
     ),
     chunk_overlap: int = Body(default=128, description="Chunk overlap (in characters)"),
+    priority: int = Body(default=0, description="Ingestion jobs with higher priority run first"),
+    incremental: bool = Body(
+        default=False,
+        description="Only embed the chunks changed since the last upload of the same source, and delete the ones removed",
+    ),
+    crawl: bool = Body(
+        default=False,
+        description="Follow the links to the pages of the same host, only pages changed since the last crawl are ingested",
+    ),
+    max_depth: int = Body(default=2, description="Crawl mode: number of links followed from the page"),
+    max_pages: int = Body(default=50, description="Crawl mode: maximum number of pages downloaded"),
     stray = Depends(session),
 ):
     """Upload a url. Website content will be extracted and segmented into chunks.
-    Chunks will be then vectorized and stored into documents memory."""
-    # check that URL is valid
+    Chunks will be then vectorized and stored into documents memory.
+    In crawl mode, the pages of the same website linked by the url are ingested too.
+    The page is ingested by a job, whose status is available at `/rabbithole/jobs/{job_id}`."""
 
+    # check that URL is valid, without blocking the event loop
     try:
-        # Send a HEAD request to the specified URL
-        response = requests.head(
+        response = await get_async_http_client().head(
             url,
-            headers={"User-Agent": "Magic Browser"},
-            allow_redirects=True
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            timeout=get_web_timeout(),
         )
-        status_code = response.status_code
-
-        if status_code == 200:
-
-            # upload file to long term memory, in the background
-            background_tasks.add_task(
-                stray.rabbit_hole.ingest_file, stray, url, chunk_size, chunk_overlap
-            )
-            return {"url": url, "info": "URL is being ingested asynchronously"}
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "Invalid URL",
-                    "url": url
-                },
-            )
-    except requests.exceptions.RequestException as _e:
+    except (httpx.HTTPError, httpx.InvalidURL):
         raise HTTPException(
             status_code=400,
             detail={
@@ -106,34 +182,61 @@ async def upload_url(
             },
         )
 
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Invalid URL",
+                "url": url
+            },
+        )
+
+    # upload file to long term memory, with an ingestion job
+    jobs = request.app.state.ingestion_jobs
+    if crawl:
+        job = await run_in_threadpool(
+            jobs.submit_crawl, stray, url, chunk_size, chunk_overlap, max_depth, max_pages, priority
+        )
+        return {"url": url, "info": "Website is being crawled asynchronously", "job_id": job["job_id"]}
+
+    job = await run_in_threadpool(jobs.submit_url, stray, url, chunk_size, chunk_overlap, priority, incremental)
+    return {"url": url, "info": "URL is being ingested asynchronously", "job_id": job["job_id"]}
+
 
 @router.post("/memory")
 async def upload_memory(
     request: Request,
     file: UploadFile,
-    background_tasks: BackgroundTasks,
+    priority: int = Body(default=0, description="Ingestion jobs with higher priority run first"),
     stray = Depends(session),
 ) -> Dict:
-    """Upload a memory json file to the cat memory"""
+    """Upload a memory json file to the cat memory, or a collection exported as NDJSON by `/memory/collections/{id}/export`.
+    The memories are imported by a job, whose status is available at `/rabbithole/jobs/{job_id}`."""
 
     # Get file mime type
     content_type = mimetypes.guess_type(file.filename)[0]
+    if file.filename.lower().endswith(NDJSON_EXTENSIONS):
+        # collection exported by `/memory/collections/{id}/export`
+        content_type = "application/x-ndjson"
     log.info(f"Uploaded {content_type} down the rabbit hole")
-    if content_type != "application/json":
+    if content_type not in ("application/json", "application/x-ndjson"):
         raise HTTPException(
             status_code=400,
             detail={
-                "error": f"MIME type {content_type} not supported. Admitted types: 'application/json'"
+                "error": f"MIME type {content_type} not supported. Admitted types: 'application/json', 'application/x-ndjson'"
             })
 
-    # Ingest memories in background and notify client
-    background_tasks.add_task(stray.rabbit_hole.ingest_memory, stray, file)
+    # Ingest memories with an ingestion job and notify client
+    job = await run_in_threadpool(
+        request.app.state.ingestion_jobs.submit_memory, stray, file.file, file.filename, priority
+    )
 
     # reply to client
     return {
         "filename": file.filename,
         "content_type": file.content_type,
-        "info": "Memory is being ingested asynchronously"
+        "info": "Memory is being ingested asynchronously",
+        "job_id": job["job_id"],
     }
 
 
@@ -148,3 +251,42 @@ async def get_allowed_mimetypes(request: Request) -> Dict:
     return {
         "allowed": admitted_types
     }
+
+
+@router.get("/jobs")
+async def get_ingestion_jobs(request: Request) -> Dict:
+    """List the ingestion jobs, most recent first"""
+
+    jobs = request.app.state.ingestion_jobs.list()
+
+    return {
+        "jobs": jobs
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(request: Request, job_id: str) -> Dict:
+    """Get the status of an ingestion job, and the number of chunks stored so far"""
+
+    job = request.app.state.ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": f"Ingestion job {job_id} not found"}
+        )
+
+    return job
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_ingestion_job(request: Request, job_id: str) -> Dict:
+    """Cancel a queued or running ingestion job. Chunks already stored are not deleted"""
+
+    job = request.app.state.ingestion_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": f"Ingestion job {job_id} not found"}
+        )
+
+    return job
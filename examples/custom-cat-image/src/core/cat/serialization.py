@@ -0,0 +1,50 @@
+"""Fast JSON serialization for API responses and websocket messages.
+
+Serialization uses `orjson`, which also handles NumPy arrays natively.
+Objects `orjson` does not know (e.g. pydantic models) are converted with FastAPI's `jsonable_encoder`.
+"""
+
+import base64
+from typing import Any, List
+
+import numpy as np
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON."""
+    return orjson.dumps(content, default=jsonable_encoder, option=OPTIONS)
+
+
+def dumps_str(content: Any) -> str:
+    """Serialize to compact JSON text, e.g. for websocket text frames."""
+    return dumps(content).decode("utf-8")
+
+
+def vector_to_base64(vector: List[float]) -> str:
+    """Encode a vector as base64 of its little-endian float32 bytes.
+
+    Decode it with `vector_from_base64`.
+    """
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def vector_from_base64(encoded: str) -> List[float]:
+    """Decode a vector encoded by `vector_to_base64`."""
+    return np.frombuffer(base64.b64decode(encoded), dtype="<f4").tolist()
+
+
+class CatJSONResponse(JSONResponse):
+    """JSON response serialized with `orjson`.
+
+    Returning it directly from an endpoint also skips FastAPI's `jsonable_encoder` pass,
+    which is slow on large payloads such as lists of vectors.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
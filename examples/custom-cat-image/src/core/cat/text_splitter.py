@@ -0,0 +1,127 @@
+"""Text splitters used by the Rabbit Hole, in addition to the Langchain ones."""
+
+import re
+from functools import lru_cache
+from typing import Any, List
+
+import numpy as np
+import tiktoken
+from langchain.text_splitter import TextSplitter
+
+from cat.utils import get_tiktoken_encoding
+
+
+# separators preferred to end a chunk, in order of preference
+DEFAULT_SEPARATORS = ["\\n\\n", "\n\n", ".\\n", ".\n", "\\n", "\n", " ", ""]
+
+_WHITESPACE = re.compile(rb"\s")
+
+
+@lru_cache(maxsize=None)
+def get_token_lengths(encoding: tiktoken.Encoding) -> np.ndarray:
+    """Length in bytes of each token of the encoding, computed once per encoding."""
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            # unused token id
+            pass
+    return lengths
+
+
+class TokenOffsetsTextSplitter(TextSplitter):
+    """Split text in chunks of `chunk_size` tokens, cutting by token offsets.
+
+    The whole text is tokenized once (`RecursiveCharacterTextSplitter.from_tiktoken_encoder` tokenizes every piece
+    again at each level of recursion). Each chunk takes up to `chunk_size` tokens and is cut back to the last
+    occurrence of the first separator found in its second half, so chunks end on paragraphs, lines or words
+    whenever possible.
+    The next chunk starts `chunk_overlap` tokens before the cut, on a word boundary.
+
+    Parameters
+    ----------
+    separators : List[str]
+        Separators to cut chunks at, in order of preference.
+    encoding_name : str
+        Name of the tiktoken encoding counting the tokens.
+    **kwargs
+        `TextSplitter` arguments, e.g. `chunk_size`, `chunk_overlap`, `keep_separator` and `strip_whitespace`.
+
+    Notes
+    -----
+    As in `RecursiveCharacterTextSplitter`, with `keep_separator` the separator of a cut starts the next chunk,
+    otherwise it is dropped.
+    """
+
+    def __init__(self, separators: List[str] = None, encoding_name: str = "cl100k_base", **kwargs: Any):
+        # the encoding is loaded when splitting, so the splitter is cheap to copy (hooks get copies)
+        super().__init__(length_function=self._count_tokens, **kwargs)
+        self._separators = [s for s in (separators or DEFAULT_SEPARATORS) if s]
+        self._encoding_name = encoding_name
+
+    def _count_tokens(self, text: str) -> int:
+        encoding = get_tiktoken_encoding(self._encoding_name)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def split_text(self, text: str) -> List[str]:
+        encoding = get_tiktoken_encoding(self._encoding_name)
+        tokens = encoding.encode(text, disallowed_special=())
+        n_tokens = len(tokens)
+        # work on bytes: byte offset of each token (and of the end of the text)
+        data = text.encode("utf-8")
+        offsets = np.zeros(n_tokens + 1, dtype=np.int64)
+        np.cumsum(get_token_lengths(encoding)[tokens], out=offsets[1:])
+        separators = [s.encode("utf-8") for s in self._separators]
+
+        def token_at(position: int) -> int:
+            """Token containing the byte `position`."""
+            return min(int(np.searchsorted(offsets, position, side="right")) - 1, n_tokens - 1)
+
+        def char_boundary(position: int) -> int:
+            """Move back a byte position inside a multi-byte character to its start."""
+            while 0 < position < len(data) and data[position] & 0xC0 == 0x80:
+                position -= 1
+            return position
+
+        chunks = []
+        start, start_token = 0, 0
+        while start < len(data):
+            end_token = min(start_token + self._chunk_size, n_tokens)
+            cut = end = char_boundary(int(offsets[end_token]))
+            separator = b""
+            if end_token < n_tokens:
+                # snap the end back to a separator, looking in the second half of the chunk only
+                lowest = max(start + 1, int(offsets[start_token + max(1, self._chunk_size // 2)]))
+                for s in separators:
+                    position = data.rfind(s, lowest, end)
+                    if position != -1:
+                        cut, separator = position, s
+                        break
+            while cut <= start:
+                # a single character made of more tokens than the chunk size
+                end_token += 1
+                cut = end = char_boundary(int(offsets[end_token]))
+
+            self._add_chunk(chunks, data[start:cut].decode("utf-8"))
+            if end_token >= n_tokens and cut == end:
+                break
+
+            next_start = cut if self._keep_separator else cut + len(separator)
+            if self._chunk_overlap > 0:
+                # start the overlap on a word boundary
+                overlap_token = max(token_at(cut) - self._chunk_overlap, start_token + 1)
+                boundary = _WHITESPACE.search(data, int(offsets[overlap_token]), cut)
+                if boundary and boundary.start() > start:
+                    next_start = min(next_start, boundary.start())
+
+            start = next_start
+            start_token = token_at(start)
+
+        return chunks
+
+    def _add_chunk(self, chunks: List[str], chunk: str) -> None:
+        if self._strip_whitespace:
+            chunk = chunk.strip()
+        if chunk:
+            chunks.append(chunk)
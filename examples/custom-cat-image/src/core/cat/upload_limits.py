@@ -0,0 +1,79 @@
+"""Size limits of the uploads, by endpoint.
+
+Requests to the upload endpoints larger than their limit are rejected with a 413 status: as soon as the headers are
+received if they declare a larger `Content-Length`, otherwise while the body is streamed (e.g. chunked requests),
+before it is all spooled to disk.
+
+Limits are in bytes, configured with environment variables (0 disables a limit):
+
+    - `RABBITHOLE_MAX_UPLOAD_SIZE`: documents uploaded to the Rabbit Hole (default 100 MB);
+    - `RABBITHOLE_MAX_ARCHIVE_SIZE`: archives uploaded to `/rabbithole/bulk` (default 1 GB);
+    - `RABBITHOLE_MAX_MEMORY_SIZE`: memory exports uploaded to `/rabbithole/memory` (default 500 MB);
+    - `PLUGINS_MAX_UPLOAD_SIZE`: plugins uploaded to `/plugins/upload` (default 50 MB).
+"""
+
+import os
+from typing import Dict, Optional
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+MB = 1024 * 1024
+
+
+def get_upload_limits() -> Dict[str, int]:
+    """Maximum body size of the upload endpoints, by path prefix."""
+    return {
+        "/rabbithole/": int(os.getenv("RABBITHOLE_MAX_UPLOAD_SIZE", 100 * MB)),
+        "/rabbithole/bulk": int(os.getenv("RABBITHOLE_MAX_ARCHIVE_SIZE", 1024 * MB)),
+        "/rabbithole/memory": int(os.getenv("RABBITHOLE_MAX_MEMORY_SIZE", 500 * MB)),
+        "/plugins/upload": int(os.getenv("PLUGINS_MAX_UPLOAD_SIZE", 50 * MB)),
+    }
+
+
+def get_upload_limit(path: str) -> Optional[int]:
+    """Maximum body size of a request to `path`, from its longest matching prefix. `None` if unlimited."""
+    limits = get_upload_limits()
+    prefixes = [prefix for prefix in limits if path.startswith(prefix) or path == prefix.rstrip("/")]
+    if not prefixes:
+        return None
+    return limits[max(prefixes, key=len)] or None
+
+
+def _too_large(limit: int) -> str:
+    return f"Request body is larger than the maximum upload size of {limit} bytes"
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware enforcing the upload size limits."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            return await self.app(scope, receive, send)
+
+        limit = get_upload_limit(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": {"error": _too_large(limit)}})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # raised inside the endpoint, while the body is parsed
+                    raise HTTPException(status_code=413, detail={"error": _too_large(limit)})
+            return message
+
+        await self.app(scope, limited_receive, send)
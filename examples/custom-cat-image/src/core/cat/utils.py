@@ -2,6 +2,8 @@
 import os
 import inspect
 from datetime import timedelta
+from functools import lru_cache
+import tiktoken
 from cat.log import log
 from langchain.evaluation import StringDistance, load_evaluator, EvaluatorType
 from urllib.parse import urlparse
@@ -139,6 +141,54 @@ def levenshtein_distance(prediction: str, reference: str) -> int:
     return result['score']
 
 
+@lru_cache(maxsize=None)
+def get_tiktoken_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Load a tiktoken encoding only once per process.
+
+    Parameters
+    ----------
+    encoding_name : str
+        Name of the tiktoken encoding, defaults to `cl100k_base`.
+
+    Returns
+    -------
+    tiktoken.Encoding
+        Cached encoding instance.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=None)
+def _get_tiktoken_encoding_for_model(model_name: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # not an OpenAI model, cl100k_base is a reasonable approximation
+        return get_tiktoken_encoding("cl100k_base")
+
+
+def get_llm_tokenizer(llm) -> tiktoken.Encoding:
+    """Get the (cached) tokenizer to count tokens for a language model.
+
+    The model name is read from the usual langchain attributes (`model_name`, `model`).
+    Models unknown to tiktoken fall back to the `cl100k_base` encoding.
+
+    Parameters
+    ----------
+    llm : BaseLanguageModel
+        Langchain language model.
+
+    Returns
+    -------
+    tiktoken.Encoding
+        Encoding used to count tokens for the model.
+    """
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    if not isinstance(model_name, str):
+        return get_tiktoken_encoding("cl100k_base")
+    return _get_tiktoken_encoding_for_model(model_name)
+
+
 # This is our masterwork during tea time
 class singleton:
   
@@ -0,0 +1,285 @@
+"""Download and crawling of web pages for the Rabbit Hole.
+
+Pages are downloaded with the shared pooled HTTP client (see `cat.factory.http_client`), streaming the body and
+stopping at `RABBITHOLE_MAX_DOWNLOAD_SIZE` bytes (default 50 MB), with a timeout of `RABBITHOLE_WEB_TIMEOUT` seconds
+(default 30).
+
+A crawl follows the links of a page to the pages of the same host, breadth first, up to a depth and a number of pages.
+Pages are downloaded by `RABBITHOLE_CRAWL_WORKERS` threads (default 8), at most `RABBITHOLE_CRAWL_HOST_CONCURRENCY`
+(default 2) at a time from the same host. The ETag and Last-Modified headers of each page are kept in the crawl
+cache: the next crawl sends conditional requests, and pages not modified (or with the same content) are not ingested
+again, as long as their chunks are still in memory.
+"""
+
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from bs4 import BeautifulSoup
+from tinydb import TinyDB, Query
+
+from cat.db.database import Database
+from cat.factory.http_client import get_http_client
+from cat.log import log
+
+
+USER_AGENT = "Magic Browser"
+
+
+class DownloadTooLarge(ValueError):
+    """The body of a response is larger than the maximum download size."""
+
+
+def get_max_download_size() -> int:
+    """Maximum size of a downloaded page in bytes, from the `RABBITHOLE_MAX_DOWNLOAD_SIZE` environment variable."""
+    return int(os.getenv("RABBITHOLE_MAX_DOWNLOAD_SIZE", 50 * 1024 * 1024))
+
+
+def get_web_timeout() -> float:
+    """Seconds to wait for a web page, from the `RABBITHOLE_WEB_TIMEOUT` environment variable."""
+    return float(os.getenv("RABBITHOLE_WEB_TIMEOUT", 30))
+
+
+def get_crawl_cache_file() -> str:
+    """File of the crawl cache, from the `RABBITHOLE_CRAWL_CACHE` environment variable.
+
+    Defaults to `crawl_cache.json` in the folder of the metadata file.
+    """
+    default = os.path.join(os.path.dirname(Database().get_file_name()), "crawl_cache.json")
+    return os.getenv("RABBITHOLE_CRAWL_CACHE", default)
+
+
+class Download:
+    """Downloaded page. Pages not modified since the conditional request have `status` 304 and no content."""
+
+    def __init__(self, url: str, status: int, content: bytes = b"", content_type: str = None,
+                 etag: str = None, last_modified: str = None):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+def download(url: str, headers: Dict[str, str] = None, max_size: int = None) -> Download:
+    """Download a page, streaming its body.
+
+    Raises
+    ------
+    DownloadTooLarge
+        If the body is larger than `max_size` bytes (`get_max_download_size()` by default).
+    httpx.HTTPError
+        If the page can not be downloaded, or the response status is an error.
+    """
+    max_size = max_size or get_max_download_size()
+
+    with get_http_client().stream(
+        "GET",
+        url,
+        headers={"User-Agent": USER_AGENT, **(headers or {})},
+        follow_redirects=True,
+        timeout=get_web_timeout(),
+    ) as response:
+        if response.status_code == 304:
+            return Download(url, 304)
+        response.raise_for_status()
+
+        # the declared length is checked before reading anything, the actual one while reading
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) > max_size:
+            raise DownloadTooLarge(f"{url} is larger than {max_size} bytes")
+        content = bytearray()
+        for data in response.iter_bytes():
+            content.extend(data)
+            if len(content) > max_size:
+                raise DownloadTooLarge(f"{url} is larger than {max_size} bytes")
+
+        return Download(
+            str(response.url),
+            response.status_code,
+            bytes(content),
+            response.headers.get("Content-Type", "").split(";")[0].strip() or None,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+
+def extract_links(html: bytes, base_url: str) -> List[str]:
+    """Absolute http(s) URLs of the links of an HTML page, without fragments."""
+    links = []
+    for anchor in BeautifulSoup(html, "html.parser").find_all("a", href=True):
+        url, _ = urldefrag(urljoin(base_url, anchor["href"]))
+        if urlparse(url).scheme in ("http", "https"):
+            links.append(url)
+    return links
+
+
+class CrawlCache:
+    """Validators (ETag, Last-Modified), content hash and links of the pages crawled. Thread safe."""
+
+    def __init__(self, file_name: str = None):
+        self.db = TinyDB(file_name or get_crawl_cache_file())
+        self.__lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self.__lock:
+            return self.db.get(Query().url == url)
+
+    def set(self, url: str, **fields):
+        with self.__lock:
+            self.db.upsert({"url": url, **fields}, Query().url == url)
+
+    def clear(self):
+        """Forget all the pages, e.g. when the memory is wiped."""
+        with self.__lock:
+            self.db.truncate()
+
+
+class CrawledPage:
+    """Page found by a crawl. `download` is `None` if the page was not modified since the last crawl."""
+
+    def __init__(self, url: str, download: Optional[Download], links: List[str], changed: bool,
+                 content_hash: str = None):
+        self.url = url
+        self.download = download
+        self.links = links
+        self.changed = changed
+        self.content_hash = content_hash
+
+
+class Crawler:
+    """Breadth first crawler of the pages of a host.
+
+    Parameters
+    ----------
+    url : str
+        First page of the crawl, only the pages of its host are followed.
+    max_depth : int
+        Number of links followed from the first page.
+    max_pages : int
+        Maximum number of pages downloaded.
+    cache : CrawlCache
+        Cache of the pages crawled, `CrawlCache()` by default.
+    workers : int
+        Pages downloaded at the same time, the `RABBITHOLE_CRAWL_WORKERS` environment variable by default.
+    host_concurrency : int
+        Pages downloaded at the same time from the same host, the `RABBITHOLE_CRAWL_HOST_CONCURRENCY` environment
+        variable by default.
+    is_stored : Callable, optional
+        Whether the content of a page (by URL) is still stored, e.g. in memory: pages not stored anymore are
+        downloaded and yielded again even if not modified. By default, only the cache is checked.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            max_depth: int = 2,
+            max_pages: int = 50,
+            cache: CrawlCache = None,
+            workers: int = None,
+            host_concurrency: int = None,
+            is_stored: Callable[[str], bool] = None,
+    ):
+        self.url = urldefrag(url)[0]
+        self.host = urlparse(self.url).netloc
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.cache = cache or CrawlCache()
+        self.workers = workers or int(os.getenv("RABBITHOLE_CRAWL_WORKERS", 8))
+        self.host_concurrency = host_concurrency or int(os.getenv("RABBITHOLE_CRAWL_HOST_CONCURRENCY", 2))
+        self.is_stored = is_stored
+
+        self.pages = 0
+        self.unchanged = 0
+        self.errors: Dict[str, str] = {}
+        self.__hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self.__lock = threading.Lock()
+
+    def crawl(self) -> Iterator[CrawledPage]:
+        """Crawl the pages, yielding the ones changed since the last crawl as soon as they are downloaded.
+
+        Once a changed page is ingested, call `page_ingested` to store it in the cache.
+        """
+        seen = {self.url}
+        frontier = [self.url]
+        pool = ThreadPoolExecutor(self.workers, thread_name_prefix="crawler")
+        try:
+            for depth in range(self.max_depth + 1):
+                futures = {pool.submit(self.__fetch, url): url for url in frontier}
+                frontier = []
+                for future in as_completed(futures):
+                    url = futures[future]
+                    try:
+                        page = future.result()
+                    except Exception as e:
+                        log.warning(f"Crawling {url} failed: {e}")
+                        self.errors[url] = str(e)
+                        continue
+
+                    self.pages += 1
+                    if depth < self.max_depth:
+                        for link in page.links:
+                            if len(seen) >= self.max_pages:
+                                break
+                            if link not in seen and urlparse(link).netloc == self.host:
+                                seen.add(link)
+                                frontier.append(link)
+
+                    if page.changed:
+                        yield page
+                    else:
+                        self.unchanged += 1
+                if not frontier:
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def page_ingested(self, page: CrawledPage):
+        """Store the validators of a changed page once ingested, so the next crawl does not ingest it again."""
+        self.cache.set(
+            page.url,
+            etag=page.download.etag,
+            last_modified=page.download.last_modified,
+            content_hash=page.content_hash,
+            links=page.links,
+        )
+
+    def __fetch(self, url: str) -> CrawledPage:
+        cached = self.cache.get(url) or {}
+        if cached and self.is_stored is not None and not self.is_stored(url):
+            # e.g. deleted from memory since the last crawl
+            log.debug(f"{url} is not stored anymore, downloading it again")
+            cached = {}
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self.__host_slot(urlparse(url).netloc):
+            page = download(url, headers)
+
+        if page.not_modified:
+            return CrawledPage(url, None, cached.get("links", []), changed=False)
+
+        links = extract_links(page.content, page.url) if page.content_type == "text/html" else []
+        content_hash = hashlib.sha256(page.content).hexdigest()
+        if content_hash == cached.get("content_hash"):
+            # the server does not support conditional requests, or the validators changed but not the content
+            self.cache.set(url, etag=page.etag, last_modified=page.last_modified, links=links)
+            return CrawledPage(url, None, links, changed=False)
+        return CrawledPage(url, page, links, changed=True, content_hash=content_hash)
+
+    def __host_slot(self, host: str) -> threading.BoundedSemaphore:
+        with self.__lock:
+            if host not in self.__hosts:
+                self.__hosts[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return self.__hosts[host]
@@ -5,6 +5,7 @@ from typing import Any
 from typing import Generator
 
 import pytest
+import tiktoken
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
@@ -55,7 +56,9 @@ def clean_up_mocks():
         "tests/mocks/mock_plugin.zip",
         "tests/mocks/mock_plugin/settings.json",
         "tests/mocks/mock_plugin_folder/mock_plugin",
-        "tests/mocks/empty_folder"
+        "tests/mocks/empty_folder",
+        "tests/mocks/rabbithole_jobs",
+        "tests/mocks/crawl_cache.json",
     ]
     for tbr in to_be_removed:
         if os.path.exists(tbr):
@@ -92,3 +95,19 @@ def client(app: FastAPI, monkeypatch) -> Generator[TestClient, Any, None]:
     
     with TestClient(app) as client:
         yield client
+
+
+@pytest.fixture(scope="function")
+def byte_encoding(monkeypatch):
+    """
+    Split text with one token per byte, so tests do not download the tiktoken vocabulary.
+    """
+    encoding = tiktoken.Encoding(
+        name="bytes",
+        pat_str=r""" ?\w+| ?[^\s\w]+|\s+""",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+    monkeypatch.setattr("cat.text_splitter.get_tiktoken_encoding", lambda name: encoding)
+    monkeypatch.setattr("cat.rabbit_hole.get_tiktoken_encoding", lambda name: encoding)
+    return encoding
@@ -0,0 +1,145 @@
+import time
+
+from pydantic import BaseModel, Field
+
+from cat.experimental.form import CatForm, CatFormState
+from cat.experimental.form.cat_form import get_json_structure
+
+
+class PizzaOrder(BaseModel):
+    pizza_type: str = Field(description="Type of pizza")
+    address: str
+
+
+class FakeCat:
+    """Stray cat answering prompts with canned LLM outputs."""
+
+    def __init__(self, answers, delay=0.0):
+        self.answers = answers
+        self.delay = delay
+        self.prompts = []
+        self.streamed = []
+        self.working_memory = {
+            "user_message_json": {"text": "margherita to Via Roma, thanks"},
+            "history": [],
+        }
+
+    def llm(self, prompt, stream=False, utility=False):
+        self.prompts.append(prompt)
+        if stream:
+            self.streamed.append(prompt)
+        time.sleep(self.delay)
+        for key, answer in self.answers.items():
+            if key in prompt:
+                return answer
+        return ""
+
+
+class PizzaForm(CatForm):
+    model_class = PizzaOrder
+    description = "Pizza order"
+    start_examples = ["order a pizza"]
+
+    def submit(self, form_data):
+        return {"output": f"Pizza {form_data['pizza_type']} ordered"}
+
+
+class CombinedPizzaForm(PizzaForm):
+    combined_step = True
+
+
+def test_json_structure_cached():
+
+    structure = get_json_structure(PizzaOrder)
+    assert '"pizza_type": // Type of pizza' in structure
+    assert get_json_structure(PizzaOrder) is structure
+
+
+def test_exit_intent_runs_concurrently():
+
+    cat = FakeCat({'"exit"': "false", "Updated JSON": '{"pizza_type": "margherita"}'}, delay=0.2)
+    form = PizzaForm(cat)
+    form.extract = lambda: {"pizza_type": cat.llm("Updated JSON")}
+
+    start = time.monotonic()
+    form.next()
+    assert time.monotonic() - start < 0.35
+    assert form._state == CatFormState.INCOMPLETE
+    assert form._missing_fields == ["address"]
+
+
+def test_combined_step():
+
+    cat = FakeCat({"filling up a form": '"exit": false, "fields": {"pizza_type": "margherita", "address": "Via Roma"}}\n```'})
+    form = CombinedPizzaForm(cat)
+
+    out = form.next()
+    assert len(cat.prompts) == 1
+    assert "confirm" not in cat.prompts[0]
+    assert out["output"] == "Pizza margherita ordered"
+    assert form._state == CatFormState.CLOSED
+
+
+def test_combined_step_confirm_and_exit():
+
+    cat = FakeCat({"filling up a form": '"exit": false, "confirm": true, "fields": {}}'})
+    form = CombinedPizzaForm(cat)
+    form._model = {"pizza_type": "margherita", "address": "Via Roma"}
+    form._state = CatFormState.WAIT_CONFIRM
+
+    out = form.next()
+    assert '"confirm"' in cat.prompts[0]
+    assert out["output"] == "Pizza margherita ordered"
+
+    cat = FakeCat({"filling up a form": '"exit": true, "fields": {}}'})
+    form = CombinedPizzaForm(cat)
+    out = form.next()
+    assert form._state == CatFormState.CLOSED
+    assert "closed" in out["output"]
+
+
+def test_combined_step_unparsable_output():
+
+    cat = FakeCat({"filling up a form": "I don't know"})
+    form = CombinedPizzaForm(cat)
+    form.next()
+    assert form._state == CatFormState.INCOMPLETE
+
+
+def test_concurrent_calls_not_streamed():
+
+    cat = FakeCat({'"exit"': "false", '"confirm"': "true"})
+    form = PizzaForm(cat)
+    form._model = {"pizza_type": "margherita", "address": "Via Roma"}
+    form._state = CatFormState.WAIT_CONFIRM
+
+    # exit intent and confirmation run together, their tokens would interleave on the websocket
+    form.next()
+    assert len(cat.prompts) == 2
+    assert cat.streamed == []
+
+
+def test_exit_discards_concurrent_calls():
+
+    # the user confirms while asking to leave
+    cat = FakeCat({'"exit"': "true", '"confirm"': "true"})
+    form = PizzaForm(cat)
+    form._model = {"pizza_type": "margherita", "address": "Via Roma"}
+    form._state = CatFormState.WAIT_CONFIRM
+
+    assert form.step() == {"exit": True, "confirm": False, "fields": None}
+    out = form.next()
+    assert form._state == CatFormState.CLOSED
+    assert "closed" in out["output"]
+
+    # fields extracted while leaving are not merged in the form
+    cat = FakeCat({'"exit"': "true"})
+    form = PizzaForm(cat)
+    form._model = {"pizza_type": "margherita"}
+    form.extract = lambda: {"address": "Via Roma"}
+
+    assert form.step()["fields"] is None
+    out = form.next()
+    assert form._state == CatFormState.CLOSED
+    assert form._model == {"pizza_type": "margherita"}
+    assert "closed" in out["output"]
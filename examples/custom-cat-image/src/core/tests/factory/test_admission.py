@@ -0,0 +1,124 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from cat.factory.admission import (
+    ProviderLimiter,
+    admitted_class,
+    original_class,
+    background_priority,
+    is_rate_limit_error,
+)
+from cat.factory.custom_llm import LLMDefault
+from cat.factory.custom_embedder import DumbEmbedder
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_rate_limit_error_detection():
+
+    assert is_rate_limit_error(RateLimitError())
+    assert is_rate_limit_error(Exception("Error code: 429"))
+    assert not is_rate_limit_error(ValueError("bad request"))
+
+
+def test_aimd_limit():
+
+    limiter = ProviderLimiter("test", max_in_flight=8)
+
+    with pytest.raises(RateLimitError):
+        with limiter.admit():
+            raise RateLimitError()
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+    for _ in range(10):
+        with limiter.admit():
+            pass
+    assert 4 < limiter.limit <= 8
+
+
+def test_slow_requests_lower_limit():
+
+    limiter = ProviderLimiter("test", max_in_flight=8, target_latency=0.01)
+    with limiter.admit():
+        time.sleep(0.02)
+    assert limiter.limit == 4
+
+
+def test_token_bucket_rate():
+
+    limiter = ProviderLimiter("test", rate=20)
+    limiter.bucket._tokens = 0
+
+    start = time.monotonic()
+    for _ in range(3):
+        with limiter.admit():
+            pass
+    assert time.monotonic() - start >= 0.1
+
+
+def test_interactive_before_background():
+
+    limiter = ProviderLimiter("test", max_in_flight=1)
+    order = []
+
+    def call(name, background):
+        def run():
+            with limiter.admit():
+                order.append(name)
+        if background:
+            with background_priority():
+                run()
+        else:
+            run()
+
+    limiter.acquire()  # keep the only slot busy
+    threads = [threading.Thread(target=call, args=("background", True))]
+    threads[0].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=call, args=("interactive", False)))
+    threads[1].start()
+    time.sleep(0.05)
+    limiter.release(0)
+
+    for t in threads:
+        t.join(timeout=5)
+    assert order == ["interactive", "background"]
+
+
+def test_async_admission():
+
+    limiter = ProviderLimiter("test", max_in_flight=2)
+    running = []
+
+    async def call():
+        async with limiter.aadmit():
+            running.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(main())
+    assert max(running) <= 2
+    assert limiter.in_flight == 0
+
+
+def test_admitted_class():
+
+    AdmittedLLM = admitted_class(LLMDefault, provider="LLMDefaultConfig")
+    llm = AdmittedLLM()
+    assert isinstance(llm, LLMDefault)
+    assert type(llm).__name__ == "LLMDefault"
+    assert original_class(llm) == LLMDefault
+    assert "You did not configure" in llm.invoke("Hey")
+
+    AdmittedEmbedder = admitted_class(DumbEmbedder, provider="EmbedderDumbConfig", kind="EMBEDDER")
+    embedder = AdmittedEmbedder()
+    # embed_query calls embed_documents, a single slot must be taken
+    assert embedder.embed_query("Hey") == DumbEmbedder().embed_query("Hey")
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+
+from cat.factory import http_client
+from cat.factory.custom_llm import LLMCustom
+from cat.factory.custom_embedder import CustomOpenAIEmbeddings
+
+
+def mock_transport(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/v1/embeddings"):
+        return httpx.Response(200, json={"data": [{"embedding": [0.1, 0.2]}]})
+    return httpx.Response(200, json={"text": "Meow"})
+
+
+def mock_clients(monkeypatch):
+    transport = httpx.MockTransport(mock_transport)
+    async_transport = httpx.MockTransport(mock_transport)
+    for module in ["cat.factory.custom_llm", "cat.factory.custom_embedder"]:
+        monkeypatch.setattr(f"{module}.get_http_client", lambda: httpx.Client(transport=transport))
+        monkeypatch.setattr(f"{module}.get_async_http_client", lambda: httpx.AsyncClient(transport=async_transport))
+
+
+def test_sync_client_is_shared():
+
+    client = http_client.get_http_client()
+    assert client is http_client.get_http_client()
+    assert isinstance(client, httpx.Client)
+
+
+def test_async_client_per_event_loop():
+
+    async def get_client():
+        return http_client.get_async_http_client()
+
+    loop = asyncio.new_event_loop()
+    other_loop = asyncio.new_event_loop()
+
+    client = loop.run_until_complete(get_client())
+    assert client is loop.run_until_complete(get_client())
+    assert client is not other_loop.run_until_complete(get_client())
+
+
+def test_async_client_closed_with_loop():
+
+    async def use_client():
+        return http_client.get_async_http_client()
+
+    clients = []
+    for _ in range(20):
+        loop = asyncio.new_event_loop()
+        clients.append(loop.run_until_complete(use_client()))
+        loop.run_until_complete(http_client.aclose_http_client_for_loop())
+        loop.close()
+
+    # closed and forgotten
+    assert all(client.is_closed for client in clients)
+    assert not any(client in clients for client in http_client._async_clients.values())
+
+
+def test_client_config_from_env(monkeypatch):
+
+    monkeypatch.setenv("HTTP_TIMEOUT", "42")
+    monkeypatch.setenv("HTTP_MAX_CONNECTIONS", "7")
+
+    assert http_client.get_http_timeout().read == 42
+    assert http_client.get_http_limits().max_connections == 7
+
+
+def test_custom_llm_sync_and_async(monkeypatch):
+
+    mock_clients(monkeypatch)
+    llm = LLMCustom(url="http://custom-llm:8000/")
+
+    assert llm.invoke("Hey") == "Meow"
+    assert asyncio.run(llm.ainvoke("Hey")) == "Meow"
+
+
+def test_custom_embedder_sync_and_async(monkeypatch):
+
+    mock_clients(monkeypatch)
+    embedder = CustomOpenAIEmbeddings(url="http://custom-embedder:8000/")
+
+    assert embedder.embed_documents(["Hey"]) == [[0.1, 0.2]]
+    assert asyncio.run(embedder.aembed_query("Hey")) == [0.1, 0.2]
@@ -0,0 +1,182 @@
+import time
+import asyncio
+
+import pytest
+
+from cat.factory import admission
+from cat.factory.custom_llm import LLMDefault
+from cat.factory.llm_router import LLMRouter, LatencyStats, get_latency_stats, MIN_SAMPLES
+
+
+class SleepyLLM(LLMDefault):
+    answer: str = "hello"
+    delay: float = 0.0
+    fail: bool = False
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ValueError(f"{self.answer} failed")
+        return self.answer
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError(f"{self.answer} failed")
+        return self.answer
+
+
+def get_router(name, primary, secondary, **kwargs):
+    # unique names, latency stats are process wide
+    return LLMRouter(
+        primary=primary,
+        secondary=secondary,
+        primary_name=f"{name}_primary",
+        secondary_name=f"{name}_secondary",
+        **kwargs
+    )
+
+
+def test_latency_percentile():
+
+    stats = LatencyStats()
+    for i in range(MIN_SAMPLES - 1):
+        stats.add(i)
+    assert stats.percentile(50) is None
+
+    stats.add(MIN_SAMPLES - 1)
+    assert stats.percentile(0) == 0
+    assert stats.percentile(100) == MIN_SAMPLES - 1
+    assert stats.summary()["requests"] == MIN_SAMPLES
+
+
+def test_primary_answers():
+
+    router = get_router(
+        "primary_answers",
+        SleepyLLM(answer="primary"),
+        SleepyLLM(answer="secondary"),
+    )
+    assert router.invoke("hi") == "primary"
+    assert get_latency_stats("primary_answers_primary").requests == 1
+    assert get_latency_stats("primary_answers_secondary").requests == 0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_hedge_on_slow_primary(use_async):
+
+    router = get_router(
+        f"hedge_{use_async}",
+        SleepyLLM(answer="primary", delay=1.0),
+        SleepyLLM(answer="secondary"),
+        hedge_min_delay=0.05,
+    )
+
+    start = time.monotonic()
+    if use_async:
+        answer = asyncio.run(router.ainvoke("hi"))
+    else:
+        answer = router.invoke("hi")
+    assert answer == "secondary"
+    assert time.monotonic() - start < 0.9
+
+
+def test_losing_request_cancelled():
+
+    class CancellableLLM(SleepyLLM):
+        cancelled: bool = False
+
+        async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+            try:
+                return await super()._acall(prompt, stop, run_manager, **kwargs)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+
+    primary = CancellableLLM(answer="primary", delay=1.0)
+    router = get_router("cancelled", primary, SleepyLLM(answer="secondary"), hedge_min_delay=0.05)
+
+    # also when the router is called synchronously
+    assert router.invoke("hi") == "secondary"
+    time.sleep(0.1)
+    assert primary.cancelled
+    assert get_latency_stats("cancelled_primary").errors == 0
+
+
+def test_context_of_routed_llms():
+
+    class PriorityLLM(LLMDefault):
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            return admission._priority.get().name
+
+        async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+            return admission._priority.get().name
+
+    router = get_router("context", PriorityLLM(), None)
+    assert router.invoke("hi") == "INTERACTIVE"
+    # e.g. ingestion calls the LLM with background priority
+    with admission.background_priority():
+        assert router.invoke("hi") == "BACKGROUND"
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_fallback_on_primary_error(use_async):
+
+    router = get_router(
+        f"fallback_{use_async}",
+        SleepyLLM(answer="primary", fail=True),
+        SleepyLLM(answer="secondary"),
+    )
+
+    if use_async:
+        answer = asyncio.run(router.ainvoke("hi"))
+    else:
+        answer = router.invoke("hi")
+    assert answer == "secondary"
+    assert get_latency_stats(f"fallback_{use_async}_primary").errors == 1
+
+
+def test_all_llms_fail():
+
+    router = get_router(
+        "all_fail",
+        SleepyLLM(answer="primary", fail=True),
+        SleepyLLM(answer="secondary", fail=True),
+    )
+    with pytest.raises(ValueError):
+        router.invoke("hi")
+
+
+def test_timeout():
+
+    router = get_router(
+        "timeout",
+        SleepyLLM(answer="primary", delay=1.0),
+        None,
+        timeout=0.1,
+    )
+    with pytest.raises(TimeoutError):
+        router.invoke("hi")
+
+
+def test_router_settings(client):
+
+    # routed LLMs must be configured first, otherwise the Cat falls back to the default LLM
+    response = client.put("/llm/settings/LLMRouterConfig", json={"primary": "LLMDefaultConfig"})
+    assert response.status_code == 200
+    assert not isinstance(client.app.state.ccat._llm, LLMRouter)
+
+    response = client.put("/llm/settings/LLMDefaultConfig", json={})
+    assert response.status_code == 200
+
+    response = client.put(
+        "/llm/settings/LLMRouterConfig",
+        json={"primary": "LLMDefaultConfig", "secondary": "LLMDefaultConfig"}
+    )
+    assert response.status_code == 200
+    assert isinstance(client.app.state.ccat._llm, LLMRouter)
+
+    response = client.get("/llm/settings")
+    json = response.json()
+    assert json["selected_configuration"] == "LLMRouterConfig"
+    assert "latency_stats" in json
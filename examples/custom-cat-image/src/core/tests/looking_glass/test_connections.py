@@ -0,0 +1,101 @@
+import time
+import json
+import asyncio
+
+from cat.looking_glass.connections import ConnectionRegistry
+
+from tests.utils import send_websocket_message
+
+
+class FakeWebSocket:
+
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.sent = []
+
+    async def send_text(self, text):
+        if not self.alive:
+            raise RuntimeError("Unexpected ASGI message 'websocket.send', after sending 'websocket.close'.")
+        self.sent.append(json.loads(text))
+
+
+def test_broadcast_and_detach_dead_sockets():
+
+    async def scenario():
+        messages = asyncio.Queue()
+        registry = ConnectionRegistry("Alice", messages)
+        phone, laptop, closed = FakeWebSocket(), FakeWebSocket(), FakeWebSocket(alive=False)
+        for ws in [phone, laptop, closed]:
+            registry.attach(ws)
+
+        messages.put_nowait({"type": "chat_token", "content": "Hi"})
+        await asyncio.sleep(0.05)
+
+        assert len(registry) == 2
+        assert registry.latest is laptop
+
+        registry.detach(phone)
+        registry.detach(laptop)
+        assert registry._forwarder is None
+        return phone, laptop
+
+    phone, laptop = asyncio.run(scenario())
+    assert phone.sent == laptop.sent == [{"type": "chat_token", "content": "Hi"}]
+
+
+def test_drain():
+
+    async def scenario():
+        messages = asyncio.Queue()
+        registry = ConnectionRegistry("Alice", messages)
+        ws = FakeWebSocket()
+        registry.attach(ws)
+
+        messages.put_nowait({"type": "chat_token", "content": "Hi"})
+        await asyncio.wait_for(registry.drain(), 1)
+        assert ws.sent == [{"type": "chat_token", "content": "Hi"}]
+
+        # the client goes away while messages are queued: they are discarded
+        registry.detach(ws)
+        messages.put_nowait({"type": "chat_token", "content": "Bye"})
+        await asyncio.wait_for(registry.drain(), 1)
+        assert messages.empty()
+
+        # ...also while draining
+        stuck = FakeWebSocket()
+        stuck.send_text = lambda text: asyncio.Event().wait()
+        registry.attach(stuck)
+        messages.put_nowait({"type": "chat_token", "content": "Bye"})
+        messages.put_nowait({"type": "chat_token", "content": "Bye"})
+        drain = asyncio.create_task(registry.drain())
+        await asyncio.sleep(0.01)
+        registry.detach(stuck)
+        await asyncio.wait_for(drain, 1)
+        assert messages.empty()
+
+    asyncio.run(scenario())
+
+
+def test_multiple_connections_same_user(client):
+
+    with client.websocket_connect("/ws/Alice") as phone:
+        with client.websocket_connect("/ws/Alice") as laptop:
+            phone.send_json({"text": "Where is the White Rabbit?"})
+
+            # both devices get the tokens and the answer
+            for ws in [phone, laptop]:
+                message = ws.receive_json()
+                while message["type"] == "chat_token":
+                    message = ws.receive_json()
+                assert message["type"] == "chat"
+
+        # closed connection is detached by the server shortly after
+        connections = client.app.state.strays["Alice"].connections
+        start = time.time()
+        while len(connections) != 1:
+            assert time.time() - start < 5
+            time.sleep(0.01)
+
+    # last connection closed, a new one still works
+    res = send_websocket_message({"text": "Late again"}, client, user_id="Alice")
+    assert res["type"] == "chat"
@@ -0,0 +1,109 @@
+from langchain.docstore.document import Document
+
+from cat.factory.custom_llm import LLMDefault
+from cat.looking_glass import prompt_budget
+from cat.looking_glass.prompt_budget import PromptBudget, DEFAULT_TOKEN_BUDGET
+
+from tests.utils import send_websocket_message
+
+
+def get_fake_memories(scores):
+    return [
+        (Document(page_content=f"memory number {i} " * 10, metadata={}), score, [], str(i))
+        for i, score in enumerate(scores)
+    ]
+
+
+def test_default_budget():
+
+    # no section is limited by default
+    assert all(limit is None for limit in DEFAULT_TOKEN_BUDGET.values())
+
+    budget = PromptBudget(LLMDefault(), {"chat_history": 10})
+    assert budget.budget["episodic_memory"] is None
+    assert budget.budget["chat_history"] == 10
+
+    memories = get_fake_memories([0.7, 0.9, 0.8])
+    assert len(PromptBudget(LLMDefault()).select_memories("episodic_memory", memories)) == 3
+
+
+def test_select_memories_by_score():
+
+    memories = get_fake_memories([0.7, 0.9, 0.8])
+    budget = PromptBudget(LLMDefault())
+    one_memory_cost = budget.count_tokens(memories[0][0].page_content)
+
+    budget.budget["declarative_memory"] = one_memory_cost * 2
+    selected = budget.select_memories("declarative_memory", memories)
+    assert [m[3] for m in selected] == ["1", "2"]
+
+    budget.budget["declarative_memory"] = None
+    selected = budget.select_memories("declarative_memory", memories)
+    assert len(selected) == 3
+
+
+def test_select_chat_history_keeps_recent_turns():
+
+    history = [{"who": "Human", "message": f"message {i}"} for i in range(5)]
+    budget = PromptBudget(LLMDefault())
+    turn_cost = budget.count_tokens("Human: message 0")
+
+    budget.budget["chat_history"] = turn_cost * 2
+    selected = budget.select_chat_history(history)
+    assert [t["message"] for t in selected] == ["message 3", "message 4"]
+
+
+def test_tokenizer_failures_per_model(monkeypatch):
+
+    class FakeLLM:
+        def __init__(self, model_name):
+            self.model_name = model_name
+
+    loaded = []
+
+    def get_llm_tokenizer(llm):
+        loaded.append(llm.model_name)
+        if llm.model_name == "offline-model":
+            raise ConnectionError("tiktoken encodings can not be downloaded")
+        return "tokenizer"
+
+    monkeypatch.setattr(prompt_budget, "get_llm_tokenizer", get_llm_tokenizer)
+    monkeypatch.setattr(prompt_budget, "_tokenizer_failures", {})
+
+    assert PromptBudget(FakeLLM("offline-model")).tokenizer is None
+    # not retried at every turn, nor for the other models
+    assert PromptBudget(FakeLLM("offline-model")).tokenizer is None
+    assert PromptBudget(FakeLLM("gpt-3.5-turbo")).tokenizer == "tokenizer"
+    assert loaded == ["offline-model", "gpt-3.5-turbo"]
+
+    # retried after a while
+    monkeypatch.setenv("TOKENIZER_RETRY_INTERVAL", "0")
+    PromptBudget(FakeLLM("offline-model"))
+    assert loaded == ["offline-model", "gpt-3.5-turbo", "offline-model"]
+
+
+def test_prompt_tokens_in_why(client):
+
+    res = send_websocket_message({"text": "Where do I go?"}, client)
+
+    prompt_tokens = res["why"]["prompt_tokens"]
+    for section in DEFAULT_TOKEN_BUDGET.keys():
+        assert section in prompt_tokens
+        assert isinstance(prompt_tokens[section], int)
+
+
+def test_format_agent_input_without_budget(client):
+
+    working_memory = {
+        "user_message_json": {"text": "Meow"},
+        "episodic_memories": [],
+        "declarative_memories": [
+            (Document(page_content="memory number 0", metadata={"source": "test"}), 0.7, [], "0")
+        ],
+        "history": [{"who": "Human", "message": "Meow"}],
+    }
+
+    agent_input = client.app.state.ccat.agent_manager.format_agent_input(working_memory)
+    assert agent_input["input"] == "Meow"
+    assert "memory number 0" in agent_input["declarative_memory"]
+    assert "prompt_tokens" not in working_memory
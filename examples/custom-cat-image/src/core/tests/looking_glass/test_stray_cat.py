@@ -17,4 +17,20 @@ def test_stray_initialization(stray):
     assert isinstance(stray.working_memory, WorkingMemory)
 
 
+def test_cancel_before_turn_starts(stray):
+
+    # idle, nothing to cancel
+    assert not stray.cancel()
+
+    # cancelled while waiting for a thread, the turn does not start
+    stray.prepare_turn()
+    assert stray.cancel()
+    assert stray.run({"text": "Where do I go?"}) is None
+    assert stray.working_memory["history"] == []
+
+    # a new turn is not affected
+    stray.prepare_turn()
+    assert not stray.cancelled
+
+
 # TODO: test all properties and methods
\ No newline at end of file
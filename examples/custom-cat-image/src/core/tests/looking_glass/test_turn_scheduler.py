@@ -0,0 +1,173 @@
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+
+from cat.metrics import get_metrics
+from cat.looking_glass.turn_scheduler import TurnScheduler
+from cat.looking_glass.connections import ConnectionRegistry
+
+
+class FakeWebSocket:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+class FakeStray:
+    """Runs turns slowly, one at a time, and can be cancelled."""
+
+    user_id = "Alice"
+
+    def __init__(self, delay=0.1, websockets=()):
+        self.connections = ConnectionRegistry(self.user_id, asyncio.Queue())
+        for ws in websockets:
+            self.connections._connections[ws] = "full"
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.cancelled = threading.Event()
+
+    def prepare_turn(self):
+        self.cancelled.clear()
+
+    def run(self, user_message):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            start = time.monotonic()
+            while time.monotonic() - start < self.delay:
+                if self.cancelled.is_set():
+                    return None
+                time.sleep(0.01)
+            if user_message["text"] == "boom":
+                raise ValueError("boom")
+            return {"type": "chat", "content": user_message["text"]}
+        finally:
+            self.running -= 1
+
+    def cancel(self):
+        self.cancelled.set()
+        return True
+
+
+async def wait_idle(scheduler):
+    while scheduler.busy:
+        await asyncio.sleep(0.01)
+
+
+def test_invalid_mode():
+
+    with pytest.raises(ValueError):
+        TurnScheduler(FakeStray(), mode="shuffle")
+
+
+def test_queue_mode():
+
+    async def scenario():
+        ws = FakeWebSocket()
+        stray = FakeStray(websockets=[ws])
+        scheduler = TurnScheduler(stray, mode="queue")
+        assert await scheduler.submit({"text": "one"}, ws)
+        await asyncio.sleep(0.02) # first turn starts running
+        for text in ["two", "three"]:
+            assert await scheduler.submit({"text": text}, ws)
+        assert scheduler.depth == 2
+        assert get_metrics()["gauges"]["turn_queue_depth"] >= 2
+        await wait_idle(scheduler)
+        return stray, ws
+
+    stray, ws = asyncio.run(scenario())
+    assert [m["content"] for m in ws.sent] == ["one", "two", "three"]
+    assert stray.max_running == 1
+
+
+def test_queue_limit():
+
+    async def scenario():
+        ws = FakeWebSocket()
+        scheduler = TurnScheduler(FakeStray(websockets=[ws]), mode="queue", max_queue=1)
+        assert await scheduler.submit({"text": "one"}, ws)
+        await asyncio.sleep(0.02) # first turn starts running
+        assert await scheduler.submit({"text": "two"}, ws)
+        assert not await scheduler.submit({"text": "three"}, ws)
+        await wait_idle(scheduler)
+        return ws
+
+    ws = asyncio.run(scenario())
+    assert ws.sent[0]["name"] == "TurnRejected"
+    assert [m.get("content") for m in ws.sent[1:]] == ["one", "two"]
+
+
+def test_supersede_mode():
+
+    async def scenario():
+        ws = FakeWebSocket()
+        scheduler = TurnScheduler(FakeStray(delay=0.5, websockets=[ws]), mode="supersede")
+        await scheduler.submit({"text": "one"}, ws)
+        await asyncio.sleep(0.05)
+        await scheduler.submit({"text": "two"}, ws)
+        await scheduler.submit({"text": "three"}, ws)
+        await wait_idle(scheduler)
+        return ws
+
+    ws = asyncio.run(scenario())
+    assert [m["content"] for m in ws.sent] == ["three"]
+
+
+def test_reject_mode():
+
+    async def scenario():
+        ws = FakeWebSocket()
+        scheduler = TurnScheduler(FakeStray(websockets=[ws]), mode="reject")
+        assert await scheduler.submit({"text": "one"}, ws)
+        assert not await scheduler.submit({"text": "two"}, ws)
+        await wait_idle(scheduler)
+        return ws
+
+    ws = asyncio.run(scenario())
+    assert ws.sent[0]["name"] == "TurnRejected"
+    assert ws.sent[1]["content"] == "one"
+
+
+def test_answers_broadcast_and_errors():
+
+    async def scenario():
+        sender, other = FakeWebSocket(), FakeWebSocket()
+        scheduler = TurnScheduler(FakeStray(websockets=[sender, other]), mode="queue")
+        await scheduler.submit({"text": "one"}, sender)
+        await scheduler.submit({"text": "boom"}, sender)
+        await wait_idle(scheduler)
+        return sender, other
+
+    sender, other = asyncio.run(scenario())
+    assert sender.sent == other.sent
+    assert sender.sent[0]["content"] == "one"
+    assert sender.sent[1]["type"] == "error"
+    assert sender.sent[1]["name"] == "ValueError"
+
+
+def test_clear():
+
+    async def scenario():
+        ws = FakeWebSocket()
+        stray = FakeStray(websockets=[ws])
+        scheduler = TurnScheduler(stray, mode="queue")
+        await scheduler.submit({"text": "one"}, ws)
+        await scheduler.submit({"text": "two"}, ws)
+        await asyncio.sleep(0.02)
+        scheduler.clear()
+        assert scheduler.depth == 0
+        await wait_idle(scheduler)
+        return ws
+
+    ws = asyncio.run(scenario())
+    assert ws.sent == []
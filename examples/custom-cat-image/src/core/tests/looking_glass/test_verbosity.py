@@ -0,0 +1,87 @@
+import pytest
+
+from cat.looking_glass.verbosity import trim_why, trim_message, most_verbose, get_default_verbosity
+
+from tests.utils import send_websocket_message
+
+
+WHY = {
+    "input": "Where is the White Rabbit?",
+    "intermediate_steps": [[["get_the_time", "now"], "It's late"]],
+    "memory": {
+        "episodic": [{"id": "1", "score": 0.9, "page_content": "rabbit", "metadata": {"source": "Alice"}}],
+        "declarative": [],
+    },
+}
+
+
+def test_trim_why():
+
+    assert trim_why(WHY, "full") is WHY
+    assert trim_why(WHY, "minimal") == {}
+
+    ids = trim_why(WHY, "ids")
+    assert ids["input"] == WHY["input"]
+    assert ids["intermediate_steps"] == [[["get_the_time", "now"], None]]
+    assert ids["memory"] == {"episodic": [{"id": "1", "score": 0.9}], "declarative": []}
+
+
+def test_trim_message():
+
+    token = {"type": "chat_token", "content": "Hi"}
+    assert trim_message(token, "minimal") is token
+
+    message = {"type": "chat", "content": "Hi", "why": WHY}
+    assert trim_message(message, "minimal")["why"] == {}
+    assert message["why"] is WHY
+
+
+def test_levels(monkeypatch):
+
+    assert most_verbose(["minimal", "full", "ids"]) == "full"
+    assert most_verbose([]) == "minimal"
+
+    assert get_default_verbosity() == "full"
+    monkeypatch.setenv("WHY_VERBOSITY", "chatty")
+    with pytest.raises(ValueError):
+        get_default_verbosity()
+
+
+def test_websocket_verbosity(client):
+
+    with client.websocket_connect("/ws/Alice?verbosity=ids") as ws_ids:
+        with client.websocket_connect("/ws/Alice?verbosity=minimal") as ws_minimal:
+            ws_ids.send_json({"text": "Where is the White Rabbit?"})
+
+            replies = []
+            for ws in [ws_ids, ws_minimal]:
+                message = ws.receive_json()
+                while message["type"] == "chat_token":
+                    message = ws.receive_json()
+                replies.append(message)
+
+    assert replies[0]["content"] == replies[1]["content"]
+    assert replies[1]["why"] == {}
+    for memories in replies[0]["why"]["memory"].values():
+        for m in memories:
+            assert set(m.keys()) == {"id", "score"}
+
+    # history keeps the most verbose level of the connections
+    response = client.get("/memory/conversation_history", headers={"user_id": "Alice"})
+    why = response.json()["history"][-1]["why"]
+    assert "memory" in why
+    for memories in why["memory"].values():
+        for m in memories:
+            assert set(m.keys()) == {"id", "score"}
+
+
+def test_message_verbosity(client):
+
+    response = client.post("/message?verbosity=minimal", json={"text": "Hi"})
+    assert response.json()["why"] == {}
+
+    response = client.post("/message", json={"text": "Hi"})
+    assert "memory" in response.json()["why"]
+
+    response = client.post("/message?verbosity=chatty", json={"text": "Hi"})
+    assert response.status_code == 400
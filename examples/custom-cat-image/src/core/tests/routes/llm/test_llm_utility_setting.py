@@ -0,0 +1,68 @@
+
+from cat.factory.custom_llm import LLMCustom
+from cat.factory.llm import get_llms_schemas
+
+
+def test_get_all_utility_llm_settings(client):
+
+    llms_schemas = get_llms_schemas()
+
+    response = client.get("/llm/utility/settings")
+    json = response.json()
+
+    assert response.status_code == 200
+    assert len(json["settings"]) == len(llms_schemas)
+    for setting in json["settings"]:
+        assert setting["value"] == {}
+
+    assert json["selected_configuration"] == None # main LLM used at startup
+
+    ccat = client.app.state.ccat
+    assert ccat._utility_llm is ccat._llm
+
+
+def test_get_utility_llm_settings_non_existent(client):
+
+    non_existent_llm_name = "LLMNonExistentConfig"
+    response = client.get(f"/llm/utility/settings/{non_existent_llm_name}")
+
+    assert response.status_code == 400
+    assert f"{non_existent_llm_name} not supported" in response.json()["detail"]["error"]
+
+
+def test_upsert_utility_llm_settings(client):
+
+    new_llm = "LLMCustomConfig"
+    invented_url = "https://example.com/utility"
+    payload = {
+        "url": invented_url,
+        "options": {}
+    }
+    response = client.put(f"/llm/utility/settings/{new_llm}", json=payload)
+    json = response.json()
+    assert response.status_code == 200
+    assert json["name"] == new_llm
+    assert json["value"]["url"] == invented_url
+
+    # utility LLM is loaded, main LLM is untouched
+    ccat = client.app.state.ccat
+    assert isinstance(ccat._utility_llm, LLMCustom)
+    assert ccat._utility_llm.url == invented_url
+    assert ccat._utility_llm is not ccat._llm
+
+    response = client.get("/llm/utility/settings")
+    json = response.json()
+    assert json["selected_configuration"] == new_llm
+    saved_config = [ c for c in json["settings"] if c["name"] == new_llm ]
+    assert saved_config[0]["value"]["url"] == invented_url
+
+    # main LLM settings do not see the utility configuration
+    response = client.get(f"/llm/settings/{new_llm}")
+    assert response.json()["value"] == {}
+    assert client.get("/llm/settings").json()["selected_configuration"] == None
+
+    # back to main LLM
+    response = client.delete("/llm/utility/settings")
+    assert response.status_code == 200
+    assert response.json()["deleted"]
+    assert ccat._utility_llm is ccat._llm
@@ -1,3 +1,4 @@
+from cat.web import CrawlCache
 from tests.utils import send_websocket_message, get_collections_names_and_point_count
 
 
@@ -118,4 +119,17 @@ def test_memory_collections_wipe(client):
     collections_n_points = get_collections_names_and_point_count(client)
     assert collections_n_points["procedural"] == 3   # default tool is re-emebedded
     assert collections_n_points["episodic"] == 0
-    assert collections_n_points["declarative"] == 0
\ No newline at end of file
+    assert collections_n_points["declarative"] == 0
+
+def test_memory_collection_declarative_cleared_crawl_cache(client):
+
+    CrawlCache().set("https://wonderland.test/", etag="meow", content_hash="purr", links=[])
+
+    response = client.delete("/memory/collections/episodic")
+    assert response.status_code == 200
+    assert CrawlCache().get("https://wonderland.test/") is not None
+
+    # crawled pages are ingested again
+    response = client.delete("/memory/collections/declarative")
+    assert response.status_code == 200
+    assert CrawlCache().get("https://wonderland.test/") is None
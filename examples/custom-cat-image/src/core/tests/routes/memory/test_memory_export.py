@@ -0,0 +1,105 @@
+import json
+import uuid
+
+import numpy as np
+
+from cat.serialization import vector_from_base64
+from tests.utils import get_collections_names_and_point_count, get_fake_memory_export, wait_for_job
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def upload_memories(client, file_name, content):
+    response = client.post(
+        "/rabbithole/memory/",
+        files={"file": (file_name, content, "application/json")}
+    )
+    assert response.status_code == 200
+    return wait_for_job(client, response.json()["job_id"])
+
+
+def test_export_collection(client):
+
+    response = client.get("/memory/collections/procedural/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="procedural.ndjson"' in response.headers["content-disposition"]
+
+    header, *points = read_ndjson(response)
+    assert header == {
+        "embedder": "DumbEmbedder",
+        "collection": "procedural",
+        "vector_size": 2367,
+        "vectors_format": "list",
+    }
+    # default tools
+    assert len(points) == get_collections_names_and_point_count(client)["procedural"] == 3
+    for point in points:
+        assert set(point) == {"id", "page_content", "metadata", "vector"}
+        assert len(point["vector"]) == 2367
+
+
+def test_export_non_existent_collection(client):
+
+    response = client.get("/memory/collections/wonderland/export")
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "Collection does not exist."
+
+
+def test_export_import_collection(client, monkeypatch):
+    monkeypatch.setattr(client.app.state.ccat.rabbit_hole, "memory_batch_size", 2)
+    fake_memory = get_fake_memory_export(points=5)
+    assert upload_memories(client, "memories.json", json.dumps(fake_memory))["status"] == "completed"
+
+    # scrolled in pages, with binary packed vectors
+    response = client.get(
+        "/memory/collections/declarative/export", params={"vectors_format": "base64", "batch_size": 2}
+    )
+    assert response.status_code == 200
+    export = response.content
+    header, *points = read_ndjson(response)
+    assert header["vectors_format"] == "base64"
+    assert len(points) == 5
+
+    client.delete("/memory/collections/declarative")
+    assert get_collections_names_and_point_count(client)["declarative"] == 0
+
+    assert upload_memories(client, "declarative.ndjson", export)["status"] == "completed"
+    assert get_collections_names_and_point_count(client)["declarative"] == 5
+
+    # same points (vectors are normalized by the cosine distance, and exported as float32)
+    exported = {p["id"]: p for p in points}
+    response = client.get("/memory/collections/declarative/export")
+    for point in read_ndjson(response)[1:]:
+        assert point["id"] in exported
+        assert point["page_content"] == exported[point["id"]]["page_content"]
+        assert point["metadata"] == exported[point["id"]]["metadata"]
+        assert np.allclose(point["vector"], vector_from_base64(exported[point["id"]]["vector"]))
+
+
+def test_import_ndjson_checks(client, monkeypatch):
+    monkeypatch.setattr(client.app.state.ccat.rabbit_hole, "memory_batch_size", 2)
+
+    header = {"embedder": "AnotherEmbedder", "collection": "declarative", "vector_size": 2367, "vectors_format": "list"}
+    job = upload_memories(client, "declarative.ndjson", json.dumps(header) + "\n")
+    assert job["status"] == "failed"
+    assert "Embedder mismatch: file embedder AnotherEmbedder is different from DumbEmbedder" in job["error"]
+
+    # the vector size of the header is checked before reading the points
+    header = {"embedder": "DumbEmbedder", "collection": "declarative", "vector_size": 9, "vectors_format": "list"}
+    point = {"id": "b6a1a0ae-8c8b-4f3b-a6c5-2e0a4d9b3c11", "page_content": "meow", "metadata": {}, "vector": [0.1] * 9}
+    job = upload_memories(client, "declarative.ndjson", json.dumps(header) + "\n" + json.dumps(point) + "\n")
+    assert job["status"] == "failed"
+    assert "Embedding size mismatch" in job["error"]
+
+    # points are all checked before upserting any
+    header["vector_size"] = 2367
+    points = [{**point, "id": str(uuid.uuid4()), "vector": [0.1] * 2367} for _ in range(3)] + [point]
+    lines = [json.dumps(header)] + [json.dumps(p) for p in points]
+    job = upload_memories(client, "declarative.ndjson", "\n".join(lines) + "\n")
+    assert job["status"] == "failed"
+    assert "Embedding size mismatch" in job["error"]
+
+    assert get_collections_names_and_point_count(client)["declarative"] == 0
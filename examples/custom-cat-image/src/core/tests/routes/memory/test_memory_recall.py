@@ -1,3 +1,7 @@
+import base64
+
+import numpy as np
+
 from tests.utils import send_websocket_message, send_n_websocket_messages
 
 
@@ -72,3 +76,27 @@ def test_memory_recall_with_k_success(client):
     assert response.status_code == 200
     episodic_memories = json["vectors"]["collections"]["episodic"]
     assert len(episodic_memories) == max_k # only 2 of 6 memories recalled
+
+
+# vectors as base64 float32
+def test_memory_recall_base64_vectors(client):
+
+    params = {
+        "text": "Red Queen",
+        "vectors_format": "base64",
+    }
+    response = client.get(f"/memory/recall/", params=params)
+    json = response.json()
+    assert response.status_code == 200
+    assert json["vectors"]["vectors_format"] == "base64"
+
+    response = client.get(f"/memory/recall/", params={"text": "Red Queen"})
+    list_json = response.json()
+
+    query_vector = np.frombuffer(base64.b64decode(json["query"]["vector"]), dtype="<f4")
+    assert np.allclose(query_vector, list_json["query"]["vector"], atol=1e-6)
+
+    procedural = json["vectors"]["collections"]["procedural"]
+    assert len(procedural) > 0
+    vector = np.frombuffer(base64.b64decode(procedural[0]["vector"]), dtype="<f4")
+    assert len(vector) == len(query_vector)
@@ -0,0 +1,95 @@
+import io
+import zipfile
+
+from tests.utils import get_declarative_memory_contents, wait_for_job
+
+
+with open("tests/mocks/sample.txt") as f:
+    SAMPLE = f.read()
+
+
+def make_zip(files):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+    archive.seek(0)
+    return archive
+
+
+def sources(client):
+    return sorted({m["metadata"]["source"] for m in get_declarative_memory_contents(client)})
+
+
+def test_rabbithole_upload_archive(client, byte_encoding):
+
+    archive = make_zip({
+        "docs/intro.txt": SAMPLE,
+        "docs/guide.md": "# Guide\n\n" + SAMPLE,
+        "logo.png": b"\x89PNG",
+        ".hidden.txt": SAMPLE,
+    })
+    response = client.post("/rabbithole/bulk", files={"file": ("kb.zip", archive, "application/zip")})
+
+    assert response.status_code == 200
+    json = response.json()
+    assert json["filename"] == "kb.zip"
+    assert "Archive is being ingested" in json["info"]
+
+    job = wait_for_job(client, json["job_id"])
+    assert job["status"] == "completed"
+    report = job["report"]
+    assert report["files"] == 3
+    assert report["ingested"] == 2
+    assert report["skipped_files"] == ["logo.png"]
+    assert report["failed"] == 0
+    assert report["chunks"] == job["chunks"] > 0
+    assert job["files_ingested"] == 2
+
+    assert sources(client) == ["docs/guide.md", "docs/intro.txt"]
+    assert len(get_declarative_memory_contents(client)) == job["chunks"]
+
+
+def test_rabbithole_upload_archive_errors(client):
+
+    # not an archive
+    response = client.post("/rabbithole/bulk", files={"file": ("sample.txt", io.BytesIO(b"meow"), "text/plain")})
+    assert response.status_code == 400
+    assert "not a supported archive" in response.json()["detail"]["error"]
+
+    # nothing to ingest
+    response = client.post("/rabbithole/bulk", data={"chunk_size": 128})
+    assert response.status_code == 400
+
+    # an archive with a member outside of it
+    archive = make_zip({"../escape.txt": SAMPLE})
+    response = client.post("/rabbithole/bulk", files={"file": ("evil.zip", archive, "application/zip")})
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert "outside of the archive" in job["error"]
+
+
+def test_rabbithole_upload_folder(client, byte_encoding, tmp_path, monkeypatch):
+
+    # server-side paths are disabled by default
+    response = client.post("/rabbithole/bulk", data={"path": "kb"})
+    assert response.status_code == 403
+
+    monkeypatch.setenv("RABBITHOLE_BULK_FOLDER", str(tmp_path))
+    (tmp_path / "kb" / "guides").mkdir(parents=True)
+    (tmp_path / "kb" / "intro.txt").write_text(SAMPLE)
+    (tmp_path / "kb" / "guides" / "setup.md").write_text(SAMPLE)
+    (tmp_path / "secret.txt").write_text(SAMPLE)
+
+    response = client.post("/rabbithole/bulk", data={"path": "../"})
+    assert response.status_code == 403
+    response = client.post("/rabbithole/bulk", data={"path": "missing"})
+    assert response.status_code == 400
+
+    response = client.post("/rabbithole/bulk", data={"path": "kb"})
+    assert response.status_code == 200
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed"
+    assert job["report"]["ingested"] == 2
+
+    assert sources(client) == ["guides/setup.md", "intro.txt"]
@@ -1,5 +1,5 @@
 
-from tests.utils import get_declarative_memory_contents
+from tests.utils import get_declarative_memory_contents, wait_for_job
 
 
 def test_rabbithole_upload_txt(client):
@@ -20,6 +20,7 @@ def test_rabbithole_upload_txt(client):
     assert json["filename"] == file_name
     assert json["content_type"] == content_type
     assert "File is being ingested" in json["info"]
+    assert wait_for_job(client, json["job_id"])["status"] == "completed"
 
     # check memory contents
     # check declarative memory is empty
@@ -45,6 +46,7 @@ def test_rabbithole_upload_pdf(client):
     assert json["filename"] == file_name
     assert json["content_type"] == content_type
     assert "File is being ingested" in json["info"]
+    assert wait_for_job(client, json["job_id"])["status"] == "completed"
 
     # check memory contents
     # check declarative memory is empty
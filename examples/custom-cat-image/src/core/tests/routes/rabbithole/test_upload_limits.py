@@ -0,0 +1,67 @@
+import pytest
+
+from cat.upload_limits import get_upload_limit
+
+
+def multipart(file_name, content, content_type="text/plain", boundary="meow"):
+    return (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+
+
+def test_upload_limits(monkeypatch):
+    monkeypatch.setenv("RABBITHOLE_MAX_UPLOAD_SIZE", "100")
+    monkeypatch.setenv("RABBITHOLE_MAX_ARCHIVE_SIZE", "200")
+    monkeypatch.setenv("RABBITHOLE_MAX_MEMORY_SIZE", "0")
+
+    assert get_upload_limit("/rabbithole/") == 100
+    assert get_upload_limit("/rabbithole/web") == 100
+    assert get_upload_limit("/rabbithole/bulk") == 200
+    # disabled
+    assert get_upload_limit("/rabbithole/memory") is None
+    assert get_upload_limit("/plugins/upload") == 50 * 1024 * 1024
+    assert get_upload_limit("/message") is None
+
+
+@pytest.mark.parametrize("endpoint, env", [
+    ("/rabbithole/", "RABBITHOLE_MAX_UPLOAD_SIZE"),
+    ("/rabbithole/memory", "RABBITHOLE_MAX_MEMORY_SIZE"),
+    ("/plugins/upload", "PLUGINS_MAX_UPLOAD_SIZE"),
+])
+def test_upload_too_large(client, monkeypatch, endpoint, env):
+    monkeypatch.setenv(env, "1000")
+
+    files = {"file": ("sample.txt", b"meow" * 1000, "text/plain")}
+    response = client.post(endpoint, files=files)
+
+    assert response.status_code == 413
+    assert "maximum upload size of 1000 bytes" in response.json()["detail"]["error"]
+
+
+def test_upload_too_large_streamed(client, monkeypatch):
+    monkeypatch.setenv("RABBITHOLE_MAX_UPLOAD_SIZE", "1000")
+    body = multipart("sample.txt", b"meow" * 1000)
+
+    # without Content-Length, the body is counted while it is received
+    def chunks():
+        for i in range(0, len(body), 256):
+            yield body[i:i + 256]
+
+    response = client.post(
+        "/rabbithole/",
+        content=chunks(),
+        headers={"Content-Type": "multipart/form-data; boundary=meow"},
+    )
+
+    assert response.status_code == 413
+    assert "maximum upload size of 1000 bytes" in response.json()["detail"]["error"]
+
+
+def test_upload_within_limit(client, monkeypatch):
+    monkeypatch.setenv("RABBITHOLE_MAX_UPLOAD_SIZE", "1000")
+
+    files = {"file": ("sample.txt", b"meow" * 10, "text/plain")}
+    response = client.post("/rabbithole/", files=files)
+
+    assert response.status_code == 200
@@ -1,11 +1,10 @@
 import json
-import time
-import uuid
-import random
 import pytest
 from fastapi import HTTPException
 
-from tests.utils import get_declarative_memory_contents, get_collections_names_and_point_count
+from tests.utils import (
+    get_declarative_memory_contents, get_collections_names_and_point_count, get_fake_memory_export, wait_for_job
+)
 
 
 # all good memory upload
@@ -25,6 +24,7 @@ def test_upload_memory(client):
     assert json["filename"] == file_name
     assert json["content_type"] == content_type
     assert "Memory is being ingested" in json["info"]
+    assert wait_for_job(client, json["job_id"])["status"] == "completed"
 
     # new declarative memory was saved
     collections_n_points = get_collections_names_and_point_count(client)
@@ -55,16 +55,17 @@ def test_upload_memory_check_embedder(client):
     another_embedder = "AnotherEmbedder"
     fake_memory = get_fake_memory_export(embedder_name=another_embedder)
 
-    with pytest.raises(Exception) as e:
-        response = client.post(
-            "/rabbithole/memory/",
-            files={
-                "file": ("test_file.json", json.dumps(fake_memory), "application/json")
-            }
-        )
+    response = client.post(
+        "/rabbithole/memory/",
+        files={
+            "file": ("test_file.json", json.dumps(fake_memory), "application/json")
+        }
+    )
+    job = wait_for_job(client, response.json()["job_id"])
 
     # ...but found a different embedder
-    assert f"Embedder mismatch: file embedder {another_embedder} is different from DumbEmbedder" in str(e.value)
+    assert job["status"] == "failed"
+    assert f"Embedder mismatch: file embedder {another_embedder} is different from DumbEmbedder" in job["error"]
     # and did not update collection
     collections_n_points = get_collections_names_and_point_count(client)
     assert collections_n_points["declarative"] == 0
@@ -75,33 +76,59 @@ def test_upload_memory_check_dimensionality(client):
     wrong_dim = 9
     fake_memory = get_fake_memory_export(dim=wrong_dim)
 
-    with pytest.raises(Exception) as e:
-        response = client.post(
-            "/rabbithole/memory/",
-            files={
-                "file": ("test_file.json", json.dumps(fake_memory), "application/json")
-            }
-        )
+    response = client.post(
+        "/rabbithole/memory/",
+        files={
+            "file": ("test_file.json", json.dumps(fake_memory), "application/json")
+        }
+    )
+    job = wait_for_job(client, response.json()["job_id"])
 
     # ...but found a different embedder
-    assert f"Embedding size mismatch" in str(e.value)
+    assert job["status"] == "failed"
+    assert f"Embedding size mismatch" in job["error"]
     # and did not update collection
     collections_n_points = get_collections_names_and_point_count(client)
     assert collections_n_points["declarative"] == 0
 
 
-def get_fake_memory_export(embedder_name="DumbEmbedder", dim=2367):
-    return {
-        "embedder": embedder_name,
-        "collections": {
-            "declarative": [{
-                "page_content": "test_memory",
-                "metadata": {
-                    "source": "user",
-                    "when": time.time()
-                },
-                "id": str(uuid.uuid4()),
-                "vector": [random.random() for _ in range(dim)]
-            }]
-        }
+# memories are read one at a time and upserted in batches
+def test_upload_memory_batches(client, monkeypatch):
+    monkeypatch.setattr(client.app.state.ccat.rabbit_hole, "memory_batch_size", 2)
+    fake_memory = get_fake_memory_export(points=5)
+    # the embedder may come after the memories
+    fake_memory = {
+        "collections": {"episodic": [], **fake_memory["collections"]},
+        "embedder": fake_memory["embedder"],
     }
+
+    response = client.post(
+        "/rabbithole/memory/",
+        files={
+            "file": ("test_file.json", json.dumps(fake_memory), "application/json")
+        }
+    )
+
+    assert wait_for_job(client, response.json()["job_id"])["status"] == "completed"
+    collections_n_points = get_collections_names_and_point_count(client)
+    assert collections_n_points["declarative"] == 5
+    assert collections_n_points["episodic"] == 0
+
+
+# the whole file is checked before upserting any memory
+def test_upload_memory_not_partial(client, monkeypatch):
+    monkeypatch.setattr(client.app.state.ccat.rabbit_hole, "memory_batch_size", 2)
+    fake_memory = get_fake_memory_export(points=5)
+    fake_memory["collections"]["declarative"][-1]["vector"] = [0.1] * 9
+
+    response = client.post(
+        "/rabbithole/memory/",
+        files={
+            "file": ("test_file.json", json.dumps(fake_memory), "application/json")
+        }
+    )
+    job = wait_for_job(client, response.json()["job_id"])
+
+    assert job["status"] == "failed"
+    assert "Embedding size mismatch" in job["error"]
+    assert get_collections_names_and_point_count(client)["declarative"] == 0
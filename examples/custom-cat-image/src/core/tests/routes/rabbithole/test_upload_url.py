@@ -1,5 +1,10 @@
 
-from tests.utils import get_declarative_memory_contents
+from tests.utils import (
+    LocalWebsite,
+    get_collections_names_and_point_count,
+    get_declarative_memory_contents,
+    wait_for_job,
+)
 
 def test_rabbithole_upload_invalid_url(client):
 
@@ -30,7 +35,78 @@ def test_rabbithole_upload_url(client):
     json = response.json()
     assert json["info"] == "URL is being ingested asynchronously"
     assert json["url"] == payload["url"]
+    assert wait_for_job(client, json["job_id"])["status"] == "completed"
 
     # check declarative memories have been stored
     declarative_memories = get_declarative_memory_contents(client)
     assert len(declarative_memories) == 1
+
+
+with open("tests/mocks/sample.txt") as f:
+    SAMPLE = f.read()
+
+
+def page(*links):
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return "text/html", f"<html><body><p>{SAMPLE}</p>{anchors}</body></html>"
+
+
+def test_rabbithole_upload_local_url(client, byte_encoding, monkeypatch):
+
+    with LocalWebsite({"/sample.txt": ("text/plain", SAMPLE)}) as website:
+        response = client.post("/rabbithole/web/", json={"url": website.url + "/sample.txt"})
+        assert response.status_code == 200
+        job = wait_for_job(client, response.json()["job_id"])
+        assert job["status"] == "completed"
+        assert job["chunks"] > 0
+
+        # downloads are limited in size
+        monkeypatch.setenv("RABBITHOLE_MAX_DOWNLOAD_SIZE", "100")
+        response = client.post("/rabbithole/web/", json={"url": website.url + "/sample.txt"})
+        job = wait_for_job(client, response.json()["job_id"])
+        assert job["status"] == "failed"
+        assert "larger than 100 bytes" in job["error"]
+
+        response = client.post("/rabbithole/web/", json={"url": website.url + "/missing"})
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"] == "Invalid URL"
+
+
+def test_rabbithole_crawl(client, byte_encoding):
+
+    pages = {"/": page("/a", "/b"), "/a": page("/"), "/b": page("/c"), "/c": page()}
+    with LocalWebsite(pages) as website:
+        payload = {"url": website.url + "/", "crawl": True, "max_depth": 1}
+        response = client.post("/rabbithole/web/", json=payload)
+        assert response.status_code == 200
+        assert response.json()["info"] == "Website is being crawled asynchronously"
+
+        job = wait_for_job(client, response.json()["job_id"])
+        assert job["status"] == "completed"
+        report = job["report"]
+        assert report["pages"] == 3
+        assert report["ingested"] == 3
+        assert job["chunks"] == report["chunks"] > 0
+        assert get_collections_names_and_point_count(client)["declarative"] == report["chunks"]
+
+        # crawled again, only the changed page is ingested
+        website.pages["/b"] = ("text/html", "<html><body><p>The page changed, all of it.</p></body></html>")
+        job = wait_for_job(client, client.post("/rabbithole/web/", json=payload).json()["job_id"])
+        assert job["report"]["ingested"] == 1
+        assert job["report"]["unchanged"] == 2
+        sources = {m["metadata"]["source"] for m in get_declarative_memory_contents(client)}
+        assert sources == {website.url + p for p in ("/", "/a", "/b")}
+
+        # deleted pages are ingested again, even if not changed
+        response = client.request(
+            "DELETE", "/memory/collections/declarative/points", json={"source": website.url + "/a"}
+        )
+        assert response.status_code == 200
+        job = wait_for_job(client, client.post("/rabbithole/web/", json=payload).json()["job_id"])
+        assert job["report"]["ingested"] == 1
+        assert job["report"]["unchanged"] == 2
+
+        # as all of them after a wipe
+        client.delete("/memory/collections/declarative")
+        job = wait_for_job(client, client.post("/rabbithole/web/", json=payload).json()["job_id"])
+        assert job["report"]["ingested"] == 3
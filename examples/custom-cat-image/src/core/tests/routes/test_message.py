@@ -0,0 +1,142 @@
+import json
+import asyncio
+
+
+def parse_events(response):
+    return [
+        json.loads(line[len("data: "):])
+        for line in response.text.split("\n\n") if line.startswith("data: ")
+    ]
+
+
+def test_message_json(client):
+
+    response = client.post("/message", json={"text": "It's late! It's late", "user_id": "Alice"})
+    assert response.status_code == 200
+    json = response.json()
+
+    assert json["type"] == "chat"
+    assert json["user_id"] == "Alice"
+    assert "You did not configure" in json["content"]
+    assert "memory" in json["why"]
+
+    # stateless, no session is kept
+    assert "Alice" not in client.app.state.strays
+
+
+def test_message_without_text(client):
+
+    response = client.post("/message", json={"content": "hello"})
+    assert response.status_code == 400
+
+
+def test_message_sse(client, monkeypatch):
+
+    # send a few tokens and a notification during the turn
+    async def streaming_agent(stray):
+        for token in ["Hello", " there"]:
+            stray.send_ws_message(token, msg_type="chat_token")
+        stray.send_ws_message("Thinking...")
+        return {"output": "Hello there"}
+
+    monkeypatch.setattr(client.app.state.ccat.agent_manager, "execute_agent", streaming_agent)
+
+    for params, headers in [({"stream": True}, {}), ({}, {"Accept": "text/event-stream"})]:
+        response = client.post("/message", json={"text": "Hi"}, params=params, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = parse_events(response)
+        assert [e["type"] for e in events] == ["chat_token", "chat_token", "notification", "chat"]
+        assert "".join(e["content"] for e in events[:2]) == events[-1]["content"]
+
+
+def test_message_sse_error(client, monkeypatch):
+
+    async def failing_agent(stray):
+        raise ValueError("The Queen wants your head")
+
+    monkeypatch.setattr(client.app.state.ccat.agent_manager, "execute_agent", failing_agent)
+
+    response = client.post("/message?stream=true", json={"text": "Hi"})
+    events = parse_events(response)
+    assert events[-1]["type"] == "error"
+    assert events[-1]["name"] == "ValueError"
+
+
+def test_message_batch(client, monkeypatch):
+
+    ccat = client.app.state.ccat
+    active = 0
+    max_active = 0
+
+    async def slow_agent(stray):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return {"output": f"Reply to {stray.working_memory['user_message_json']['text']}"}
+
+    monkeypatch.setattr(ccat.agent_manager, "execute_agent", slow_agent)
+
+    messages = [{"user_id": f"user_{i % 2}", "text": f"question {i}"} for i in range(6)]
+    response = client.post("/message/batch", json={
+        "messages": messages,
+        "concurrency": 2,
+        "store_episodic_memory": False,
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["index"] for r in results) == list(range(6))
+    for r in results:
+        assert r["content"] == f"Reply to question {r['index']}"
+        assert r["user_id"] == messages[r["index"]]["user_id"]
+        assert "why" not in r
+        for stage in ["recall", "agent", "episodic_memory", "total"]:
+            assert r["timings"][stage] >= 0
+    assert max_active <= 2
+
+    # episodic memory was not written
+    response = client.get("/memory/collections/")
+    episodic = [c for c in response.json()["collections"] if c["name"] == "episodic"][0]
+    assert episodic["vectors_count"] == 0
+
+
+def test_message_batch_max_concurrency(client, monkeypatch):
+
+    ccat = client.app.state.ccat
+    active = 0
+    max_active = 0
+
+    async def slow_agent(stray):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return {"output": "Meow"}
+
+    monkeypatch.setattr(ccat.agent_manager, "execute_agent", slow_agent)
+    monkeypatch.setenv("MESSAGE_BATCH_MAX_CONCURRENCY", "2")
+
+    messages = [{"text": f"question {i}"} for i in range(6)]
+    response = client.post("/message/batch", json={
+        "messages": messages,
+        "concurrency": 1000,
+        "store_episodic_memory": False,
+    })
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 6
+    assert max_active <= 2
+
+
+def test_message_batch_validation(client):
+
+    response = client.post("/message/batch", json={"messages": [{"user_id": "Alice"}]})
+    assert response.status_code == 400
+
+    response = client.post("/message/batch", json={"messages": [], "concurrency": 0})
+    assert response.status_code == 400
@@ -1,3 +1,12 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from cat.metrics import get_metrics
+from cat.looking_glass.callbacks import NewTokenHandler, TurnCancelled
+
 
 from tests.utils import send_websocket_message
 
@@ -20,3 +29,52 @@ def test_websocket(client):
         assert type(res["content"]) == str
         assert "You did not configure" in res["content"]
         assert len(res["why"].keys()) > 0
+
+
+def test_websocket_disconnect_cancels_turn(client, monkeypatch):
+
+    ccat = client.app.state.ccat
+    turn_started = threading.Event()
+
+    async def slow_agent(stray):
+        turn_started.set()
+        await asyncio.sleep(10)
+        return {"output": "too late"}
+
+    monkeypatch.setattr(ccat.agent_manager, "execute_agent", slow_agent)
+    cancelled_before = get_metrics()["counters"].get("turns_cancelled", 0)
+
+    with client.websocket_connect("/ws/Alice") as websocket:
+        websocket.send_json({"text": "It's late! It's late"})
+        assert turn_started.wait(5)
+
+    # turn is cancelled, nothing stored in episodic memory
+    start = time.time()
+    while get_metrics()["counters"].get("turns_cancelled", 0) == cancelled_before:
+        assert time.time() - start < 5
+        time.sleep(0.05)
+
+    response = client.get("/memory/collections/")
+    episodic = [c for c in response.json()["collections"] if c["name"] == "episodic"][0]
+    assert episodic["vectors_count"] == 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.json()["counters"]["turns_cancelled"] > cancelled_before
+
+
+def test_cancelled_turn_aborts_stream():
+
+    class FakeStray:
+        cancelled = False
+
+        def send_ws_message(self, content, msg_type):
+            pass
+
+    stray = FakeStray()
+    handler = NewTokenHandler(stray)
+    handler.on_llm_new_token("hello")
+
+    stray.cancelled = True
+    with pytest.raises(TurnCancelled):
+        handler.on_llm_new_token("world")
@@ -0,0 +1,76 @@
+import re
+
+from cat.dedup import ChunkDeduplicator, content_hash, simhash
+
+
+TEXT = (
+    "The Cheshire Cat is a fictional cat popularised by Lewis Carroll in Alice's Adventures in Wonderland "
+    "and known for its distinctive mischievous grin. While now most often used in Alice-related contexts, "
+    "the association of a grinning cat with the county of Cheshire predates the publication of the book."
+)
+
+
+def test_simhash():
+
+    fingerprint, shingles = simhash(TEXT)
+    assert 0 <= fingerprint < 2 ** 64
+    assert shingles == len(re.findall(r"\w+", TEXT)) - 2
+    # case and punctuation do not matter
+    assert simhash(TEXT.upper().replace(".", ""))[0] == fingerprint
+
+    near = simhash(TEXT.replace("mischievous", "wide"))[0]
+    other = simhash("Alice follows the White Rabbit down the rabbit hole, and falls for a long time.")[0]
+    assert bin(fingerprint ^ near).count("1") < bin(fingerprint ^ other).count("1")
+
+
+def test_exact_duplicates():
+
+    dedup = ChunkDeduplicator()
+    assert dedup.duplicate_of("meow") is None
+    assert dedup.duplicate_of("purr") is None
+    assert dedup.duplicate_of("meow") == content_hash("meow")
+    # short chunks are only compared by hash
+    assert dedup.fingerprint("meow meow") is None
+
+
+def test_near_duplicates():
+
+    dedup = ChunkDeduplicator()
+    dedup.add(TEXT)
+
+    assert dedup.duplicate_of(TEXT.replace("Cheshire.", "Cheshire!")) == content_hash(TEXT)
+    assert dedup.duplicate_of(TEXT.replace("mischievous", "wide")) == content_hash(TEXT)
+    assert dedup.duplicate_of(
+        "Alice follows the White Rabbit down the rabbit hole, and falls for a long time while "
+        "wondering about latitude and longitude, until she lands on a heap of sticks and dry leaves."
+    ) is None
+
+
+def test_duplicates_distance():
+
+    dedup = ChunkDeduplicator(distance=0)
+    dedup.add(TEXT)
+    assert dedup.duplicate_of(TEXT.replace("mischievous", "wide")) is None
+
+
+def test_stored_duplicates():
+
+    dedup = ChunkDeduplicator()
+    stored = {content_hash(TEXT): dedup.fingerprint(TEXT)}
+    lookups = []
+
+    def lookup(chunk_hash, bands):
+        lookups.append(bands)
+        return [
+            (stored_hash, fingerprint) for stored_hash, fingerprint in stored.items()
+            if stored_hash == chunk_hash or set(bands) & set(dedup.bands(fingerprint))
+        ]
+    dedup.lookup = lookup
+
+    assert dedup.duplicate_of(TEXT.replace("mischievous", "wide")) == content_hash(TEXT)
+    assert len(lookups[0]) == dedup.distance + 1
+    # new chunks are indexed, and found without looking them up
+    assert dedup.duplicate_of("meow") is None
+    assert dedup.duplicate_of("meow") == content_hash("meow")
+    assert lookups[-1] == []
+    assert len(lookups) == 2
@@ -0,0 +1,260 @@
+import io
+import json
+import time
+import threading
+
+import pytest
+
+from cat.jobs import IngestionJob, IngestionJobs, JobInterrupted, CHECKPOINT_FILE
+from tests.utils import get_collections_names_and_point_count, wait_for_job
+
+
+class FakeRabbitHole:
+    """Records the ingestions, each one waits for `release` if given."""
+
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+        self.ingested = []
+        self.started = threading.Event()
+
+    def ingest_file(self, stray, file, chunk_size, chunk_overlap, job=None, incremental=False):
+        self.started.set()
+        if self.release is not None:
+            while not self.release.wait(0.01):
+                job.raise_if_stopped()
+        self.ingested.append((job.source, job))
+
+    def ingest_memory(self, stray, file, job=None):
+        self.ingested.append((file, job))
+
+
+class FakeStray:
+
+    def __init__(self, rabbit_hole):
+        self.user_id = "user"
+        self.rabbit_hole = rabbit_hole
+
+    def send_ws_message(self, content, msg_type="notification"):
+        pass
+
+
+def wait_for(jobs, job_id, statuses=("completed", "failed", "cancelled")):
+    deadline = time.time() + 5
+    while jobs.get(job_id)["status"] not in statuses:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return jobs.get(job_id)
+
+
+@pytest.fixture
+def rabbit_hole():
+    return FakeRabbitHole(release=threading.Event())
+
+
+@pytest.fixture
+def jobs(tmp_path, rabbit_hole):
+    jobs = IngestionJobs({"user": FakeStray(rabbit_hole)}, None, folder=str(tmp_path), workers=1)
+    yield jobs
+    rabbit_hole.release.set()
+    jobs.shutdown()
+
+
+def test_job_checkpoint():
+
+    stored = []
+
+    class Store:
+        stopping = False
+
+        def _checkpoint(self, job_id, **fields):
+            stored.append(fields)
+
+    job = IngestionJob({"job_id": "2b9d5d36-6ea4-4b8e-9d1c-4d0a39bdb3a5", "kind": "file", "source": "doc"}, Store())
+
+    # batches of two parts stored out of order
+    job.set_batches(0, 2)
+    job.set_batches(1, 1)
+    job.commit((1, 0), 16)
+    job.commit((0, 1), 16)
+    assert not job.part_committed(0)
+    assert job.is_committed(0, 1) and not job.is_committed(0, 0)
+    assert stored[-1]["checkpoint"] == {"parts": 0, "batches": {"0": [1], "1": [0]}}
+
+    job.commit((0, 0), 16)
+    assert job.part_committed(1)
+    assert stored[-1] == {"checkpoint": {"parts": 2, "batches": {}}, "chunks": 48}
+
+    # a resumed job starts from the checkpoint, and stores the chunks with the same ids
+    resumed = IngestionJob(
+        {"job_id": job.id, "kind": "file", "source": "doc", "checkpoint": stored[-2]["checkpoint"]}, Store()
+    )
+    assert resumed.is_committed(0, 1) and resumed.is_committed(1, 0) and not resumed.is_committed(0, 0)
+    assert resumed.point_ids((0, 0), 3) == job.point_ids((0, 0), 3)
+    assert len(set(job.point_ids((0, 0), 3) + job.point_ids((0, 1), 3))) == 6
+
+
+def test_jobs_run_by_priority(jobs, rabbit_hole):
+
+    jobs.start()
+    stray = jobs.strays["user"]
+    first = jobs.submit_file(stray, io.BytesIO(b"first"), "first.txt", 512, 128)
+    assert rabbit_hole.started.wait(5)
+
+    # queued while the first one runs
+    low = jobs.submit_url(stray, "https://low.priority", 512, 128, priority=0)
+    high = jobs.submit_url(stray, "https://high.priority", 512, 128, priority=10)
+    assert jobs.get(low["job_id"])["status"] == "queued"
+
+    rabbit_hole.release.set()
+    for job in (first, low, high):
+        assert wait_for(jobs, job["job_id"])["status"] == "completed"
+
+    assert [source for source, _ in rabbit_hole.ingested] == ["first.txt", "https://high.priority", "https://low.priority"]
+    assert [j["job_id"] for j in jobs.list()] == [high["job_id"], low["job_id"], first["job_id"]]
+
+
+def test_uploaded_file_is_kept_until_done(jobs, rabbit_hole, tmp_path):
+
+    jobs.start()
+    job = jobs.submit_file(jobs.strays["user"], io.BytesIO(b"meow"), "sample.txt", 512, 128)
+    assert rabbit_hole.started.wait(5)
+
+    path = tmp_path / job["job_id"] / "sample.txt"
+    assert path.read_bytes() == b"meow"
+
+    rabbit_hole.release.set()
+    wait_for(jobs, job["job_id"])
+    assert not path.exists()
+
+
+def test_cancel_jobs(jobs, rabbit_hole):
+
+    jobs.start()
+    stray = jobs.strays["user"]
+    running = jobs.submit_file(stray, io.BytesIO(b"running"), "running.txt", 512, 128)
+    assert rabbit_hole.started.wait(5)
+    queued = jobs.submit_url(stray, "https://queued", 512, 128)
+
+    assert jobs.cancel(queued["job_id"])["status"] == "cancelled"
+    jobs.cancel(running["job_id"])
+    assert wait_for(jobs, running["job_id"])["status"] == "cancelled"
+
+    assert rabbit_hole.ingested == []
+    assert jobs.cancel("not-a-job") is None
+
+
+def test_interrupted_jobs_are_resumed(tmp_path, rabbit_hole):
+
+    jobs = IngestionJobs({"user": FakeStray(rabbit_hole)}, None, folder=str(tmp_path), workers=1)
+    jobs.start()
+    job = jobs.submit_file(jobs.strays["user"], io.BytesIO(b"meow"), "sample.txt", 512, 128)
+    assert rabbit_hole.started.wait(5)
+
+    # shutdown while running
+    jobs.shutdown()
+    assert jobs.get(job["job_id"])["status"] == "queued"
+
+    # restart
+    resumed_rabbit_hole = FakeRabbitHole()
+    jobs = IngestionJobs({"user": FakeStray(resumed_rabbit_hole)}, None, folder=str(tmp_path), workers=1)
+    jobs.start()
+    try:
+        assert wait_for(jobs, job["job_id"])["status"] == "completed"
+    finally:
+        jobs.shutdown()
+
+    source, resumed = resumed_rabbit_hole.ingested[0]
+    assert source == "sample.txt"
+    assert resumed.id == job["job_id"]
+
+
+def test_checkpoint_in_job_file(tmp_path):
+
+    jobs = IngestionJobs({}, None, folder=str(tmp_path), workers=1)
+    stray = FakeStray(FakeRabbitHole())
+    record = jobs.submit_url(stray, "https://wonderland.test", 512, 128)
+    job = IngestionJob(jobs.db.all()[0], jobs)
+    jobs_file = (tmp_path / "jobs.json").read_text()
+
+    job.set_batches(0, 1)
+    job.commit((0, 0), 16)
+
+    # the job records are not rewritten at every batch
+    assert (tmp_path / "jobs.json").read_text() == jobs_file
+    progress = json.loads((tmp_path / record["job_id"] / CHECKPOINT_FILE).read_text())
+    assert progress == {"checkpoint": {"parts": 1, "batches": {}}, "chunks": 16}
+
+
+def test_finished_jobs_are_pruned(tmp_path, rabbit_hole, monkeypatch):
+
+    rabbit_hole.release.set()
+    jobs = IngestionJobs({"user": FakeStray(rabbit_hole)}, None, folder=str(tmp_path), workers=1)
+    jobs.start()
+    try:
+        old = jobs.submit_url(jobs.strays["user"], "https://old.job", 512, 128)
+        assert wait_for(jobs, old["job_id"])["status"] == "completed"
+
+        monkeypatch.setenv("RABBITHOLE_JOBS_RETENTION", "0.5")
+        time.sleep(0.6)
+        new = jobs.submit_url(jobs.strays["user"], "https://new.job", 512, 128)
+        assert wait_for(jobs, new["job_id"])["status"] == "completed"
+        # removed when the next job is over
+        assert [j["job_id"] for j in jobs.list()] == [new["job_id"]]
+    finally:
+        jobs.shutdown()
+
+
+def test_job_interrupted_on_shutdown(tmp_path):
+
+    jobs = IngestionJobs({}, None, folder=str(tmp_path), workers=1)
+    job = IngestionJob({"job_id": "2b9d5d36-6ea4-4b8e-9d1c-4d0a39bdb3a5", "kind": "file", "source": "doc"}, jobs)
+
+    job.raise_if_stopped()
+    jobs.shutdown()
+    with pytest.raises(JobInterrupted):
+        job.raise_if_stopped()
+
+
+def test_get_missing_job(client):
+
+    response = client.get("/rabbithole/jobs/not-a-job")
+    assert response.status_code == 404
+
+    response = client.delete("/rabbithole/jobs/not-a-job")
+    assert response.status_code == 404
+
+
+def test_upload_file_job(client, byte_encoding):
+
+    with open("tests/mocks/sample.txt", "rb") as f:
+        response = client.post("/rabbithole/", files={"file": ("sample.txt", f, "text/plain")})
+    assert response.status_code == 200
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed"
+    assert job["source"] == "sample.txt"
+    assert job["chunks"] > 0
+    assert get_collections_names_and_point_count(client)["declarative"] == job["chunks"]
+
+    # points are stored with the ids of the job
+    declarative = client.app.state.ccat.memory.vectors.declarative
+    ids = {point.id.replace("-", "") for point in declarative.get_all_points()}
+    job_ids = set()
+    batch = 0
+    while len(job_ids) < job["chunks"]:
+        job_ids |= set(IngestionJob({**job, "kind": "file"}, None).point_ids((0, batch), 16))
+        batch += 1
+    assert ids <= job_ids
+
+    assert client.get("/rabbithole/jobs").json()["jobs"][0]["job_id"] == job["job_id"]
+
+    # the same file again, incrementally: nothing changed
+    with open("tests/mocks/sample.txt", "rb") as f:
+        response = client.post(
+            "/rabbithole/", files={"file": ("sample.txt", f, "text/plain")}, data={"incremental": "true"}
+        )
+    again = wait_for_job(client, response.json()["job_id"])
+    assert again["status"] == "completed"
+    assert again["incremental"] is True
+    assert again["chunks"] == 0
+    assert {point.id.replace("-", "") for point in declarative.get_all_points()} == ids
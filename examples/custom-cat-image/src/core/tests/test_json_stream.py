@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+from cat.json_stream import JSONStream
+
+
+DOCUMENT = {
+    "embedder": "DumbEmbedder",
+    "skipped": {"nested": [1, 2, {"brackets": "]}[{", "quote": "say \"meow\" \\"}], "empty": {}},
+    "collections": {
+        "episodic": [],
+        "declarative": [
+            {"id": str(i), "page_content": f"memory è {i}", "vector": [i / 3, -i * 1e-5, 123456789]}
+            for i in range(20)
+        ],
+    },
+    "last": 3.14159,
+}
+
+
+def stream(document, chunk_size=7):
+    return JSONStream(io.BytesIO(json.dumps(document, ensure_ascii=False).encode("utf-8")), chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_read_values(chunk_size):
+
+    s = stream(DOCUMENT, chunk_size)
+    read = {}
+    for key in s.members():
+        if key == "collections":
+            read[key] = {}
+            for collection in s.members():
+                read[key][collection] = [s.value() for _ in s.items()]
+        else:
+            read[key] = s.value()
+    assert read == DOCUMENT
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_skip_values(chunk_size):
+
+    # values not read are skipped
+    s = stream(DOCUMENT, chunk_size)
+    keys = list(s.members())
+    assert keys == list(DOCUMENT)
+
+    s = stream(DOCUMENT, chunk_size)
+    last = None
+    for key in s.members():
+        if key == "last":
+            last = s.value()
+    assert last == DOCUMENT["last"]
+
+
+def test_empty_containers():
+
+    assert list(stream({}).members()) == []
+    assert list(stream([]).items()) == []
+    s = stream([[], {}, [1]])
+    assert [s.value() for _ in s.items()] == [[], {}, [1]]
+
+
+def test_invalid_documents():
+
+    with pytest.raises(ValueError):
+        list(stream([1, 2]).members())
+
+    s = JSONStream(io.BytesIO(b'{"a": [1, 2'), chunk_size=4)
+    with pytest.raises(ValueError):
+        list(s.members())
+
+    s = JSONStream(io.BytesIO(b'{"a": 1 "b": 2}'))
+    with pytest.raises(ValueError):
+        list(s.members())
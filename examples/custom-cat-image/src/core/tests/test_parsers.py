@@ -0,0 +1,96 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from langchain.document_loaders.blob_loaders.schema import Blob
+from langchain.document_loaders.parsers import PDFMinerParser
+
+from cat import parsers
+from cat.parsers import PDFMinerPagesParser, ParallelPDFMinerParser, get_pdf_parser_workers
+
+
+def test_pdf_pages_parser():
+
+    blob = Blob.from_path("tests/mocks/sample.pdf")
+    pages = list(PDFMinerPagesParser().lazy_parse(blob))
+
+    assert len(pages) > 0
+    for page_number, page in enumerate(pages):
+        assert page.metadata == {"source": "tests/mocks/sample.pdf", "page": page_number}
+
+    # same text as the whole document parsed at once
+    whole = PDFMinerParser().parse(blob)[0].page_content
+    assert "".join(page.page_content for page in pages) == whole
+
+
+def test_parallel_pdf_parser():
+
+    blob = Blob.from_path("tests/mocks/sample-pages.pdf")
+    sequential = list(PDFMinerPagesParser().lazy_parse(blob))
+    assert len(sequential) == 6
+
+    # tasks of 2 pages
+    parser = ParallelPDFMinerParser(workers=2, pages_per_task=2, min_pages=0)
+    pages = list(parser.lazy_parse(blob))
+
+    # same pages, in order
+    assert [page.metadata for page in pages] == [page.metadata for page in sequential]
+    assert [page.page_content for page in pages] == [page.page_content for page in sequential]
+
+    # also from data in memory
+    with open("tests/mocks/sample-pages.pdf", "rb") as f:
+        blob = Blob.from_data(f.read(), path="sample-pages.pdf")
+    pages = list(parser.lazy_parse(blob))
+    assert [page.page_content for page in pages] == [page.page_content for page in sequential]
+    assert pages[0].metadata["source"] == "sample-pages.pdf"
+
+
+def test_parallel_pdf_parser_small_documents_in_process(monkeypatch):
+
+    def no_pool(workers):
+        raise AssertionError("Small documents should not be sent to the process pool")
+    monkeypatch.setattr("cat.parsers.get_pdf_process_pool", no_pool)
+
+    blob = Blob.from_path("tests/mocks/sample-pages.pdf")
+    pages = list(ParallelPDFMinerParser(workers=2, min_pages=32).lazy_parse(blob))
+
+    assert len(pages) == 6
+
+
+def test_pdf_parser_registered(client):
+
+    parser = client.app.state.ccat.rabbit_hole.file_handlers["application/pdf"]
+    assert isinstance(parser, ParallelPDFMinerParser)
+    assert parser.workers == get_pdf_parser_workers()
+
+    # the core hook leaves the parsers to plugins
+    file_handlers = {"application/pdf": "custom parser"}
+    file_handlers = client.app.state.ccat.mad_hatter.execute_hook(
+        "rabbithole_instantiates_parsers", file_handlers, cat=client.app.state.ccat
+    )
+    assert file_handlers == {"application/pdf": "custom parser"}
+
+
+def test_parallel_pdf_parser_broken_pool():
+
+    class BrokenPool:
+        shut_down = False
+
+        def submit(self, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("A worker crashed"))
+            return future
+
+        def shutdown(self, **kwargs):
+            self.shut_down = True
+
+    broken = BrokenPool()
+    parsers._pools[2] = broken
+    blob = Blob.from_path("tests/mocks/sample-pages.pdf")
+    with pytest.raises(BrokenProcessPool):
+        list(ParallelPDFMinerParser(workers=2, min_pages=0).lazy_parse(blob))
+
+    # the next documents get a new pool
+    assert broken.shut_down
+    assert parsers.get_pdf_process_pool(2) is not broken
+    assert len(list(ParallelPDFMinerParser(workers=2, min_pages=0).lazy_parse(blob))) == 6
@@ -0,0 +1,114 @@
+import threading
+import contextvars
+
+import pytest
+
+from cat.pipeline import Stage, run_pipeline
+
+
+def test_run_pipeline_processes_all_items():
+
+    stored = []
+    lock = threading.Lock()
+
+    def double(n):
+        yield n * 2
+
+    def store(n):
+        with lock:
+            stored.append(n)
+
+    run_pipeline(range(100), [Stage("double", double, workers=3), Stage("store", store, workers=2)], queue_size=2)
+
+    assert sorted(stored) == [n * 2 for n in range(100)]
+
+
+def test_run_pipeline_stages_fan_out():
+
+    stored = []
+
+    def split(text):
+        return text.split()
+
+    run_pipeline(["a b", "c d e"], [Stage("split", split), Stage("store", stored.append)])
+
+    assert stored == ["a", "b", "c", "d", "e"]
+
+
+def test_run_pipeline_streams_items():
+
+    first_item_stored = threading.Event()
+
+    def source():
+        yield 1
+        # the next item is produced only after the first one went through the whole pipeline
+        assert first_item_stored.wait(timeout=5)
+        yield 2
+
+    stored = []
+
+    def store(n):
+        stored.append(n)
+        first_item_stored.set()
+
+    run_pipeline(source(), [Stage("identity", lambda n: [n]), Stage("store", store)])
+
+    assert stored == [1, 2]
+
+
+def test_run_pipeline_stage_flush():
+
+    groups = []
+    pending = []
+
+    def group(n):
+        pending.append(n)
+        if len(pending) == 3:
+            yield list(pending)
+            pending.clear()
+
+    def flush():
+        if pending:
+            yield list(pending)
+
+    run_pipeline(range(7), [Stage("group", group, flush=flush), Stage("store", groups.append)])
+
+    assert groups == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_run_pipeline_raises_stage_error():
+
+    def fail(n):
+        if n == 50:
+            raise ValueError("broken item")
+        return [n]
+
+    with pytest.raises(ValueError, match="broken item"):
+        run_pipeline(range(1000), [Stage("fail", fail, workers=2), Stage("store", lambda n: None)], queue_size=1)
+
+
+def test_run_pipeline_raises_source_error():
+
+    def source():
+        yield 1
+        raise RuntimeError("broken source")
+
+    with pytest.raises(RuntimeError, match="broken source"):
+        run_pipeline(source(), [Stage("store", lambda n: None)])
+
+
+def test_run_pipeline_workers_inherit_context():
+
+    var = contextvars.ContextVar("var", default="default")
+    seen = []
+
+    var.set("caller")
+    run_pipeline([1, 2], [Stage("read", lambda n: seen.append(var.get()), workers=2)])
+
+    assert seen == ["caller", "caller"]
+
+
+def test_stage_needs_a_worker():
+
+    with pytest.raises(ValueError):
+        Stage("empty", lambda n: None, workers=0)
@@ -0,0 +1,327 @@
+import json
+import asyncio
+
+import pytest
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from starlette.datastructures import UploadFile
+
+from cat.jobs import IngestionJob, JobInterrupted
+from cat.looking_glass.stray_cat import StrayCat
+from cat.rabbit_hole import content_hash
+from cat.text_splitter import TokenOffsetsTextSplitter
+from tests.utils import get_fake_memory_export
+
+
+@pytest.fixture
+def stray(client):
+    yield StrayCat(user_id="user", main_loop=asyncio.new_event_loop())
+
+
+@pytest.fixture
+def embedded(stray, monkeypatch):
+    """Texts embedded by the Rabbit Hole."""
+    texts = []
+    embedder_class = type(stray.embedder)
+    embed_documents = embedder_class.embed_documents
+
+    def spy(self, documents):
+        texts.extend(documents)
+        return embed_documents(self, documents)
+    monkeypatch.setattr(embedder_class, "embed_documents", spy)
+    return texts
+
+
+def get_points(stray, source):
+    declarative = stray.memory.vectors.declarative
+    return {
+        point.payload["page_content"]: point
+        for point in declarative.get_points_by_metadata_filter({"source": source})
+    }
+
+
+def docs(*texts):
+    return [Document(page_content=text) for text in texts]
+
+
+def test_store_documents_incremental(stray, embedded):
+
+    rabbit_hole = stray.rabbit_hole
+    rabbit_hole.store_documents(stray, docs("chapter one", "chapter two", "chapter three"), "book.txt")
+    rabbit_hole.store_documents(stray, docs("another book"), "other.txt")
+
+    first = get_points(stray, "book.txt")
+    assert sorted(first) == ["chapter one", "chapter three", "chapter two"]
+    assert first["chapter one"].payload["metadata"]["content_hash"] == content_hash("chapter one")
+
+    # new version: chapter two removed, chapter four added
+    embedded.clear()
+    rabbit_hole.store_documents(
+        stray, docs("chapter one", "chapter three", "chapter four"), "book.txt", incremental=True
+    )
+
+    # only the new chunk is embedded
+    assert embedded == ["chapter four"]
+    second = get_points(stray, "book.txt")
+    assert sorted(second) == ["chapter four", "chapter one", "chapter three"]
+    # unchanged chunks are kept as they are
+    assert second["chapter one"].id == first["chapter one"].id
+    # other sources are not affected
+    assert list(get_points(stray, "other.txt")) == ["another book"]
+
+
+def test_store_documents_incremental_duplicated_chunks(stray, embedded):
+
+    rabbit_hole = stray.rabbit_hole
+    rabbit_hole.store_documents(stray, docs("meow", "meow", "purr"), "cat.txt")
+
+    embedded.clear()
+    rabbit_hole.store_documents(stray, docs("meow", "purr"), "cat.txt", incremental=True)
+
+    # one of the two identical chunks disappeared
+    assert embedded == []
+    points = list(stray.memory.vectors.declarative.get_points_by_metadata_filter({"source": "cat.txt"}))
+    assert sorted(p.payload["page_content"] for p in points) == ["meow", "purr"]
+
+
+def test_store_documents_not_incremental(stray, embedded):
+
+    rabbit_hole = stray.rabbit_hole
+    rabbit_hole.store_documents(stray, docs("meow"), "cat.txt")
+    rabbit_hole.store_documents(stray, docs("meow"), "cat.txt")
+
+    assert embedded == ["meow", "meow"]
+    points = list(stray.memory.vectors.declarative.get_points_by_metadata_filter({"source": "cat.txt"}))
+    assert len(points) == 2
+
+
+def test_get_points_by_metadata_filter_pages(stray):
+
+    rabbit_hole = stray.rabbit_hole
+    rabbit_hole.store_documents(stray, docs(*[f"chunk {i}" for i in range(25)]), "many.txt")
+
+    declarative = stray.memory.vectors.declarative
+    points = list(declarative.get_points_by_metadata_filter({"source": "many.txt"}, batch_size=10))
+    assert len(points) == 25
+    assert len({p.id for p in points}) == 25
+
+
+FOOTER = (
+    "Copyright 2024 Wonderland Press, all rights reserved. No part of this book may be reproduced "
+    "without the written permission of the publisher, page {}."
+)
+
+
+@pytest.fixture
+def dedup(stray, monkeypatch):
+    """Set the deduplication mode of the Rabbit Hole."""
+    # a few bits more than the default, short chunks have noisier fingerprints
+    monkeypatch.setattr(stray.rabbit_hole, "dedup_distance", 6)
+    return lambda mode: monkeypatch.setattr(stray.rabbit_hole, "dedup", mode)
+
+
+def test_store_documents_dedup_skip(stray, embedded, dedup):
+
+    rabbit_hole = stray.rabbit_hole
+    dedup("skip")
+    rabbit_hole.store_documents(stray, docs("meow", FOOTER.format(1), "meow", FOOTER.format(2)), "book.txt")
+
+    # exact and near duplicates within the upload are not embedded
+    assert embedded == ["meow", FOOTER.format(1)]
+    points = get_points(stray, "book.txt")
+    assert sorted(points) == [FOOTER.format(1), "meow"]
+    assert "simhash" in points[FOOTER.format(1)].payload["metadata"]
+
+    # nor the duplicates of chunks already in memory
+    embedded.clear()
+    rabbit_hole.store_documents(stray, docs(FOOTER.format(3), "purr"), "other.txt")
+    assert embedded == ["purr"]
+
+
+def test_store_documents_dedup_reference(stray, embedded, dedup):
+
+    rabbit_hole = stray.rabbit_hole
+    dedup("reference")
+    rabbit_hole.store_documents(stray, docs(FOOTER.format(1), FOOTER.format(2)), "book.txt")
+    rabbit_hole.store_documents(stray, docs(FOOTER.format(3), "purr"), "other.txt")
+    rabbit_hole.store_documents(stray, docs(FOOTER.format(4)), "another.txt")
+
+    assert embedded == [FOOTER.format(1), "purr"]
+    metadata = get_points(stray, "book.txt")[FOOTER.format(1)].payload["metadata"]
+    # duplicates from the same source are not referenced
+    assert metadata["duplicates"] == ["another.txt", "other.txt"]
+
+
+def test_store_documents_dedup_incremental(stray, embedded, dedup):
+
+    rabbit_hole = stray.rabbit_hole
+    dedup("skip")
+    rabbit_hole.store_documents(stray, docs("chapter one", "chapter two"), "book.txt")
+
+    # chunks of the previous version are not duplicates
+    embedded.clear()
+    rabbit_hole.store_documents(stray, docs("chapter one", "chapter three"), "book.txt", incremental=True)
+    assert embedded == ["chapter three"]
+    assert sorted(get_points(stray, "book.txt")) == ["chapter one", "chapter three"]
+
+
+def test_store_documents_dedup_after_hooks(stray, embedded, dedup, monkeypatch):
+
+    rabbit_hole = stray.rabbit_hole
+    dedup("reference")
+    execute_hook = stray.mad_hatter.execute_hook
+
+    def edit_content(hook_name, *args, **kwargs):
+        result = execute_hook(hook_name, *args, **kwargs)
+        if hook_name == "before_rabbithole_insert_memory":
+            result.page_content = result.page_content.upper()
+        return result
+    monkeypatch.setattr(stray.mad_hatter, "execute_hook", edit_content)
+
+    rabbit_hole.store_documents(stray, docs("meow"), "book.txt")
+    rabbit_hole.store_documents(stray, docs("Meow"), "other.txt")
+
+    # compared by the content stored
+    assert embedded == ["MEOW"]
+    metadata = get_points(stray, "book.txt")["MEOW"].payload["metadata"]
+    assert metadata["content_hash"] == content_hash("MEOW")
+    assert metadata["duplicates"] == ["other.txt"]
+
+
+def test_store_documents_dedup_fingerprints_stored(stray, embedded, dedup):
+
+    rabbit_hole = stray.rabbit_hole
+    # stored while deduplication was off
+    rabbit_hole.store_documents(stray, docs(FOOTER.format(1)), "book.txt")
+    assert "simhash" not in get_points(stray, "book.txt")[FOOTER.format(1)].payload["metadata"]
+
+    dedup("skip")
+    embedded.clear()
+    rabbit_hole.store_documents(stray, docs(FOOTER.format(2)), "other.txt")
+    assert embedded == []
+    metadata = get_points(stray, "book.txt")[FOOTER.format(1)].payload["metadata"]
+    assert metadata["simhash_bands"]
+
+    # fingerprinted only once
+    declarative = stray.memory.vectors.declarative
+    assert list(declarative.get_points_without_metadata("simhash")) == []
+
+
+def test_ingest_bulk_resumed(stray, embedded, byte_encoding, tmp_path):
+
+    (tmp_path / "one.txt").write_text("The first file, ingested by the interrupted run.")
+    (tmp_path / "two.txt").write_text("The second file, still to be ingested.")
+
+    class Jobs:
+        stopping = False
+
+        def _checkpoint(self, job_id, **fields):
+            pass
+
+    job = IngestionJob({
+        "job_id": "2b9d5d36-6ea4-4b8e-9d1c-4d0a39bdb3a5",
+        "kind": "folder",
+        "source": "kb",
+        "checkpoint": {"files": {"one.txt": 1}},
+    }, Jobs())
+    report = stray.rabbit_hole.ingest_bulk(stray, str(tmp_path), job=job)
+
+    # files already ingested are skipped
+    assert embedded == ["The second file, still to be ingested."]
+    assert report["ingested"] == 2
+    assert report["chunks"] == 2
+    assert job.files_committed() == {"one.txt": 1, "two.txt": 1}
+    # with the ids of the job
+    point = get_points(stray, "two.txt")["The second file, still to be ingested."]
+    assert point.id.replace("-", "") == job.chunk_ids("two.txt", 0, 1)[0]
+
+
+def test_ingest_memory_cancelled(stray, monkeypatch, tmp_path):
+
+    class Jobs:
+        stopping = False
+
+    job = IngestionJob({"job_id": "2b9d5d36-6ea4-4b8e-9d1c-4d0a39bdb3a5", "kind": "memory", "source": "m.json"}, Jobs())
+    path = tmp_path / "memories.json"
+    path.write_text(json.dumps(get_fake_memory_export(points=5)))
+
+    declarative = stray.memory.vectors.declarative
+    add_points = declarative.add_points
+
+    def cancel_after_batch(*args, **kwargs):
+        add_points(*args, **kwargs)
+        job.cancel()
+    monkeypatch.setattr(stray.rabbit_hole, "memory_batch_size", 2)
+    monkeypatch.setattr(declarative, "add_points", cancel_after_batch)
+
+    # stopped between batches
+    with pytest.raises(JobInterrupted):
+        stray.rabbit_hole.ingest_memory(stray, str(path), job=job)
+    assert len(list(declarative.get_points_by_metadata_filter())) == 2
+
+
+def test_file_to_docs_upload(stray, byte_encoding):
+
+    # uploaded files are parsed from their spooled file, not copied in memory
+    with open("tests/mocks/sample.txt", "rb") as f:
+        expected = stray.rabbit_hole.file_to_docs(stray, "tests/mocks/sample.txt")
+        upload = UploadFile(f, filename="sample.txt")
+        docs = stray.rabbit_hole.file_to_docs(stray, upload)
+
+    assert [d.page_content for d in docs] == [d.page_content for d in expected]
+    assert docs[0].metadata["source"] == "sample.txt"
+
+
+def test_text_splitter_opt_in(stray, byte_encoding, monkeypatch):
+
+    splitters = []
+    execute_hook = stray.mad_hatter.execute_hook
+
+    def token_offsets_splitter(hook_name, *args, **kwargs):
+        result = execute_hook(hook_name, *args, **kwargs)
+        if hook_name == "rabbithole_splits_text":
+            splitters.append(result)
+            if opt_in:
+                result = TokenOffsetsTextSplitter(
+                    chunk_size=result._chunk_size, chunk_overlap=result._chunk_overlap
+                )
+        return result
+    monkeypatch.setattr(stray.mad_hatter, "execute_hook", token_offsets_splitter)
+
+    # the recursive splitter is the default
+    opt_in = False
+    recursive_docs = stray.rabbit_hole.file_to_docs(stray, "tests/mocks/sample.txt")
+    assert isinstance(splitters[0], RecursiveCharacterTextSplitter)
+    assert len(recursive_docs) > 0
+
+    # plugins can choose the token offsets splitter
+    opt_in = True
+    docs = stray.rabbit_hole.file_to_docs(stray, "tests/mocks/sample.txt")
+    assert len(docs) > 0
+    assert all(len(byte_encoding.encode(d.page_content)) <= splitters[1]._chunk_size for d in docs)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_ingest_file_stores_hook(stray, embedded, byte_encoding, monkeypatch, streaming):
+
+    rabbit_hole = stray.rabbit_hole
+    monkeypatch.setattr(rabbit_hole, "streaming", streaming)
+    monkeypatch.setattr(rabbit_hole, "embed_batch_size", 2)
+
+    calls = []
+    execute_hook = stray.mad_hatter.execute_hook
+
+    def spy(hook_name, *args, **kwargs):
+        if hook_name == "before_rabbithole_stores_documents":
+            calls.append(len(args[0]))
+        return execute_hook(hook_name, *args, **kwargs)
+    monkeypatch.setattr(stray.mad_hatter, "execute_hook", spy)
+
+    chunks = rabbit_hole.ingest_file(stray, "tests/mocks/sample.txt", chunk_size=64, chunk_overlap=0)
+    assert chunks == len(embedded) > 2
+    if streaming:
+        # a batch at a time
+        assert calls == [2] * (chunks // 2) + [chunks % 2] * (chunks % 2)
+    else:
+        # all the chunks at once
+        assert calls == [chunks]
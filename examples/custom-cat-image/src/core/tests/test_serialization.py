@@ -0,0 +1,45 @@
+import json
+import base64
+
+import numpy as np
+from pydantic import BaseModel
+from langchain.docstore.document import Document
+
+from cat.serialization import dumps, dumps_str, vector_to_base64, vector_from_base64, CatJSONResponse
+
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+
+def test_dumps_numpy_and_models():
+
+    content = {
+        "vector": np.array([0.5, 1.5], dtype=np.float32),
+        "point": Point(x=1, y=2),
+        "doc": Document(page_content="Alice", metadata={"source": "book"}),
+        1: "non string key",
+        "text": "Café",
+    }
+    decoded = json.loads(dumps(content))
+    assert decoded["vector"] == [0.5, 1.5]
+    assert decoded["point"] == {"x": 1, "y": 2}
+    assert decoded["doc"]["page_content"] == "Alice"
+    assert decoded["1"] == "non string key"
+    assert "Café" in dumps_str(content)
+
+
+def test_vector_to_base64():
+
+    vector = [0.1, -2.0, 3.25]
+    decoded = np.frombuffer(base64.b64decode(vector_to_base64(vector)), dtype="<f4")
+    assert np.allclose(decoded, vector)
+    assert np.allclose(vector_from_base64(vector_to_base64(vector)), vector)
+
+
+def test_response_class():
+
+    response = CatJSONResponse({"vector": np.zeros(3)})
+    assert json.loads(response.body) == {"vector": [0.0, 0.0, 0.0]}
+    assert response.media_type == "application/json"
@@ -0,0 +1,81 @@
+import pytest
+
+from cat.text_splitter import TokenOffsetsTextSplitter
+
+
+pytestmark = pytest.mark.usefixtures("byte_encoding")
+
+
+def words(prefix, n):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_chunks_fit_chunk_size():
+
+    text = words("word", 200)
+    splitter = TokenOffsetsTextSplitter(chunk_size=50, chunk_overlap=0)
+    chunks = splitter.split_text(text)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk.encode()) <= 50
+    # chunks end on words, and nothing is lost
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_chunks_prefer_paragraphs():
+
+    text = words("first", 10) + "\n\n" + words("second", 10)
+    splitter = TokenOffsetsTextSplitter(chunk_size=120, chunk_overlap=0, keep_separator=True)
+
+    assert splitter.split_text(text) == [words("first", 10), words("second", 10)]
+
+
+def test_chunks_overlap():
+
+    text = words("word", 100)
+    splitter = TokenOffsetsTextSplitter(chunk_size=60, chunk_overlap=20)
+    chunks = splitter.split_text(text)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        overlap = set(previous.split()) & set(chunk.split())
+        assert overlap
+        assert chunk.split()[0] in overlap
+    assert chunks[-1].endswith("word99")
+
+
+def test_keep_separator():
+
+    text = "a" * 30 + "\\n" + "b" * 30
+    kept = TokenOffsetsTextSplitter(separators=["\\n"], chunk_size=40, chunk_overlap=0, keep_separator=True)
+    dropped = TokenOffsetsTextSplitter(separators=["\\n"], chunk_size=40, chunk_overlap=0, keep_separator=False)
+
+    assert kept.split_text(text) == ["a" * 30, "\\n" + "b" * 30]
+    assert dropped.split_text(text) == ["a" * 30, "b" * 30]
+
+
+def test_split_documents_keeps_metadata():
+
+    splitter = TokenOffsetsTextSplitter(chunk_size=50, chunk_overlap=0)
+    docs = splitter.create_documents([words("word", 50)], [{"source": "test"}])
+
+    assert len(docs) > 1
+    assert all(doc.metadata == {"source": "test"} for doc in docs)
+    assert splitter.split_text("") == []
+
+
+def test_multi_byte_characters():
+
+    # characters of 3 tokens (bytes) are never cut
+    text = "日本語のテキスト " * 20
+    splitter = TokenOffsetsTextSplitter(chunk_size=10, chunk_overlap=3)
+    chunks = splitter.split_text(text)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk in text
+        assert len(chunk.encode()) <= 10
+    assert "".join(chunks).endswith("スト")
+
+    # a character longer than the chunk size
+    assert TokenOffsetsTextSplitter(chunk_size=2, chunk_overlap=0).split_text("日日") == ["日", "日"]
@@ -0,0 +1,104 @@
+import pytest
+
+from cat.web import CrawlCache, Crawler, DownloadTooLarge, download, extract_links
+from tests.utils import LocalWebsite
+
+
+def html(*links, text="A page of the website."):
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return "text/html", f"<html><body><p>{text}</p>{anchors}</body></html>"
+
+
+PAGES = {
+    "/": html("/a", "/b#section", "https://other.host/x", "mailto:cat@wonderland"),
+    "/a": html("/c", "/"),
+    "/b": html(),
+    "/c": html("/d"),
+    "/d": html(),
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CrawlCache(str(tmp_path / "crawl_cache.json"))
+
+
+def test_download():
+
+    with LocalWebsite({"/page.txt": ("text/plain; charset=utf-8", "meow" * 100)}) as website:
+        page = download(website.url + "/page.txt")
+        assert page.content == b"meow" * 100
+        assert page.content_type == "text/plain"
+        assert page.etag
+
+        with pytest.raises(DownloadTooLarge):
+            download(website.url + "/page.txt", max_size=100)
+
+
+def test_extract_links():
+
+    _, page = PAGES["/"]
+    assert extract_links(page.encode(), "http://cat.test/") == [
+        "http://cat.test/a", "http://cat.test/b", "https://other.host/x"
+    ]
+
+
+def test_crawl_depth_and_pages(cache):
+
+    with LocalWebsite(PAGES) as website:
+        crawled = [page.url for page in Crawler(website.url + "/", max_depth=1, cache=cache).crawl()]
+        # other hosts are not followed
+        assert sorted(crawled) == [website.url + p for p in ("/", "/a", "/b")]
+
+        crawled = list(Crawler(website.url + "/", max_depth=5, max_pages=3, cache=cache).crawl())
+        assert len(crawled) == 3
+
+
+def test_recrawl_only_changed_pages(cache):
+
+    with LocalWebsite(PAGES) as website:
+        crawler = Crawler(website.url + "/", cache=cache)
+        for page in crawler.crawl():
+            crawler.page_ingested(page)
+        assert len(website.requests) == 4
+
+        website.pages["/a"] = html("/c", "/", text="A page that changed.")
+        website.requests.clear()
+        crawler = Crawler(website.url + "/", cache=cache)
+        changed = [page.url for page in crawler.crawl()]
+
+        assert changed == [website.url + "/a"]
+        assert crawler.unchanged == 3
+        # conditional requests, links of not modified pages are still followed
+        assert sorted(website.paths()) == ["/", "/a", "/b", "/c"]
+        assert all("If-None-Match" in headers for path, headers in website.requests)
+
+
+def test_recrawl_pages_not_stored(cache):
+
+    with LocalWebsite(PAGES) as website:
+        crawler = Crawler(website.url + "/", cache=cache)
+        for page in crawler.crawl():
+            crawler.page_ingested(page)
+
+        # e.g. deleted from memory
+        stored = {website.url + p for p in ("/", "/a", "/c")}
+        crawler = Crawler(website.url + "/", cache=cache, is_stored=lambda url: url in stored)
+        changed = [page.url for page in crawler.crawl()]
+        assert changed == [website.url + "/b"]
+        assert crawler.unchanged == 3
+
+        cache.clear()
+        assert len(list(Crawler(website.url + "/", cache=cache).crawl())) == 4
+
+
+def test_crawl_host_concurrency(cache):
+
+    pages = {"/": html(*[f"/{i}" for i in range(8)])}
+    pages.update({f"/{i}": html() for i in range(8)})
+
+    with LocalWebsite(pages, delay=0.05) as website:
+        crawler = Crawler(website.url + "/", cache=cache, workers=8, host_concurrency=2)
+        assert len(list(crawler.crawl())) == 9
+
+    assert website.max_in_flight == 2
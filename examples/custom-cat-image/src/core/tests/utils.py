@@ -1,5 +1,11 @@
 import os
+import time
+import uuid
+import random
 import shutil
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 # utility function to communicate with the cat via websocket
@@ -86,4 +92,103 @@ def get_collections_names_and_point_count(client):
     json = response.json()
     assert response.status_code == 200
     collections_n_points = { c["name"]: c["vectors_count"] for c in json["collections"]}
-    return collections_n_points
\ No newline at end of file
+    return collections_n_points
+
+# memory export in the format of `/memory/recall`, with random vectors
+def get_fake_memory_export(embedder_name="DumbEmbedder", dim=2367, points=1):
+    return {
+        "embedder": embedder_name,
+        "collections": {
+            "declarative": [{
+                "page_content": "test_memory",
+                "metadata": {
+                    "source": "user",
+                    "when": time.time()
+                },
+                "id": str(uuid.uuid4()),
+                "vector": [random.random() for _ in range(dim)]
+            } for _ in range(points)]
+        }
+    }
+
+
+# utility to wait for an ingestion job to finish, returns the job record
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        response = client.get(f"/rabbithole/jobs/{job_id}")
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        assert time.time() < deadline, f"Ingestion job {job_id} still {job['status']}"
+        time.sleep(0.05)
+
+
+# local website to test downloads and crawls, serving pages (path -> (content type, body)) with ETags
+class LocalWebsite:
+
+    def __init__(self, pages, delay=0):
+        self.pages = dict(pages)
+        self.delay = delay
+        # (path, request headers) of each GET request
+        self.requests = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        website = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_HEAD(self):
+                self.reply(body=False)
+
+            def do_GET(self):
+                with website._lock:
+                    website.requests.append((self.path, dict(self.headers)))
+                    website._in_flight += 1
+                    website.max_in_flight = max(website.max_in_flight, website._in_flight)
+                try:
+                    time.sleep(website.delay)
+                    self.reply(body=True)
+                finally:
+                    with website._lock:
+                        website._in_flight -= 1
+
+            def reply(self, body):
+                if self.path not in website.pages:
+                    self.send_error(404)
+                    return
+                content_type, content = website.pages[self.path]
+                content = content.encode() if isinstance(content, str) else content
+                etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                if body:
+                    self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def paths(self):
+        """Paths requested with GET."""
+        return [path for path, _ in self.requests]
+